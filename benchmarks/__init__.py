@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+"""Benchmark harness for the Analogical Reasoning Engine."""
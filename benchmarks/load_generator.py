@@ -0,0 +1,192 @@
+# benchmarks/load_generator.py
+"""
+Open-loop load generator that replays a recorded LLM trace.
+
+Requests arrive at a target rate (evenly spaced, or as a Poisson process)
+regardless of how fast earlier ones finish, and each request's latency is
+measured from its scheduled arrival, so queueing delay under overload is
+included. LLM calls are served by the replay backend with the recorded (or
+scaled) latencies; the rest of the configuration, such as hedging and
+coalescing, is taken from config/config.json. The response cache is disabled.
+
+Two kinds of request can be replayed:
+
+- calls: the recorded prompts, in recorded order, as single LLM calls;
+- pipeline: reasoning jobs (Phases 2-4) over source subsets of the story
+  corpus, whose LLM calls are answered from the trace.
+
+Usage:
+    python main.py --record-trace data/traces/run.jsonl.gz
+    python -m benchmarks.load_generator data/traces/run.jsonl.gz --qps 20 --requests 500
+    python -m benchmarks.load_generator data/traces/run.jsonl.gz --mode pipeline --qps 5
+"""
+
+import argparse
+import itertools
+import json
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Callable, Iterator, Optional
+
+from benchmarks.run_benchmarks import percentile
+from core.analogical_reasoner import (
+    build_graphs,
+    identify_common_relations,
+    identify_alignable_differences,
+    re_represent_relations
+)
+from core.batch_runner import enumerate_jobs
+from core.llm_interface import LLMInterface
+from core.trace import read_trace
+from utils.config_loader import load_config
+from utils.story_loader import iter_stories
+
+def call_requests(llm: LLMInterface, trace_path: str) -> Iterator[Callable[[], Any]]:
+    """Yield one request per recorded prompt, cycling through the trace."""
+    prompts = [record["prompt"] for record in read_trace(trace_path)]
+    for prompt in itertools.cycle(prompts):
+        yield lambda prompt=prompt: llm.generate_response(prompt)
+
+def pipeline_requests(llm: LLMInterface, stories_directory: str,
+                      source_size: Optional[int]) -> Iterator[Callable[[], Any]]:
+    """Yield one reasoning job per source subset of the corpus, cycling through them."""
+    stories = [story.text for story in iter_stories(stories_directory)]
+    if not stories:
+        raise ValueError(f"no stories in {stories_directory}")
+    graphs = list(build_graphs(stories))
+    jobs = list(enumerate_jobs(stories, ["replay"], source_size))
+
+    def run_job(sources):
+        common_relations = identify_common_relations([stories[i] for i in sources], llm,
+                                                     [graphs[i] for i in sources])
+        identify_alignable_differences(common_relations)
+        return re_represent_relations(common_relations, llm)
+
+    for _, _, sources in itertools.cycle(jobs):
+        yield lambda sources=sources: run_job(sources)
+
+def generate_load(requests: Iterator[Callable[[], Any]], qps: float, count: int,
+                  workers: int, poisson: bool = False, seed: int = 0) -> Dict[str, Any]:
+    """
+    Issue requests at a target rate and measure their latency.
+
+    Args:
+        requests: Callables that each perform one request.
+        qps: Target arrival rate in requests per second.
+        count: Number of requests to issue.
+        workers: Number of threads executing requests.
+        poisson: Draw exponential inter-arrival times instead of even spacing.
+        seed: Seed of the Poisson arrivals.
+
+    Returns:
+        Throughput, latency percentiles and error counts.
+    """
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+    lag = 0.0
+
+    def execute(request: Callable[[], Any], scheduled: float) -> None:
+        try:
+            request()
+        except Exception as e:
+            with lock:
+                errors.append(f"{type(e).__name__}: {e}")
+            return
+        with lock:
+            latencies.append(time.perf_counter() - scheduled)
+
+    start = time.perf_counter()
+    arrival = 0.0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for request in itertools.islice(requests, count):
+            scheduled = start + arrival
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                lag = max(lag, -delay)
+            executor.submit(execute, request, scheduled)
+            arrival += rng.expovariate(qps) if poisson else 1 / qps
+    elapsed = time.perf_counter() - start
+
+    result: Dict[str, Any] = {
+        "offered_qps": qps,
+        "requests": count,
+        "completed": len(latencies),
+        "errors": len(errors),
+        "elapsed_s": elapsed,
+        "throughput_per_s": len(latencies) / elapsed if elapsed > 0 else None,
+        "max_arrival_lag_ms": lag * 1000
+    }
+    if latencies:
+        result.update({
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "max_ms": max(latencies) * 1000
+        })
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Replay a recorded LLM trace at a target rate")
+    parser.add_argument("trace", help="trace file recorded with main.py --record-trace")
+    parser.add_argument("--mode", choices=("calls", "pipeline"), default="calls",
+                        help="replay single LLM calls or full reasoning jobs")
+    parser.add_argument("--qps", type=float, default=10.0, help="target requests per second")
+    parser.add_argument("--requests", type=int, default=200, help="number of requests")
+    parser.add_argument("--workers", type=int, default=64, help="threads executing requests")
+    parser.add_argument("--poisson", action="store_true",
+                        help="Poisson arrivals instead of evenly spaced ones")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="factor applied to the recorded latencies")
+    parser.add_argument("--stories", default="data/stories",
+                        help="story corpus of the pipeline jobs")
+    parser.add_argument("--source-size", type=int, default=2,
+                        help="stories per pipeline job (0 for the whole corpus)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of arrivals and fallbacks")
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the load test and print its report."""
+    args = parse_args(argv)
+    config = dict(load_config(), backend="replay", trace_path=args.trace,
+                  replay_latency_scale=args.latency_scale, replay_seed=args.seed,
+                  cache_path=None, semantic_cache=False)
+    llm = LLMInterface(config)
+
+    if args.mode == "calls":
+        requests = call_requests(llm, args.trace)
+    else:
+        requests = pipeline_requests(llm, args.stories, args.source_size or None)
+
+    print(f"Replaying {args.trace}: {args.requests} {args.mode} requests at {args.qps:g}/s")
+    report = generate_load(requests, args.qps, args.requests, args.workers,
+                           args.poisson, args.seed)
+    report["mode"] = args.mode
+    report["unrecorded_prompts"] = llm.backend.misses
+
+    print(f"  completed {report['completed']}/{report['requests']} "
+          f"({report['errors']} errors) in {report['elapsed_s']:.2f}s, "
+          f"throughput {report['throughput_per_s'] or 0:.1f}/s")
+    if report["completed"]:
+        print(f"  latency p50 {report['p50_ms']:.1f}ms  p95 {report['p95_ms']:.1f}ms  "
+              f"p99 {report['p99_ms']:.1f}ms  max {report['max_ms']:.1f}ms")
+    print(f"  {report['unrecorded_prompts']} prompts not in the trace were answered "
+          f"from the same template")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+        print(f"Wrote {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,253 @@
+# benchmarks/run_benchmarks.py
+"""
+Benchmark harness for the analogical reasoning pipeline.
+
+Generates synthetic corpora of increasing size, times story loading and each
+reasoning phase against the simulated LLM backend, and writes throughput,
+p50/p95 latency and peak memory to a JSON report. A stored baseline report can
+be passed to flag regressions.
+
+Usage:
+    python -m benchmarks.run_benchmarks --sizes 10,100,1000 --latency 0.05 \\
+        --output bench_results.json --baseline benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+from benchmarks.synthetic_corpus import write_corpus
+from core.analogical_reasoner import (
+    initial_graph_construction,
+    identify_common_relations,
+    identify_alignable_differences,
+    re_represent_relations
+)
+from core.llm_interface import LLMInterface, SimulatedBackend
+from utils.story_loader import iter_stories
+
+PHASES = ["story_loading", "initial_graph_construction", "identify_common_relations",
+          "identify_alignable_differences", "re_represent_relations"]
+
+def percentile(samples: List[float], fraction: float) -> float:
+    """
+    Return a percentile of a list of samples using linear interpolation.
+
+    Args:
+        samples: The samples; must not be empty.
+        fraction: Percentile as a fraction between 0 and 1.
+
+    Returns:
+        The interpolated percentile.
+    """
+    ordered = sorted(samples)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def summarize(latencies: List[float], items: int, total: float,
+              peak_memory: Optional[int]) -> Dict[str, Any]:
+    """Build the result record of one phase."""
+    return {
+        "items": items,
+        "calls": len(latencies),
+        "total_s": total,
+        "throughput_per_s": items / total if total > 0 else None,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "peak_memory_bytes": peak_memory
+    }
+
+def measure(func: Callable[[], Any], track_memory: bool) -> Tuple[Any, float, Optional[int]]:
+    """
+    Time one call and record its peak traced memory.
+
+    Returns:
+        A tuple of (result, elapsed seconds, peak memory in bytes or None).
+    """
+    if track_memory:
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] - baseline if track_memory else None
+    return result, elapsed, peak
+
+def benchmark_corpus(size: int, words: int, latency: float, repeat: int,
+                     track_memory: bool, workdir: str) -> Dict[str, Any]:
+    """
+    Benchmark every phase on a synthetic corpus of the given size.
+
+    Args:
+        size: Number of stories.
+        words: Approximate words per story.
+        latency: Simulated LLM latency in seconds.
+        repeat: Number of repetitions of the corpus-level phases.
+        track_memory: Whether to measure peak memory with tracemalloc.
+        workdir: Scratch directory for the corpus files.
+
+    Returns:
+        Results per phase.
+    """
+    directory = os.path.join(workdir, f"corpus_{size}")
+    write_corpus(directory, size, words)
+    llm = LLMInterface({"cache_path": None}, backend=SimulatedBackend(latency=latency))
+    results = {}
+
+    # Story loading: per-story latency is the gap between consecutive yields
+    def load():
+        gaps = []
+        stories = []
+        last = time.perf_counter()
+        for story in iter_stories(directory):
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+            stories.append(story.text)
+        return stories, gaps
+    (stories, gaps), elapsed, peak = measure(load, track_memory)
+    results["story_loading"] = summarize(gaps, len(stories), elapsed, peak)
+
+    # Phase 1: per-story latency of graph construction
+    def construct():
+        graphs = []
+        latencies = []
+        for story in stories:
+            start = time.perf_counter()
+            graphs.append(initial_graph_construction(story))
+            latencies.append(time.perf_counter() - start)
+        return graphs, latencies
+    (graphs, latencies), elapsed, peak = measure(construct, track_memory)
+    results["initial_graph_construction"] = summarize(latencies, len(stories), elapsed, peak)
+
+    # Phases 2-4: whole-corpus calls, repeated for a latency distribution
+    phases = [
+        ("identify_common_relations", lambda: identify_common_relations(stories, llm, graphs)),
+        ("identify_alignable_differences", lambda: identify_alignable_differences(common_relations)),
+        ("re_represent_relations", lambda: re_represent_relations(common_relations, llm))
+    ]
+    common_relations = None
+    for name, func in phases:
+        latencies = []
+        peaks = []
+        for _ in range(repeat):
+            result, elapsed, peak = measure(func, track_memory)
+            latencies.append(elapsed)
+            peaks.append(peak)
+        if name == "identify_common_relations":
+            common_relations = result
+        results[name] = summarize(latencies, size * repeat, sum(latencies),
+                                  max(peaks) if track_memory else None)
+
+    return results
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any],
+                        threshold: float) -> List[str]:
+    """
+    Compare a report against a baseline report.
+
+    A phase regresses when its p50 latency grows, or its throughput drops, by
+    more than `threshold` (a fraction) relative to the baseline.
+
+    Args:
+        report: The current report.
+        baseline: The stored baseline report.
+        threshold: Allowed relative slowdown before a regression is flagged.
+
+    Returns:
+        Human-readable descriptions of the regressions found.
+    """
+    regressions = []
+    for size, phases in report["results"].items():
+        for phase, current in phases.items():
+            previous = baseline.get("results", {}).get(size, {}).get(phase)
+            if not previous:
+                continue
+            if previous["p50_ms"] and current["p50_ms"] > previous["p50_ms"] * (1 + threshold):
+                regressions.append(f"{phase} @ {size} stories: p50 {previous['p50_ms']:.3f}ms "
+                                   f"-> {current['p50_ms']:.3f}ms")
+            if previous["throughput_per_s"] and current["throughput_per_s"] and \
+               current["throughput_per_s"] < previous["throughput_per_s"] / (1 + threshold):
+                regressions.append(f"{phase} @ {size} stories: throughput "
+                                   f"{previous['throughput_per_s']:.1f}/s -> "
+                                   f"{current['throughput_per_s']:.1f}/s")
+    return regressions
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark the analogical reasoning pipeline")
+    parser.add_argument("--sizes", default="10,100,1000",
+                        help="comma-separated corpus sizes (number of stories)")
+    parser.add_argument("--words", type=int, default=300, help="approximate words per story")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="simulated LLM latency in seconds")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="repetitions of the corpus-level phases")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip peak memory tracking (tracemalloc slows the run)")
+    parser.add_argument("--output", default="bench_results.json", help="report path")
+    parser.add_argument("--baseline", help="baseline report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown flagged as a regression")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the benchmarks and return the process exit code."""
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    track_memory = not args.no_memory
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "words": args.words,
+            "latency_s": args.latency,
+            "repeat": args.repeat,
+            "timestamp": time.time()
+        },
+        "results": {}
+    }
+
+    if track_memory:
+        tracemalloc.start()
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in sizes:
+            print(f"Benchmarking {size} stories...")
+            results = benchmark_corpus(size, args.words, args.latency, args.repeat,
+                                       track_memory, workdir)
+            report["results"][str(size)] = results
+            for phase in PHASES:
+                result = results[phase]
+                throughput = result["throughput_per_s"] or 0.0
+                print(f"  {phase:32s} {throughput:12.1f}/s  p50 {result['p50_ms']:9.3f}ms  "
+                      f"p95 {result['p95_ms']:9.3f}ms")
+    if track_memory:
+        tracemalloc.stop()
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare_to_baseline(report, baseline, args.threshold)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("No regressions against baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
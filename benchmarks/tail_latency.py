@@ -0,0 +1,135 @@
+# benchmarks/tail_latency.py
+"""
+Tail latency benchmark for request hedging and in-flight coalescing.
+
+Sends a burst of concurrent requests through `LLMInterface` against the
+simulated backend with a heavy-tailed latency distribution (log-normal with
+a fraction of stragglers), once per strategy, and reports p50/p99 latency and
+the number of backend calls each strategy made. A fraction of the requests
+repeat an earlier prompt, as concurrent jobs for the same target do.
+
+Usage:
+    python -m benchmarks.tail_latency --requests 400 --latency 0.05 \\
+        --slow-rate 0.05 --slow-latency 1.0 --hedge-percentile 95
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import Dict, List, Any, Optional
+
+from benchmarks.run_benchmarks import percentile
+from core.llm_interface import LLMInterface, SimulatedBackend
+
+class CountingBackend(SimulatedBackend):
+    """Simulated backend that counts the calls it receives."""
+
+    def __init__(self, **settings: Any):
+        super().__init__(**settings)
+        self.calls = 0
+
+    async def acomplete(self, prompt: str, settings: Dict[str, Any]) -> str:
+        self.calls += 1
+        return await super().acomplete(prompt, settings)
+
+def make_prompts(count: int, duplicate_rate: float, seed: int) -> List[str]:
+    """Build the request prompts; a `duplicate_rate` fraction repeats an earlier one."""
+    rng = random.Random(seed)
+    prompts: List[str] = []
+    for i in range(count):
+        if prompts and rng.random() < duplicate_rate:
+            prompts.append(rng.choice(prompts))
+        else:
+            prompts.append(f"Request {i}: summarize the story")
+    return prompts
+
+async def run_strategy(prompts: List[str], backend_settings: Dict[str, Any],
+                       config: Dict[str, Any], concurrency: int,
+                       warmup: int) -> Dict[str, Any]:
+    """
+    Send every prompt with at most `concurrency` in flight and time each call.
+
+    Args:
+        prompts: The request prompts.
+        backend_settings: Keyword arguments of the simulated backend.
+        config: LLM interface configuration for the strategy.
+        concurrency: Maximum number of requests in flight.
+        warmup: Number of calls made first to fill the latency window.
+
+    Returns:
+        Latency percentiles and the number of backend calls.
+    """
+    backend = CountingBackend(**backend_settings)
+    llm = LLMInterface(dict(config, cache_path=None), backend=backend)
+    for i in range(warmup):
+        await llm.agenerate_response(f"Warm-up {i}")
+    backend.calls = 0
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def timed(prompt: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await llm.agenerate_response(prompt)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(prompt) for prompt in prompts))
+    return {
+        "total_s": time.perf_counter() - start,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": max(latencies) * 1000,
+        "backend_calls": backend.calls
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(description="Measure the effect of hedging and "
+                                                 "coalescing on LLM call tail latency")
+    parser.add_argument("--requests", type=int, default=400, help="number of requests")
+    parser.add_argument("--concurrency", type=int, default=32, help="requests in flight")
+    parser.add_argument("--duplicate-rate", type=float, default=0.3,
+                        help="fraction of requests repeating an earlier prompt")
+    parser.add_argument("--latency", type=float, default=0.05, help="median latency in seconds")
+    parser.add_argument("--sigma", type=float, default=0.3, help="log-normal spread")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="fraction of stragglers")
+    parser.add_argument("--slow-latency", type=float, default=1.0,
+                        help="extra latency of a straggler in seconds")
+    parser.add_argument("--hedge-percentile", type=float, default=95,
+                        help="latency percentile after which a call is hedged")
+    parser.add_argument("--seed", type=int, default=0, help="seed of prompts and latencies")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run every strategy and print a comparison table."""
+    args = parse_args(argv)
+    prompts = make_prompts(args.requests, args.duplicate_rate, args.seed)
+    backend_settings = {
+        "latency": args.latency,
+        "latency_sigma": args.sigma,
+        "slow_rate": args.slow_rate,
+        "slow_latency": args.slow_latency,
+        "seed": args.seed
+    }
+    strategies = {
+        "baseline": {"coalesce_requests": False},
+        "coalesce": {"coalesce_requests": True},
+        "hedge": {"coalesce_requests": False, "hedge_percentile": args.hedge_percentile},
+        "coalesce+hedge": {"coalesce_requests": True, "hedge_percentile": args.hedge_percentile}
+    }
+    print(f"{args.requests} requests, {args.duplicate_rate:.0%} duplicates, "
+          f"{args.slow_rate:.0%} stragglers (+{args.slow_latency:g}s)")
+    for name, config in strategies.items():
+        result = asyncio.run(run_strategy(prompts, backend_settings, config,
+                                          args.concurrency, warmup=50))
+        print(f"  {name:16s} p50 {result['p50_ms']:8.1f}ms  p99 {result['p99_ms']:8.1f}ms  "
+              f"max {result['max_ms']:8.1f}ms  backend calls {result['backend_calls']:5d}  "
+              f"total {result['total_s']:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
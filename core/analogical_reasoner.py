@@ -12,15 +12,56 @@ It contains functions for the four main phases of analogical reasoning:
 4. Re-representation and New Concept Recognition (RNCR)
 """
 
-from typing import Dict, List, Any
+import itertools
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
 from core.llm_interface import LLMInterface
+from core.mapping_columns import AlignableDifferences, MappingColumns
+from core.prompts import labeling_prompt, principle_prompt, combine_principles_prompt
+from core.stream_parser import SectionStreamParser
+from core.structure_mapping import align_graphs, merge_alignments
+from core.token_budget import count_tokens, pack_by_budget, reduce_tree
+
+# Precompiled tokenizer for entity extraction: a content line is a stripped,
+# non-comment line, and an entity is a capitalized token of four or more characters
+_CONTENT_LINE = re.compile(r"^[^\S\n]*([^#\s][^\n]*?)\s*$", re.MULTILINE)
+_ENTITY_TOKEN = re.compile(r"(?<!\S)[A-Z]\S{3,}")
+
+# A numbered "1. Name: description" item in an LLM response
+_NUMBERED_ITEM = re.compile(r"^\d+[.)]\s*([^:]+):")
+
+def _extract_objects(story: str, limit: int = 5) -> List[str]:
+    """
+    Extract the key entities of a story in order of first appearance.
+    
+    Args:
+        story: A string containing the story text.
+        limit: Maximum number of entities to return.
+        
+    Returns:
+        Up to `limit` distinct entities.
+    """
+    objects: Dict[str, None] = {}
+    for match in _CONTENT_LINE.finditer(story):
+        line = match.group(1)
+        if len(line) <= 10:
+            continue
+        for entity in _ENTITY_TOKEN.findall(line):
+            objects[entity] = None
+            if len(objects) == limit:
+                return list(objects)
+    return list(objects)
 
 def initial_graph_construction(story: str) -> Dict[str, Any]:
     """
     Creates a simplified graph representation of a story.
     
     This function converts a story into a graph representation with objects
-    and their relationships (Phase 1: IGCP).
+    and their relationships (Phase 1: IGCP). The result is deterministic: the
+    objects are the first distinct entities in the order they appear.
     
     Args:
         story: A string containing the story text.
@@ -30,19 +71,8 @@ def initial_graph_construction(story: str) -> Dict[str, Any]:
     """
     # For the prototype, create a simplified graph representation
     
-    # Extract key entities (objects)
-    objects = []
-    for line in story.split('\n'):
-        line = line.strip()
-        if line and not line.startswith('#') and len(line) > 10:
-            # Extract potential entities from the line
-            words = line.split()
-            for word in words:
-                if word[0].isupper() and len(word) > 3 and word.lower() not in ['the', 'and', 'but']:
-                    objects.append(word)
-    
-    # Remove duplicates and limit to 5 key objects
-    objects = list(set(objects))[:5]
+    # Extract up to 5 key entities (objects)
+    objects = _extract_objects(story)
     
     # If no objects were found, extract nouns
     if not objects:
@@ -65,54 +95,297 @@ def initial_graph_construction(story: str) -> Dict[str, Any]:
     
     return graph
 
-def identify_common_relations(stories: List[str], llm_interface: LLMInterface) -> Dict[str, Any]:
+def _construct_graph_chunk(stories: List[str]) -> List[Dict[str, Any]]:
+    """Build the graphs for one chunk of stories (runs inside a worker process)."""
+    return [initial_graph_construction(story) for story in stories]
+
+def build_graphs(stories: Iterable[str], workers: Optional[int] = None,
+                 chunk_size: int = 256) -> Iterator[Dict[str, Any]]:
+    """
+    Build graphs for a whole corpus of stories (Phase 1: IGCP).
+    
+    Stories are grouped into chunks that are processed by a pool of worker
+    processes. Graphs are yielded lazily in the same order as the stories, and
+    only a bounded number of chunks is in flight at a time, so memory use stays
+    flat for arbitrarily large corpora. A corpus that fits in a single chunk,
+    or `workers <= 1`, is processed in the calling process.
+    
+    Args:
+        stories: An iterable of story texts.
+        workers: Number of worker processes. Defaults to the number of CPUs.
+        chunk_size: Number of stories sent to a worker at once.
+        
+    Yields:
+        The graph of each story, as returned by `initial_graph_construction`.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunks = _chunked(stories, chunk_size)
+    
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
+        return
+    second_chunk = next(chunks, None)
+    
+    if workers <= 1 or second_chunk is None:
+        for chunk in itertools.chain([first_chunk], [second_chunk] if second_chunk else [], chunks):
+            yield from _construct_graph_chunk(chunk)
+        return
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = deque()
+        for chunk in itertools.chain([first_chunk, second_chunk], chunks):
+            in_flight.append(executor.submit(_construct_graph_chunk, chunk))
+            if len(in_flight) >= 2 * workers:
+                yield from in_flight.popleft().result()
+        while in_flight:
+            yield from in_flight.popleft().result()
+
+def _chunked(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Group an iterable into lists of at most `size` items."""
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, max(1, size)))
+        if not chunk:
+            return
+        yield chunk
+
+def identify_common_relations(stories: List[str], llm_interface: LLMInterface,
+                              graphs: Optional[List[Dict[str, Any]]] = None,
+                              refine: bool = True) -> Dict[str, Any]:
     """
-    Uses the LLM to find common patterns and relationships between stories.
+    Finds common patterns and relationships between stories.
     
     This function implements Phase 2 (ICRS) of the analogical reasoning process.
+    The correspondences are computed locally by aligning the Phase 1 graphs;
+    the LLM is only asked to name the patterns behind the aligned structure.
     
     Args:
         stories: A list of story texts.
         llm_interface: An instance of LLMInterface for interacting with the LLM.
+        graphs: The Phase 1 graphs of the stories. Built from `stories` if omitted.
+        refine: Whether to ask the LLM to label the aligned structure.
         
     Returns:
         A mapping of objects/relationships that are common across stories.
     """
-    # Create a prompt for the LLM to identify common relations
-    prompt = "I'll provide you with multiple stories. Please identify common patterns, " \
-             "relationships, and structure between them:\n\n"
+    if graphs is None:
+        graphs = [initial_graph_construction(story) for story in stories]
     
-    for i, story in enumerate(stories, 1):
-        prompt += f"Story {i}:\n{story}\n\n"
+    # Decide from the graph sizes, before aligning, whether one prompt fits
+    if refine:
+        chunks = _labeling_chunks(graphs, llm_interface)
+        if len(chunks) > 1:
+            return _map_reduce_common_relations(graphs, chunks, llm_interface)
     
-    prompt += "Identify and list the common elements, relationships, and structural " \
-              "patterns across these stories. Format your response as a structured mapping."
+    # Align the story graphs locally
+    common_relations = align_graphs(graphs)
+    if not refine:
+        return common_relations
     
-    # Get response from LLM
+    # Create a compact prompt for the LLM to label the aligned structure
+    prompt = labeling_prompt(common_relations, len(graphs))
+    
+    # Get response from LLM and merge its pattern labels into the mapping
     response = llm_interface.generate_response(prompt)
+    _merge_pattern_labels(common_relations, [response])
     
-    # Parse the response into a structured mapping (in real implementation, this would
-    # require more sophisticated parsing)
+    return common_relations
+
+def _merge_pattern_labels(common_relations: Dict[str, Any], responses: List[str]) -> None:
+    """Append the pattern names found in LLM responses to the structural patterns."""
+    patterns = common_relations["structural_patterns"]
+    for response in responses:
+        for label in _parse_pattern_labels(response):
+            if label not in patterns:
+                patterns.append(label)
+
+def _labeling_cost(graph: Dict[str, Any]) -> int:
+    """
+    Bound the tokens a story's graph adds to a labeling prompt.
+    
+    Each object appears in at most one concept mapping as '- story_N: label',
+    and each relationship in at most one relationship mapping as its instance
+    'source relation target' under a '- relation:' line of its own.
+    """
+    return (sum(count_tokens(obj) + 3 for obj in graph.get("objects", [])) +
+            sum(count_tokens(rel["source"]) + 2 * count_tokens(rel["relation"]) +
+                count_tokens(rel["target"]) + 4 for rel in graph.get("relationships", [])))
+
+def _labeling_chunks(graphs: List[Dict[str, Any]],
+                     llm_interface: LLMInterface) -> List[List[int]]:
+    """
+    Pack stories into chunks whose labeling prompt fits the token budget.
+    
+    The prompt size is bounded from the graphs alone (see `_labeling_cost`),
+    so the decision is made before any alignment work.
+    
+    Args:
+        graphs: The Phase 1 graphs of the stories.
+        llm_interface: An instance of LLMInterface for interacting with the LLM.
+        
+    Returns:
+        The chunks as lists of story indices; a single chunk if one prompt fits.
+    """
+    empty = {"structural_patterns": [], "concept_mappings": [], "relationship_mappings": []}
+    overhead = labeling_prompt(empty, len(graphs)).tokens
+    costs = [_labeling_cost(graph) for graph in graphs]
+    return pack_by_budget(list(range(len(graphs))), costs,
+                          llm_interface.prompt_token_budget - overhead)
+
+def _map_reduce_common_relations(graphs: List[Dict[str, Any]], chunks: List[List[int]],
+                                 llm_interface: LLMInterface) -> Dict[str, Any]:
+    """
+    Phase 2 for corpora whose labeling prompt exceeds the token budget.
+    
+    Each chunk of stories (see `_labeling_chunks`) is aligned locally and
+    labeled by the LLM, with all chunk requests sent concurrently. The
+    partial alignments are then merged pairwise in a reduce tree; merging is
+    local, so it adds nothing to any prompt.
+    
+    Args:
+        graphs: The Phase 1 graphs of the stories.
+        chunks: The story indices of each chunk.
+        llm_interface: An instance of LLMInterface for interacting with the LLM.
+        
+    Returns:
+        A mapping of objects/relationships that are common across stories.
+    """
+    story_keys = [f"story_{i}" for i in range(1, len(graphs) + 1)]
+    
+    # Map: align each chunk locally and label all chunks concurrently
+    partials = []
+    prompts = []
+    for chunk in chunks:
+        alignment = align_graphs([graphs[i] for i in chunk],
+                                 story_keys=[story_keys[i] for i in chunk], min_stories=1)
+        partials.append((alignment, graphs[chunk[0]]))
+        prompts.append(labeling_prompt(alignment, len(chunk)))
+    responses = llm_interface.generate_batch(prompts)
+    
+    # Reduce: merge neighbouring partial alignments until one remains
+    def combine(level):
+        merged = []
+        for i in range(0, len(level), 2):
+            if i + 1 < len(level):
+                (left, left_reference), (right, right_reference) = level[i], level[i + 1]
+                merged.append((merge_alignments(left, left_reference, right, right_reference),
+                               left_reference))
+            else:
+                merged.append(level[i])
+        return merged
+    
+    alignment, _ = reduce_tree(partials, combine)
+    
+    # Keep only mappings shared by at least two stories
     common_relations = {
-        "structural_patterns": ["sequential_process", "problem_solution"],
-        "concept_mappings": [
-            {"story_1": "sorting_algorithm", "story_2": "database_indexing", "story_3": "software_pattern"},
-            {"story_1": "efficiency", "story_2": "performance", "story_3": "optimization"}
-        ],
-        "relationship_mappings": [
-            {"type": "improves", "instances": ["quicksort improves sorting speed", 
-                                            "indexing improves query performance", 
-                                            "pattern improves code organization"]}
-        ]
+        "structural_patterns": list(alignment["structural_patterns"]),
+        "concept_mappings": [mapping for mapping in alignment["concept_mappings"]
+                             if len(mapping) > 1],
+        "relationship_mappings": [relation for relation in alignment["relationship_mappings"]
+                                  if len(relation["instances"]) > 1]
     }
+    _merge_pattern_labels(common_relations, responses)
     
     return common_relations
 
+def _parse_pattern_labels(response: str) -> List[str]:
+    """
+    Extract pattern names from the 'Structural Patterns:' section of an LLM response.
+    
+    Args:
+        response: The LLM's response.
+        
+    Returns:
+        The pattern names in snake_case.
+    """
+    parser = SectionStreamParser()
+    events = parser.feed(response) + parser.close()
+    labels = []
+    for kind, section, line in events:
+        if kind == "item" and section == "structural_patterns":
+            label = _pattern_label(line)
+            if label:
+                labels.append(label)
+    return labels
+
+def _pattern_label(line: str) -> Optional[str]:
+    """Turn a numbered 'Name: description' item into a snake_case pattern name."""
+    match = _NUMBERED_ITEM.match(line)
+    if not match:
+        return None
+    return re.sub(r"[^a-z0-9]+", "_", match.group(1).lower()).strip("_")
+
+def identify_common_relations_stream(stories: List[str], llm_interface: LLMInterface,
+                                     graphs: Optional[List[Dict[str, Any]]] = None
+                                     ) -> Iterator[Tuple[str, Any]]:
+    """
+    Streaming variant of `identify_common_relations`.
+    
+    The LLM's labeling response is parsed as it streams in. The result is
+    complete as soon as the response's 'Structural Patterns' section ends, so
+    it is yielded then. Resuming the generator afterwards reads the rest of
+    the response, so that the call completes and is cached; `Pipeline.run`
+    does this on a worker thread while the next stage runs.
+    
+    Args:
+        stories: A list of story texts.
+        llm_interface: An instance of LLMInterface for interacting with the LLM.
+        graphs: The Phase 1 graphs of the stories. Built from `stories` if omitted.
+        
+    Yields:
+        ('alignment', mapping) once the local alignment is done, ('pattern', name)
+        for every pattern name the LLM adds, and finally ('result', mapping).
+    """
+    if graphs is None:
+        graphs = [initial_graph_construction(story) for story in stories]
+    
+    chunks = _labeling_chunks(graphs, llm_interface)
+    if len(chunks) > 1:
+        yield "result", _map_reduce_common_relations(graphs, chunks, llm_interface)
+        return
+    
+    common_relations = align_graphs(graphs)
+    yield "alignment", common_relations
+    
+    prompt = labeling_prompt(common_relations, len(graphs))
+    patterns = common_relations["structural_patterns"]
+    parser = SectionStreamParser()
+    chunks = llm_interface.generate_stream(prompt)
+    
+    def consume(events):
+        for kind, section, line in events:
+            if section != "structural_patterns":
+                continue
+            if kind == "end":
+                return True
+            label = _pattern_label(line)
+            if label and label not in patterns:
+                patterns.append(label)
+                yield "pattern", label
+        return False
+    
+    for chunk in chunks:
+        finished = yield from consume(parser.feed(chunk))
+        if finished:
+            break
+    else:
+        yield from consume(parser.close())
+    
+    yield "result", common_relations
+    
+    # The patterns are complete; the rest of the response is only read so the
+    # call finishes and is cached, and so backend errors reach the consumer
+    for _ in chunks:
+        pass
+
 def identify_alignable_differences(common_relations: Dict[str, Any]) -> Dict[str, Any]:
     """
     Identifies and marks non-identical relations in the mappings.
     
     This function implements Phase 3 (IADA) of the analogical reasoning process.
+    The mappings are converted to columns and the differences are computed with
+    vectorized operations; see `core.mapping_columns`. Use `AlignableDifferences`
+    directly to stream large results to disk instead of building this dictionary.
     
     Args:
         common_relations: The mapping of common relations across stories.
@@ -120,28 +393,8 @@ def identify_alignable_differences(common_relations: Dict[str, Any]) -> Dict[str
     Returns:
         A dictionary containing alignable differences.
     """
-    alignable_differences = {
-        "differences": []
-    }
-    
-    # Extract differences from concept mappings
-    for mapping in common_relations.get("concept_mappings", []):
-        alignable_differences["differences"].append({
-            "type": "concept_variation",
-            "variants": list(mapping.values()),
-            "common_abstract_concept": "improvement_mechanism"
-        })
-    
-    # Extract differences from relationship mappings
-    for relation in common_relations.get("relationship_mappings", []):
-        alignable_differences["differences"].append({
-            "type": "relationship_variation",
-            "relationship_type": relation.get("type", ""),
-            "variants": relation.get("instances", []),
-            "common_abstract_relation": "enhancement_process"
-        })
-    
-    return alignable_differences
+    columns = MappingColumns.from_common_relations(common_relations)
+    return AlignableDifferences(columns).to_dict()
 
 def re_represent_relations(common_relations: Dict[str, Any], llm_interface: LLMInterface) -> str:
     """
@@ -157,29 +410,96 @@ def re_represent_relations(common_relations: Dict[str, Any], llm_interface: LLMI
         A string containing the generalized principle.
     """
     # Create a prompt for the LLM
-    prompt = "Based on the following patterns and relationships identified across multiple stories:\n\n"
+    prompt = principle_prompt(common_relations)
+    if prompt.tokens > llm_interface.prompt_token_budget:
+        return _map_reduce_principle(common_relations, llm_interface)
     
-    # Add structural patterns
-    prompt += "Structural Patterns:\n"
-    for pattern in common_relations.get("structural_patterns", []):
-        prompt += f"- {pattern}\n"
+    # Get response from LLM
+    general_principle = llm_interface.generate_response(prompt)
     
-    # Add concept mappings
-    prompt += "\nConcept Mappings:\n"
-    for mapping in common_relations.get("concept_mappings", []):
-        prompt += f"- {', '.join([f'{k}: {v}' for k, v in mapping.items()])}\n"
+    return general_principle
+
+def re_represent_relations_stream(common_relations: Dict[str, Any],
+                                  llm_interface: LLMInterface) -> Iterator[Tuple[str, Any]]:
+    """
+    Streaming variant of `re_represent_relations`.
     
-    # Add relationship mappings
-    prompt += "\nRelationship Mappings:\n"
-    for relation in common_relations.get("relationship_mappings", []):
-        prompt += f"- Type: {relation.get('type', '')}\n"
-        prompt += f"  Instances: {', '.join(relation.get('instances', []))}\n"
+    Args:
+        common_relations: The mapping of common relations across stories.
+        llm_interface: An instance of LLMInterface for interacting with the LLM.
+        
+    Yields:
+        ('chunk', text) for every piece of the principle as it arrives, then
+        ('result', principle). A principle derived by map-reduce arrives as a
+        single chunk.
+    """
+    prompt = principle_prompt(common_relations)
+    if prompt.tokens > llm_interface.prompt_token_budget:
+        general_principle = _map_reduce_principle(common_relations, llm_interface)
+        yield "chunk", general_principle
+        yield "result", general_principle
+        return
     
-    prompt += "\nPlease abstract a general principle or concept that captures the essence " \
-              "of these patterns. This principle should be applicable to software engineering " \
-              "education and practice."
+    parts = []
+    for chunk in llm_interface.generate_stream(prompt):
+        parts.append(chunk)
+        yield "chunk", chunk
+    yield "result", "".join(parts)
+
+def _map_reduce_principle(common_relations: Dict[str, Any],
+                          llm_interface: LLMInterface) -> str:
+    """
+    Phase 4 for mappings whose prompt exceeds the token budget.
     
-    # Get response from LLM
-    general_principle = llm_interface.generate_response(prompt)
+    The mappings are packed into subsets whose prompt fits the budget and a
+    partial principle is abstracted from each subset concurrently. Partial
+    principles are then combined level by level, packing as many as fit the
+    budget into each combining prompt, until a single principle remains.
+    
+    Args:
+        common_relations: The mapping of common relations across stories.
+        llm_interface: An instance of LLMInterface for interacting with the LLM.
+        
+    Returns:
+        A string containing the generalized principle.
+        
+    Raises:
+        ValueError: If no two partial principles fit one combining prompt.
+    """
+    budget = llm_interface.prompt_token_budget
+    sections = ("structural_patterns", "concept_mappings", "relationship_mappings")
+    
+    # Map: split the mappings into subsets that fit the budget
+    items = [(section, entry) for section in sections
+             for entry in common_relations.get(section, [])]
+    costs = [principle_prompt({section: [entry]}).tokens for section, entry in items]
+    overhead = principle_prompt({}).tokens
+    chunks = pack_by_budget(items, [cost - overhead for cost in costs], budget - overhead)
+    
+    subsets = []
+    for chunk in chunks:
+        subset = {section: [] for section in sections}
+        for section, entry in chunk:
+            subset[section].append(entry)
+        subsets.append(subset)
+    principles = llm_interface.generate_batch([principle_prompt(subset) for subset in subsets])
+    
+    # Reduce: combine as many partial principles per prompt as the budget allows
+    combine_overhead = combine_principles_prompt([]).tokens
+    
+    def combine(level):
+        costs = [count_tokens(p) + 4 for p in level]
+        groups = pack_by_budget(level, costs, budget - combine_overhead)
+        if len(groups) == len(level):
+            # No neighbours fit one prompt together; re-split shortest first
+            order = sorted(range(len(level)), key=costs.__getitem__)
+            groups = pack_by_budget([level[i] for i in order], [costs[i] for i in order],
+                                    budget - combine_overhead)
+        if len(groups) == len(level):
+            raise ValueError(f"Partial principles are too long to combine within the "
+                             f"prompt token budget of {budget}; raise prompt_token_budget "
+                             f"or context_window, or lower max_tokens")
+        return llm_interface.generate_batch([combine_principles_prompt(group)
+                                             for group in groups])
     
-    return general_principle
\ No newline at end of file
+    return reduce_tree(principles, combine)
@@ -0,0 +1,326 @@
+# core/analogy_service.py
+"""
+This module runs the analogical reasoning engine as a long-running service.
+
+The service keeps the story corpus, the Phase 1 graphs and the LLMInterface
+warm in memory and accepts analogy jobs over a small HTTP/1.1 API on a TCP
+port or a Unix socket:
+
+    POST /jobs     {"target_domain": "...", "stories": [...]}   (stories optional)
+    GET  /health   queue depth, worker count and cache sizes
+    GET  /metrics  the LLM interface's metrics in Prometheus text format
+
+Jobs are queued on a bounded queue and executed by a fixed pool of workers.
+When the queue is full the service answers 503 with Retry-After instead of
+accepting unbounded work. Job progress and the result are streamed back as
+newline-delimited JSON events over a chunked response.
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+
+from core.analogical_reasoner import (
+    initial_graph_construction,
+    identify_common_relations,
+    identify_alignable_differences,
+    re_represent_relations
+)
+from core.graph_representation import StoryGraph, SymbolTable
+from core.llm_interface import LLMInterface
+from core.pipeline import content_digest
+from utils.story_generator import build_story_prompt
+
+# Largest request body accepted, in bytes
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+class AnalogyService:
+    """
+    Warm analogy engine with a bounded job queue and worker pool.
+    """
+
+    def __init__(self, config: Dict[str, Any], stories: List[str],
+                 llm: Optional[LLMInterface] = None, workers: int = 4,
+                 queue_size: int = 64, result_cache_size: int = 256):
+        """
+        Initialize the service and build the graphs of the initial corpus.
+
+        Args:
+            config: Configuration dictionary.
+            stories: The warm story corpus used when a job names no stories.
+            llm: LLM interface to share across jobs; created from config if omitted.
+            workers: Number of jobs executed concurrently.
+            queue_size: Maximum number of queued jobs before new ones are rejected.
+            result_cache_size: Number of phase results kept in memory.
+        """
+        self.config = config
+        self.llm = llm if llm is not None else LLMInterface(config)
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.corpus = list(stories)
+        # Compact graphs of the corpus stories, sharing the corpus's symbol table
+        self.symbols = SymbolTable()
+        self.graphs: Dict[str, StoryGraph] = {}
+        self.results: "OrderedDict[str, Any]" = OrderedDict()
+        self.result_cache_size = result_cache_size
+        self.job_ids = itertools.count(1)
+        self.active_jobs = 0
+        self.completed_jobs = 0
+        self._tasks: List[asyncio.Task] = []
+        self._lock = threading.Lock()
+
+        for story in self.corpus:
+            self.graphs[content_digest(story)] = StoryGraph.from_dict(
+                initial_graph_construction(story), self.symbols)
+
+    def _graph_for(self, story: str) -> Dict[str, Any]:
+        """
+        Return the Phase 1 graph of a story.
+
+        Graphs of corpus stories are decoded from the compact copies built at
+        startup; graphs of other stories are built for the job and not kept, so
+        the service's memory does not grow with the stories jobs submit.
+        """
+        graph = self.graphs.get(content_digest(story))
+        if graph is None:
+            return initial_graph_construction(story)
+        return graph.to_dict()
+
+    def _memoized(self, key: Any, compute) -> Any:
+        """Return a cached phase result or compute and cache it (LRU)."""
+        digest = content_digest(key)
+        with self._lock:
+            if digest in self.results:
+                self.results.move_to_end(digest)
+                return self.results[digest]
+        value = compute()
+        with self._lock:
+            self.results[digest] = value
+            if len(self.results) > self.result_cache_size:
+                self.results.popitem(last=False)
+        return value
+
+    def _reason(self, stories: List[str]) -> Tuple[Dict[str, Any], Dict[str, Any], str]:
+        """Run Phases 2-4 over a story set (executes on a worker thread)."""
+        graphs = [self._graph_for(story) for story in stories]
+        common_relations = self._memoized(
+            ("icrs", stories), lambda: identify_common_relations(stories, self.llm, graphs))
+        alignable_differences = identify_alignable_differences(common_relations)
+        principle = self._memoized(
+            ("rncr", common_relations), lambda: re_represent_relations(common_relations, self.llm))
+        return common_relations, alignable_differences, principle
+
+    async def start(self) -> None:
+        """Start the worker tasks."""
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Stop the worker tasks and release the thread pool."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False)
+
+    def submit(self, request: Dict[str, Any]) -> Optional[Tuple[int, asyncio.Queue]]:
+        """
+        Queue a job without waiting.
+
+        Args:
+            request: The job request: 'target_domain' and optional 'stories'.
+
+        Returns:
+            The job ID and the queue its events are published on, or None if
+            the job queue is full.
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        job_id = next(self.job_ids)
+        try:
+            self.queue.put_nowait((job_id, request, events))
+        except asyncio.QueueFull:
+            return None
+        return job_id, events
+
+    async def _worker(self) -> None:
+        """Execute queued jobs one at a time."""
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id, request, events = await self.queue.get()
+            self.active_jobs += 1
+            try:
+                await self._run_job(loop, job_id, request, events)
+            except Exception as e:
+                self.llm.metrics.increment("service_jobs_total", labels={"result": "failed"})
+                await events.put({"event": "error", "job_id": job_id, "message": str(e)})
+            else:
+                self.llm.metrics.increment("service_jobs_total", labels={"result": "completed"})
+            finally:
+                await events.put(None)
+                self.active_jobs -= 1
+                self.completed_jobs += 1
+                self.queue.task_done()
+
+    async def _run_job(self, loop: asyncio.AbstractEventLoop, job_id: int,
+                       request: Dict[str, Any], events: asyncio.Queue) -> None:
+        """Run one job, publishing progress events."""
+        await events.put({"event": "started", "job_id": job_id})
+
+        stories = request.get("stories") or self.corpus
+        target_story = request.get("target_story")
+        if not target_story:
+            target_domain = request.get("target_domain") or "software testing"
+            target_story = await self.llm.agenerate_response(build_story_prompt(target_domain))
+        await events.put({"event": "target_story", "job_id": job_id, "story": target_story})
+
+        stories = list(stories) + [target_story]
+        common_relations, alignable_differences, principle = await loop.run_in_executor(
+            self.executor, self._reason, stories)
+        await events.put({"event": "common_relations", "job_id": job_id,
+                          "common_relations": common_relations})
+        await events.put({"event": "alignable_differences", "job_id": job_id,
+                          "alignable_differences": alignable_differences})
+        await events.put({"event": "principle", "job_id": job_id, "principle": principle})
+
+    def health(self) -> Dict[str, Any]:
+        """Return the service status."""
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "queued_jobs": self.queue.qsize(),
+            "active_jobs": self.active_jobs,
+            "completed_jobs": self.completed_jobs,
+            "corpus_stories": len(self.corpus),
+            "cached_graphs": len(self.graphs),
+            "cached_results": len(self.results)
+        }
+
+    def metrics_text(self) -> str:
+        """Return the service and LLM metrics in the Prometheus text format."""
+        metrics = self.llm.metrics
+        metrics.set_gauge("service_queued_jobs", self.queue.qsize())
+        metrics.set_gauge("service_active_jobs", self.active_jobs)
+        metrics.set_gauge("service_cached_results", len(self.results))
+        self.llm.record_cache_metrics()
+        return metrics.to_prometheus()
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests on one client connection."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_BYTES:
+                    await _send_json(writer, 413, {"error": "request body too large"})
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                if method == "GET" and path == "/health":
+                    await _send_json(writer, 200, self.health())
+                elif method == "GET" and path == "/metrics":
+                    await _send_text(writer, 200, self.metrics_text())
+                elif method == "POST" and path == "/jobs":
+                    await self._handle_job(writer, body)
+                else:
+                    await _send_json(writer, 404, {"error": "not found"})
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_job(self, writer: asyncio.StreamWriter, body: bytes) -> None:
+        """Accept a job and stream its events back as NDJSON chunks."""
+        try:
+            request = json.loads(body or b"{}")
+        except json.JSONDecodeError as e:
+            await _send_json(writer, 400, {"error": f"invalid JSON: {e}"})
+            return
+
+        submitted = self.submit(request)
+        if submitted is None:
+            self.llm.metrics.increment("service_jobs_total", labels={"result": "rejected"})
+            await _send_json(writer, 503, {"error": "job queue is full"},
+                             extra_headers={"Retry-After": "1"})
+            return
+        job_id, events = submitted
+
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\n\r\n")
+        await _write_chunk(writer, {"event": "queued", "job_id": job_id,
+                                    "queue_position": self.queue.qsize()})
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            await _write_chunk(writer, event)
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+async def _write_chunk(writer: asyncio.StreamWriter, event: Dict[str, Any]) -> None:
+    """Write one NDJSON event as an HTTP chunk."""
+    data = (json.dumps(event) + "\n").encode("utf-8")
+    writer.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+    await writer.drain()
+
+async def _send_json(writer: asyncio.StreamWriter, status: int, payload: Any,
+                     extra_headers: Optional[Dict[str, str]] = None) -> None:
+    """Write a complete JSON response."""
+    reasons = {200: "OK", 400: "Bad Request", 404: "Not Found",
+               413: "Payload Too Large", 503: "Service Unavailable"}
+    body = json.dumps(payload).encode("utf-8")
+    head = f"HTTP/1.1 {status} {reasons.get(status, 'Error')}\r\n" \
+           f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+    for name, value in (extra_headers or {}).items():
+        head += f"{name}: {value}\r\n"
+    writer.write(head.encode("latin-1") + b"\r\n" + body)
+    await writer.drain()
+
+async def _send_text(writer: asyncio.StreamWriter, status: int, text: str) -> None:
+    """Write a complete plain-text response, as used by the Prometheus exposition format."""
+    body = text.encode("utf-8")
+    writer.write(f"HTTP/1.1 {status} OK\r\n"
+                 f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+    await writer.drain()
+
+async def serve(service: AnalogyService, host: str = "127.0.0.1", port: int = 8080,
+                unix_socket: Optional[str] = None) -> None:
+    """
+    Serve the analogy API until cancelled.
+
+    Args:
+        service: The service to expose.
+        host: TCP host to bind, when no Unix socket is given.
+        port: TCP port to bind, when no Unix socket is given.
+        unix_socket: Path of a Unix socket to listen on instead of TCP.
+    """
+    await service.start()
+    if unix_socket:
+        server = await asyncio.start_unix_server(service.handle_connection, path=unix_socket)
+        print(f"Analogy service listening on unix:{unix_socket}")
+    else:
+        server = await asyncio.start_server(service.handle_connection, host, port)
+        print(f"Analogy service listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
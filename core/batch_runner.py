@@ -0,0 +1,205 @@
+# core/batch_runner.py
+"""
+This module runs analogy jobs for many (source set, target domain) combinations.
+
+Jobs are enumerated from the configuration: every target domain is paired
+with every source subset of the story corpus (or with the whole corpus).
+The Phase 1 graphs of the corpus and of the target stories are built once in
+the parent process and handed to every worker process when it starts, as
+compact `StoryGraph`s sharing one symbol table per batch, so no worker
+rebuilds them. Workers share LLM responses through the persistent
+response cache. Each job's result is appended to a single JSON Lines file as
+soon as it finishes; a job that fails is recorded with its error and the
+batch carries on. Jobs are keyed by the content of their source stories, so
+results stay valid for resuming after stories are added or reordered.
+"""
+
+import itertools
+import json
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Set, Tuple
+
+from core.analogical_reasoner import (
+    build_graphs,
+    identify_common_relations,
+    identify_alignable_differences,
+    re_represent_relations
+)
+from core.graph_representation import StoryGraph, SymbolTable
+from core.llm_interface import LLMInterface
+from core.pipeline import content_digest
+from utils.story_generator import generate_stories
+
+# A job: (job key, target domain, indices of the source stories)
+Job = Tuple[str, str, Tuple[int, ...]]
+
+# Per-worker state, set by `_init_worker`
+_worker_state: Dict[str, Any] = {}
+
+def enumerate_jobs(stories: List[str], targets: List[str], source_size: Optional[int] = None,
+                   max_sources_per_target: Optional[int] = None) -> Iterator[Job]:
+    """
+    Enumerate (source set, target domain) jobs lazily.
+
+    A job's key is the target domain and a digest of its source stories'
+    contents, independent of their positions in the corpus.
+
+    Args:
+        stories: The story corpus.
+        targets: The target domains.
+        source_size: Number of stories in each source set, or None to use the
+                     whole corpus as the only source set.
+        max_sources_per_target: Maximum number of source sets per target, or None.
+
+    Yields:
+        Jobs in a deterministic order: by target, then by source set.
+    """
+    story_ids = [content_digest(story) for story in stories]
+
+    def source_sets() -> Iterable[Tuple[int, ...]]:
+        if source_size is None or source_size >= len(stories):
+            return [tuple(range(len(stories)))]
+        return itertools.combinations(range(len(stories)), source_size)
+
+    for target in targets:
+        for sources in itertools.islice(source_sets(), max_sources_per_target):
+            digest = content_digest(sorted(story_ids[i] for i in sources))[:32]
+            yield f"{target}|{digest}", target, sources
+
+def _init_worker(config: Dict[str, Any], stories: List[str], graphs: List[StoryGraph],
+                 target_stories: Dict[str, str],
+                 target_graphs: Dict[str, StoryGraph]) -> None:
+    """Receive the shared corpus and graphs and open this worker's LLM interface."""
+    _worker_state.update(
+        llm=LLMInterface(config),
+        stories=stories,
+        graphs=graphs,
+        target_stories=target_stories,
+        target_graphs=target_graphs
+    )
+
+def _run_job(job: Job) -> Dict[str, Any]:
+    """Run Phases 2-4 for one job in a worker process."""
+    key, target, sources = job
+    state = _worker_state
+    llm = state["llm"]
+    stories = [state["stories"][i] for i in sources] + [state["target_stories"][target]]
+    graphs = [state["graphs"][i].to_dict() for i in sources] + [
+        state["target_graphs"][target].to_dict()]
+
+    common_relations = identify_common_relations(stories, llm, graphs)
+    alignable_differences = identify_alignable_differences(common_relations)
+    principle = re_represent_relations(common_relations, llm)
+    return {
+        "job": key,
+        "target_domain": target,
+        "sources": list(sources),
+        "common_relations": common_relations,
+        "alignable_differences": alignable_differences,
+        "principle": principle
+    }
+
+def completed_jobs(output_path: str) -> Set[str]:
+    """
+    Read the keys of the jobs already completed in a results file.
+
+    Jobs recorded with an error are not completed and are run again.
+
+    Args:
+        output_path: Path of the JSON Lines results file.
+
+    Returns:
+        The job keys; empty if the file does not exist.
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+                if "error" not in record:
+                    done.add(record["job"])
+            except (json.JSONDecodeError, KeyError):
+                # A line cut short by an interrupted run is simply redone
+                continue
+    return done
+
+def run_batch(config: Dict[str, Any], stories: List[str], llm: LLMInterface,
+              output_path: str, workers: Optional[int] = None, resume: bool = False,
+              graphs: Optional[List[Dict[str, Any]]] = None) -> int:
+    """
+    Run every configured (source set, target domain) job on a process pool.
+
+    Args:
+        config: Configuration dictionary. Reads 'batch_targets' (defaults to
+                'story_domains'), 'batch_source_size', 'batch_max_sources_per_target'
+                and 'graph_workers'.
+        stories: The story corpus.
+        llm: LLM interface used to generate the target stories.
+        output_path: Path of the JSON Lines results file.
+        workers: Number of worker processes. Defaults to the number of CPUs.
+        resume: Keep the existing results file and skip the jobs it records.
+        graphs: The Phase 1 graphs of the stories, if already built.
+
+    Returns:
+        The number of jobs that completed.
+    """
+    targets = config.get("batch_targets") or config.get("story_domains", ["software testing"])
+    jobs = enumerate_jobs(stories, targets, config.get("batch_source_size"),
+                          config.get("batch_max_sources_per_target"))
+    done = completed_jobs(output_path) if resume else set()
+    jobs = (job for job in jobs if job[0] not in done)
+
+    # Phase 1 and target story generation happen once, before the workers start
+    if graphs is None:
+        graphs = list(build_graphs(stories, workers=config.get("graph_workers")))
+    target_stories = dict(zip(targets, generate_stories(targets, llm)))
+    target_graphs = dict(zip(targets, build_graphs([target_stories[t] for t in targets],
+                                                   workers=1)))
+    symbols = SymbolTable()
+    graphs = [StoryGraph.from_dict(graph, symbols) for graph in graphs]
+    target_graphs = {target: StoryGraph.from_dict(graph, symbols)
+                     for target, graph in target_graphs.items()}
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    workers = workers or os.cpu_count() or 1
+    count = failed = 0
+    with open(output_path, 'a' if resume else 'w', encoding='utf-8') as output, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(config, stories, graphs, target_stories,
+                                          target_graphs)) as executor:
+        # Keep a bounded number of jobs in flight so enumeration stays lazy
+        in_flight: Dict[Any, Job] = {}
+        pending = iter(jobs)
+        while True:
+            while len(in_flight) < 2 * workers:
+                job = next(pending, None)
+                if job is None:
+                    break
+                in_flight[executor.submit(_run_job, job)] = job
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                key, target, sources = in_flight.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Record the failure and keep going; --resume runs the job again
+                    failed += 1
+                    result = {"job": key, "target_domain": target, "sources": list(sources),
+                              "error": f"{type(e).__name__}: {e}"}
+                    print(f"Job {key} failed: {result['error']}")
+                else:
+                    count += 1
+                    print(f"Finished job {count}: {key}")
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+    if failed:
+        print(f"{failed} jobs failed; run again with --resume to retry them")
+    return count
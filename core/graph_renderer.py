@@ -0,0 +1,388 @@
+# core/graph_renderer.py
+"""
+This module renders story graphs and their cross-story alignment to SVG or DOT.
+
+The story graphs are combined into one corpus graph whose nodes are the
+entities of each story. Phase 2 concept mappings are overlaid as
+correspondence edges between the stories' entities, and they also act as
+weak springs in the layout, so corresponding concepts are drawn near each
+other.
+
+The layout is a Fruchterman-Reingold force simulation vectorized with NumPy.
+Repulsion is approximated on a grid of cells holding equal numbers of nodes:
+each node is repelled exactly by the nodes in its own cell and by the centre
+of mass of every other cell, which takes O(N * cells) rather than O(N^2)
+time per iteration.
+Output is written to disk in batches of elements as it is generated, so the
+document is never held in memory.
+"""
+
+import os
+import time
+from typing import Dict, List, Any, Iterator, NamedTuple, Optional, TextIO, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+# Story colours, cycled when there are more stories than colours
+PALETTE = ["#1f77b4", "#ff7f0e", "#2ca02c", "#9467bd", "#8c564b",
+           "#e377c2", "#17becf", "#bcbd22", "#7f7f7f", "#aec7e8"]
+
+# Colour of the Phase 2 correspondence overlay
+OVERLAY_COLOR = "#d62728"
+
+# Number of elements formatted per write
+_BATCH = 4096
+
+class CorpusGraph(NamedTuple):
+    """Story graphs combined into one graph with array-backed edges."""
+    labels: List[str]
+    stories: np.ndarray
+    story_keys: List[str]
+    sources: np.ndarray
+    targets: np.ndarray
+    relations: List[str]
+    overlay_sources: np.ndarray
+    overlay_targets: np.ndarray
+
+def combine_graphs(graphs: List[Dict[str, Any]],
+                   common_relations: Optional[Dict[str, Any]] = None,
+                   story_keys: Optional[List[str]] = None) -> CorpusGraph:
+    """
+    Combine story graphs and their concept mappings into one corpus graph.
+
+    Args:
+        graphs: Story graphs in the dictionary format produced by Phase 1.
+        common_relations: Phase 2 result whose 'concept_mappings' are overlaid.
+        story_keys: Keys naming each story in the mappings. Defaults to
+                    'story_1', 'story_2', ...
+
+    Returns:
+        The corpus graph.
+    """
+    if story_keys is None:
+        story_keys = [f"story_{i}" for i in range(1, len(graphs) + 1)]
+    labels: List[str] = []
+    stories: List[int] = []
+    sources: List[int] = []
+    targets: List[int] = []
+    relations: List[str] = []
+    node_index: Dict[Tuple[int, str], int] = {}
+
+    def node_for(story: int, label: str) -> int:
+        node = node_index.get((story, label))
+        if node is None:
+            node = node_index[(story, label)] = len(labels)
+            labels.append(label)
+            stories.append(story)
+        return node
+
+    for story, graph in enumerate(graphs):
+        for label in graph.get("objects", []):
+            node_for(story, label)
+        for rel in graph.get("relationships", []):
+            sources.append(node_for(story, rel["source"]))
+            targets.append(node_for(story, rel["target"]))
+            relations.append(rel["relation"])
+
+    # Overlay: link each mapped entity to the first story's counterpart in the mapping
+    story_number = {key: i for i, key in enumerate(story_keys)}
+    overlay_sources: List[int] = []
+    overlay_targets: List[int] = []
+    for mapping in (common_relations or {}).get("concept_mappings", []):
+        mapped = [node_index.get((story_number[key], str(value)))
+                  for key, value in mapping.items() if key in story_number]
+        mapped = [node for node in mapped if node is not None]
+        for node in mapped[1:]:
+            overlay_sources.append(mapped[0])
+            overlay_targets.append(node)
+
+    return CorpusGraph(
+        labels=labels,
+        stories=np.array(stories, dtype=np.int32),
+        story_keys=story_keys,
+        sources=np.array(sources, dtype=np.int64),
+        targets=np.array(targets, dtype=np.int64),
+        relations=relations,
+        overlay_sources=np.array(overlay_sources, dtype=np.int64),
+        overlay_targets=np.array(overlay_targets, dtype=np.int64)
+    )
+
+def _grid_repulsion(positions: np.ndarray, cell_occupancy: int,
+                    chunk: int = 2048) -> np.ndarray:
+    """
+    Approximate the repulsive displacement of every node.
+
+    The nodes are split into vertical strips of equal size by x, and each
+    strip into cells of equal size by y, so every cell holds about
+    `cell_occupancy` nodes however unevenly the layout is spread.
+
+    Args:
+        positions: Node positions, shape (N, 2).
+        cell_occupancy: Target number of nodes per grid cell.
+        chunk: Number of nodes whose far-field forces are computed at once.
+
+    Returns:
+        The displacement of each node, shape (N, 2).
+    """
+    count = len(positions)
+    strips = max(1, int(round(np.sqrt(count / cell_occupancy))))
+    strip = np.empty(count, dtype=np.int64)
+    strip[np.argsort(positions[:, 0], kind="stable")] = np.arange(count) * strips // count
+    order = np.lexsort((positions[:, 1], strip))
+    strip_sizes = np.bincount(strip, minlength=strips)
+    sorted_strip = strip[order]
+    rank = np.arange(count) - (np.cumsum(strip_sizes) - strip_sizes)[sorted_strip]
+    cells = np.empty(count, dtype=np.int64)
+    cells[order] = sorted_strip * strips + rank * strips // strip_sizes[sorted_strip]
+    grid_cells = strips * strips
+    counts = np.bincount(cells, minlength=grid_cells)
+
+    # Far field: every other cell acts as one mass at its centre
+    occupied = np.flatnonzero(counts)
+    masses = counts[occupied].astype(positions.dtype)
+    centers = np.stack([np.bincount(cells, positions[:, 0])[occupied],
+                        np.bincount(cells, positions[:, 1])[occupied]], axis=1) / masses[:, None]
+    column = np.full(grid_cells, -1, dtype=np.int64)
+    column[occupied] = np.arange(len(occupied))
+    own = column[cells]
+
+    # The sum over cells of w * (x - c) is x * sum(w) - w @ c, a matrix product;
+    # single precision is ample for the far field and halves its cost
+    displacement = np.zeros_like(positions)
+    points = positions.astype(np.float32)
+    centers = centers.astype(np.float32)
+    masses = masses.astype(np.float32)
+    center_norms = (centers ** 2).sum(axis=1)
+    for start in range(0, count, chunk):
+        stop = min(start + chunk, count)
+        block = points[start:stop]
+        squared = (block ** 2).sum(axis=1)[:, None] + center_norms[None, :] - 2 * block @ centers.T
+        weight = masses[None, :] / np.maximum(squared, 1e-6)
+        weight[np.arange(stop - start), own[start:stop]] = 0.0
+        displacement[start:stop] = block * weight.sum(axis=1)[:, None] - weight @ centers
+
+    # Near field: exact forces between the nodes of each cell, which are contiguous in order
+    sizes = counts[cells[order]]
+    starts = np.concatenate([[0], np.cumsum(counts)])[cells[order]]
+    firsts = np.repeat(np.cumsum(sizes) - sizes, sizes)
+    first = np.repeat(order, sizes)
+    second = order[np.repeat(starts, sizes) + np.arange(int(sizes.sum())) - firsts]
+    distinct = first != second
+    first, second = first[distinct], second[distinct]
+    delta = positions[first] - positions[second]
+    force = delta / ((delta ** 2).sum(axis=1) + 1e-6)[:, None]
+    displacement[:, 0] += np.bincount(first, force[:, 0], minlength=count)
+    displacement[:, 1] += np.bincount(first, force[:, 1], minlength=count)
+    return displacement
+
+def force_layout(num_nodes: int, sources: np.ndarray, targets: np.ndarray,
+                 weights: Optional[np.ndarray] = None, iterations: int = 50,
+                 seed: int = 0, cell_occupancy: int = 16,
+                 gravity: float = 0.05) -> np.ndarray:
+    """
+    Compute a force-directed layout.
+
+    The ideal edge length is 1 and nodes start uniformly at random in a
+    square of side sqrt(num_nodes). The step size cools linearly.
+
+    Args:
+        num_nodes: Number of nodes.
+        sources: Source node of each edge.
+        targets: Target node of each edge.
+        weights: Spring strength of each edge; defaults to 1.
+        iterations: Number of simulation steps.
+        seed: Seed of the initial positions.
+        cell_occupancy: Target number of nodes per repulsion grid cell.
+        gravity: Pull towards the centre that keeps components together.
+
+    Returns:
+        Node positions, shape (num_nodes, 2).
+    """
+    rng = np.random.default_rng(seed)
+    side = max(1.0, float(np.sqrt(num_nodes)))
+    positions = rng.random((num_nodes, 2)) * side
+    if num_nodes < 2:
+        return positions
+    if weights is None:
+        weights = np.ones(len(sources))
+
+    initial_step = side / 10
+    for step in range(iterations):
+        displacement = _grid_repulsion(positions, cell_occupancy)
+
+        # Springs pull endpoints together with force d^2 along the edge
+        delta = positions[sources] - positions[targets]
+        pull = delta * (np.sqrt((delta ** 2).sum(axis=1)) * weights)[:, None]
+        for axis in range(2):
+            displacement[:, axis] -= np.bincount(sources, pull[:, axis], minlength=num_nodes)
+            displacement[:, axis] += np.bincount(targets, pull[:, axis], minlength=num_nodes)
+        displacement -= gravity * (positions - positions.mean(axis=0))
+
+        # Limit each move to the current temperature
+        limit = initial_step * (1 - step / iterations)
+        length = np.sqrt((displacement ** 2).sum(axis=1)) + 1e-12
+        positions += displacement * (np.minimum(length, limit) / length)[:, None]
+    return positions
+
+def _batches(count: int) -> Iterator[range]:
+    """Split element indices into write batches."""
+    for start in range(0, count, _BATCH):
+        yield range(start, min(start + _BATCH, count))
+
+def write_svg(file: TextIO, corpus: CorpusGraph, positions: np.ndarray,
+              max_labels: int = 2000) -> None:
+    """
+    Stream a rendered corpus graph as SVG.
+
+    Args:
+        file: Text file to write to.
+        corpus: The corpus graph.
+        positions: Node positions from `force_layout`.
+        max_labels: Node labels are drawn only up to this many nodes; every
+                    node keeps a hover title.
+    """
+    count = len(corpus.labels)
+    scale = 24.0
+    low = positions.min(axis=0) if count else np.zeros(2)
+    points = (positions - low) * scale + 20 if count else positions
+    width, height = (points.max(axis=0) + 20).tolist() if count else (40.0, 40.0)
+    xs, ys = points[:, 0].tolist(), points[:, 1].tolist()
+
+    file.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" '
+               f'height="{height:.0f}" viewBox="0 0 {width:.0f} {height:.0f}" '
+               f'font-family="sans-serif" font-size="9">\n')
+    file.write('<rect width="100%" height="100%" fill="white"/>\n')
+
+    file.write('<g class="relations" stroke="#999" stroke-width="0.6">\n')
+    sources, targets = corpus.sources.tolist(), corpus.targets.tolist()
+    for batch in _batches(len(sources)):
+        file.write("".join(
+            f'<line x1="{xs[sources[i]]:.1f}" y1="{ys[sources[i]]:.1f}" '
+            f'x2="{xs[targets[i]]:.1f}" y2="{ys[targets[i]]:.1f}">'
+            f'<title>{escape(corpus.relations[i])}</title></line>\n' for i in batch))
+    file.write('</g>\n')
+
+    file.write(f'<g class="correspondences" stroke="{OVERLAY_COLOR}" stroke-width="1" '
+               f'stroke-dasharray="4 3" opacity="0.7">\n')
+    sources, targets = corpus.overlay_sources.tolist(), corpus.overlay_targets.tolist()
+    for batch in _batches(len(sources)):
+        file.write("".join(
+            f'<line x1="{xs[sources[i]]:.1f}" y1="{ys[sources[i]]:.1f}" '
+            f'x2="{xs[targets[i]]:.1f}" y2="{ys[targets[i]]:.1f}"/>\n' for i in batch))
+    file.write('</g>\n')
+
+    file.write('<g class="entities" stroke="white" stroke-width="0.5">\n')
+    stories = corpus.stories.tolist()
+    for batch in _batches(count):
+        file.write("".join(
+            f'<circle cx="{xs[i]:.1f}" cy="{ys[i]:.1f}" r="3" '
+            f'fill="{PALETTE[stories[i] % len(PALETTE)]}"><title>'
+            f'{escape(corpus.story_keys[stories[i]])}: {escape(corpus.labels[i])}'
+            f'</title></circle>\n' for i in batch))
+    file.write('</g>\n')
+
+    if count <= max_labels:
+        file.write('<g class="labels" fill="#333">\n')
+        for batch in _batches(count):
+            file.write("".join(
+                f'<text x="{xs[i] + 4:.1f}" y="{ys[i] + 3:.1f}">{escape(corpus.labels[i])}</text>\n'
+                for i in batch))
+        file.write('</g>\n')
+    file.write('</svg>\n')
+
+def _dot_string(text: str) -> str:
+    """Quote a string for DOT."""
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+def write_dot(file: TextIO, corpus: CorpusGraph, positions: np.ndarray) -> None:
+    """
+    Stream a rendered corpus graph as Graphviz DOT with pinned positions.
+
+    The positions are kept by `neato -n`, e.g. `neato -n -Tpng graphs.dot`.
+
+    Args:
+        file: Text file to write to.
+        corpus: The corpus graph.
+        positions: Node positions from `force_layout`.
+    """
+    file.write("digraph corpus {\n")
+    file.write('  graph [layout=neato, overlap=true, splines=false, outputorder=edgesfirst];\n')
+    file.write('  node [shape=circle, width=0.1, fixedsize=true, style=filled, fontsize=8];\n')
+    file.write('  edge [color="#999999", arrowsize=0.4, fontsize=6];\n')
+
+    # Clusters keep each story's nodes together in the output
+    order = np.argsort(corpus.stories, kind="stable")
+    boundaries = np.flatnonzero(np.diff(corpus.stories[order])) + 1
+    points = positions * 72.0
+    for group in np.split(order, boundaries) if len(order) else []:
+        story = int(corpus.stories[group[0]])
+        color = PALETTE[story % len(PALETTE)]
+        file.write(f"  subgraph cluster_{story} {{\n"
+                   f"    label={_dot_string(corpus.story_keys[story])};\n")
+        for batch in _batches(len(group)):
+            file.write("".join(
+                f'    n{node} [label={_dot_string(corpus.labels[node])}, fillcolor="{color}", '
+                f'pos="{points[node, 0]:.1f},{points[node, 1]:.1f}!"];\n'
+                for node in group[batch.start:batch.stop].tolist()))
+        file.write("  }\n")
+
+    sources, targets = corpus.sources.tolist(), corpus.targets.tolist()
+    for batch in _batches(len(sources)):
+        file.write("".join(
+            f"  n{sources[i]} -> n{targets[i]} [label={_dot_string(corpus.relations[i])}];\n"
+            for i in batch))
+    sources, targets = corpus.overlay_sources.tolist(), corpus.overlay_targets.tolist()
+    for batch in _batches(len(sources)):
+        file.write("".join(
+            f'  n{sources[i]} -> n{targets[i]} [style=dashed, color="{OVERLAY_COLOR}", '
+            f'dir=none, constraint=false];\n' for i in batch))
+    file.write("}\n")
+
+def render_graphs(graphs: List[Dict[str, Any]], output_path: str,
+                  common_relations: Optional[Dict[str, Any]] = None,
+                  story_keys: Optional[List[str]] = None, iterations: int = 50,
+                  seed: int = 0, overlay_weight: float = 0.5) -> Dict[str, Any]:
+    """
+    Lay out story graphs and write them to an SVG or DOT file.
+
+    Args:
+        graphs: Story graphs in the dictionary format produced by Phase 1.
+        output_path: Path of the output file; '.dot' or '.gv' writes DOT,
+                     anything else SVG.
+        common_relations: Phase 2 result whose concept mappings are overlaid.
+        story_keys: Keys naming each story in the mappings.
+        iterations: Number of layout steps.
+        seed: Seed of the initial layout.
+        overlay_weight: Spring strength of correspondence edges relative to
+                        relationship edges; 0 leaves them out of the layout.
+
+    Returns:
+        Node, edge and correspondence counts and the layout and write times.
+    """
+    corpus = combine_graphs(graphs, common_relations, story_keys)
+    start = time.perf_counter()
+    sources = np.concatenate([corpus.sources, corpus.overlay_sources])
+    targets = np.concatenate([corpus.targets, corpus.overlay_targets])
+    weights = np.concatenate([np.ones(len(corpus.sources)),
+                              np.full(len(corpus.overlay_sources), overlay_weight)])
+    positions = force_layout(len(corpus.labels), sources, targets, weights,
+                             iterations=iterations, seed=seed)
+    layout_seconds = time.perf_counter() - start
+
+    directory = os.path.dirname(output_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    start = time.perf_counter()
+    with open(output_path, 'w', encoding='utf-8') as file:
+        if output_path.endswith((".dot", ".gv")):
+            write_dot(file, corpus, positions)
+        else:
+            write_svg(file, corpus, positions)
+    return {
+        "nodes": len(corpus.labels),
+        "edges": len(corpus.relations),
+        "correspondences": len(corpus.overlay_sources),
+        "layout_seconds": layout_seconds,
+        "write_seconds": time.perf_counter() - start
+    }
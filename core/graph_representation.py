@@ -1,9 +1,19 @@
 # core/graph_representation.py
 """
 This module provides functions for working with story graphs.
+
+Graphs are exchanged between phases as plain dictionaries. For large corpora,
+`StoryGraph` offers a compact equivalent: node and relation labels are interned
+in a `SymbolTable` shared by the graphs of one corpus or job, and edges are
+stored in compressed sparse row (CSR) form using typed arrays. A table lives
+exactly as long as the graphs that use it, so long-running processes create
+one per corpus rather than sharing a global one.
 """
 
-from typing import Dict, List, Any
+from array import array
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+from core.graph_renderer import render_graphs
 
 def create_graph(objects: List[str], relationships: List[Dict[str, str]]) -> Dict[str, Any]:
     """
@@ -22,17 +32,274 @@ def create_graph(objects: List[str], relationships: List[Dict[str, str]]) -> Dic
         "relationships": relationships
     }
 
-def visualize_graph(graph: Dict[str, Any]) -> None:
+class SymbolTable:
     """
-    Placeholder for graph visualization functionality.
+    Interns labels so that each distinct string is stored once and referred
+    to by a small integer ID.
+    """
+    
+    __slots__ = ("_ids", "_labels")
+    
+    def __init__(self):
+        """Initialize an empty symbol table."""
+        self._ids: Dict[str, int] = {}
+        self._labels: List[str] = []
+    
+    def intern(self, label: str) -> int:
+        """
+        Return the ID of a label, adding it to the table if needed.
+        
+        Args:
+            label: The label to intern.
+            
+        Returns:
+            The label's integer ID.
+        """
+        symbol_id = self._ids.get(label)
+        if symbol_id is None:
+            symbol_id = len(self._labels)
+            self._ids[label] = symbol_id
+            self._labels.append(label)
+        return symbol_id
+    
+    def lookup(self, label: str) -> int:
+        """
+        Return the ID of a label without adding it to the table.
+        
+        Args:
+            label: The label to look up.
+            
+        Returns:
+            The label's integer ID.
+            
+        Raises:
+            KeyError: If the label has not been interned.
+        """
+        return self._ids[label]
+    
+    def label(self, symbol_id: int) -> str:
+        """Return the label for a symbol ID."""
+        return self._labels[symbol_id]
+    
+    def __len__(self) -> int:
+        return len(self._labels)
+
+class StoryGraph:
+    """
+    Compact, immutable story graph with interned labels and CSR adjacency.
+    
+    Nodes are numbered 0..num_nodes-1. The first `object_count` nodes are the
+    graph's objects in their original order; any further nodes are relationship
+    endpoints that are not listed as objects. Outgoing edges of node `i` occupy
+    positions `offsets[i]` to `offsets[i + 1]` of `targets` and `relations`.
+    `edge_order` remembers each edge's position in the original relationship
+    list so conversion back to the dictionary format is lossless.
+    """
+    
+    __slots__ = ("symbols", "nodes", "object_count", "offsets", "targets",
+                 "relations", "edge_order", "_index")
+    
+    def __init__(self, symbols: SymbolTable, nodes: array, object_count: int,
+                 offsets: array, targets: array, relations: array, edge_order: array):
+        """
+        Initialize a graph from prebuilt arrays. Use `from_dict` to build one
+        from the dictionary format.
+        
+        Args:
+            symbols: Symbol table holding node and relation labels.
+            nodes: Symbol ID of each node.
+            object_count: Number of leading nodes that are graph objects.
+            offsets: CSR row offsets, of length num_nodes + 1.
+            targets: Target node of each edge, grouped by source node.
+            relations: Relation symbol ID of each edge.
+            edge_order: Original relationship index of each edge.
+        """
+        self.symbols = symbols
+        self.nodes = nodes
+        self.object_count = object_count
+        self.offsets = offsets
+        self.targets = targets
+        self.relations = relations
+        self.edge_order = edge_order
+        self._index: Optional[Dict[int, int]] = None
     
-    In a real implementation, this would visualize the graph structure.
+    @classmethod
+    def from_dict(cls, graph: Dict[str, Any],
+                  symbols: Optional[SymbolTable] = None) -> "StoryGraph":
+        """
+        Build a compact graph from the dictionary format.
+        
+        Args:
+            graph: A dictionary with 'objects' and 'relationships' keys.
+            symbols: Symbol table to intern labels into, usually shared by the
+                     graphs of one corpus. Defaults to a new table of this graph alone.
+            
+        Returns:
+            The equivalent StoryGraph.
+        """
+        symbols = symbols if symbols is not None else SymbolTable()
+        relationships = graph.get("relationships", [])
+        
+        node_of: Dict[int, int] = {}
+        nodes = array("I")
+        
+        def node_for(label: str) -> int:
+            symbol_id = symbols.intern(label)
+            node = node_of.get(symbol_id)
+            if node is None:
+                node = len(nodes)
+                node_of[symbol_id] = node
+                nodes.append(symbol_id)
+            return node
+        
+        for obj in graph.get("objects", []):
+            node_for(obj)
+        object_count = len(nodes)
+        
+        edges = [(node_for(rel["source"]), node_for(rel["target"]),
+                  symbols.intern(rel["relation"]), position)
+                 for position, rel in enumerate(relationships)]
+        
+        # Counting sort of edges by source node keeps the build linear
+        offsets = array("I", [0]) * (len(nodes) + 1)
+        for source, _, _, _ in edges:
+            offsets[source + 1] += 1
+        for i in range(len(nodes)):
+            offsets[i + 1] += offsets[i]
+        
+        targets = array("I", [0]) * len(edges)
+        relations = array("I", [0]) * len(edges)
+        edge_order = array("I", [0]) * len(edges)
+        cursor = array("I", offsets[:-1])
+        for source, target, relation, position in edges:
+            slot = cursor[source]
+            cursor[source] += 1
+            targets[slot] = target
+            relations[slot] = relation
+            edge_order[slot] = position
+        
+        return cls(symbols, nodes, object_count, offsets, targets, relations, edge_order)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the graph back to the dictionary format.
+        
+        Returns:
+            A dictionary with 'objects' and 'relationships' keys, identical to
+            the one the graph was built from.
+        """
+        label = self.symbols.label
+        relationships: List[Optional[Dict[str, str]]] = [None] * len(self.targets)
+        for source in range(len(self.nodes)):
+            source_label = label(self.nodes[source])
+            for slot in range(self.offsets[source], self.offsets[source + 1]):
+                relationships[self.edge_order[slot]] = {
+                    "source": source_label,
+                    "target": label(self.nodes[self.targets[slot]]),
+                    "relation": label(self.relations[slot])
+                }
+        return create_graph(
+            [label(symbol_id) for symbol_id in self.nodes[:self.object_count]],
+            relationships
+        )
+    
+    @property
+    def num_nodes(self) -> int:
+        """Number of nodes in the graph."""
+        return len(self.nodes)
+    
+    @property
+    def num_edges(self) -> int:
+        """Number of edges in the graph."""
+        return len(self.targets)
+    
+    def node_label(self, node: int) -> str:
+        """Return the label of a node."""
+        return self.symbols.label(self.nodes[node])
+    
+    def node_index(self, label: str) -> int:
+        """
+        Return the node number of a label.
+        
+        Args:
+            label: The node label.
+            
+        Returns:
+            The node number.
+            
+        Raises:
+            KeyError: If the label is not a node of this graph.
+        """
+        if self._index is None:
+            self._index = {symbol_id: node for node, symbol_id in enumerate(self.nodes)}
+        return self._index[self.symbols.lookup(label)]
+    
+    def edges(self) -> Iterator[Tuple[int, int, int]]:
+        """
+        Iterate over the edges in their original relationship order.
+        
+        Yields:
+            (source node, target node, relation symbol ID) triples.
+        """
+        slot_of = array("I", [0]) * len(self.targets)
+        source_of = array("I", [0]) * len(self.targets)
+        for source in range(len(self.nodes)):
+            for slot in range(self.offsets[source], self.offsets[source + 1]):
+                slot_of[self.edge_order[slot]] = slot
+                source_of[slot] = source
+        for slot in slot_of:
+            yield source_of[slot], self.targets[slot], self.relations[slot]
+    
+    def degree(self, node: int) -> int:
+        """Return the out-degree of a node in O(1)."""
+        return self.offsets[node + 1] - self.offsets[node]
+    
+    def neighbors(self, node: int) -> Iterator[Tuple[int, int]]:
+        """
+        Iterate over the outgoing edges of a node.
+        
+        Args:
+            node: The source node number.
+            
+        Yields:
+            (target node, relation symbol ID) pairs.
+        """
+        for slot in range(self.offsets[node], self.offsets[node + 1]):
+            yield self.targets[slot], self.relations[slot]
+    
+    def nbytes(self) -> int:
+        """Return the approximate memory used by the graph's arrays, in bytes."""
+        return sum(arr.itemsize * len(arr) for arr in
+                   (self.nodes, self.offsets, self.targets, self.relations, self.edge_order))
+    
+    def __repr__(self) -> str:
+        return f"StoryGraph(nodes={self.num_nodes}, edges={self.num_edges})"
+
+def visualize_graph(graph: Dict[str, Any], output_path: Optional[str] = None,
+                    iterations: int = 50) -> Optional[Dict[str, Any]]:
+    """
+    Visualize a graph, as text or rendered to an SVG or DOT file.
     
     Args:
         graph: A dictionary representing the graph.
+        output_path: Path of the file to render to; '.dot' or '.gv' writes DOT,
+                     anything else SVG. If omitted, the graph is printed and no
+                     file is written.
+        iterations: Number of layout steps when rendering.
+    
+    Returns:
+        Node and edge counts and the layout and write times of a rendered
+        graph, or None if it was printed.
     """
-    print("Graph Visualization (placeholder):")
-    print(f"Objects: {', '.join(graph.get('objects', []))}")
-    print("Relationships:")
-    for rel in graph.get('relationships', []):
-        print(f"  {rel.get('source', '')} -- {rel.get('relation', '')} --> {rel.get('target', '')}")
\ No newline at end of file
+    if output_path is None:
+        print("Graph Visualization:")
+        print(f"Objects: {', '.join(graph.get('objects', []))}")
+        print("Relationships:")
+        for rel in graph.get('relationships', []):
+            print(f"  {rel.get('source', '')} -- {rel.get('relation', '')} --> {rel.get('target', '')}")
+        return None
+    
+    stats = render_graphs([graph], output_path, iterations=iterations)
+    print(f"Rendered {stats['nodes']} objects and {stats['edges']} relationships "
+          f"to {output_path}")
+    return stats
@@ -0,0 +1,437 @@
+# core/http_backend.py
+"""
+This module provides an HTTP backend for OpenAI-compatible chat completion APIs.
+
+Connections are kept alive and reused through a bounded pool, requests are
+paced by a client-side token-bucket rate limiter (requests per minute and
+tokens per minute), and 429/5xx responses are retried with exponential
+backoff and full jitter so that concurrent callers do not retry in lockstep.
+"""
+
+import asyncio
+import http.client
+import json
+import random
+import threading
+import time
+import urllib.parse
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional
+
+from core.token_budget import count_tokens
+
+# HTTP status codes that are worth retrying
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+class LLMBackendError(Exception):
+    """Raised when the LLM API returns an error that cannot be retried."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a fixed rate per minute.
+
+    Reservations may drive the level negative; the caller then waits until
+    the bucket has refilled, which serializes bursts without a background thread.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        """
+        Initialize a full bucket.
+
+        Args:
+            rate_per_minute: Refill rate.
+            capacity: Maximum burst size; defaults to one minute of refill.
+        """
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float) -> float:
+        """
+        Take `amount` from the bucket.
+
+        Args:
+            amount: Number of units to reserve.
+
+        Returns:
+            Seconds the caller must wait before using the reservation.
+        """
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        self.level -= amount
+        return max(0.0, -self.level / self.rate)
+
+class RateLimiter:
+    """
+    Client-side limiter for requests per minute and tokens per minute.
+    """
+
+    def __init__(self, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None):
+        """
+        Initialize the limiter. A limit of None disables that bucket.
+
+        Args:
+            requests_per_minute: Maximum request rate.
+            tokens_per_minute: Maximum token rate (prompt plus completion).
+        """
+        self._lock = threading.Lock()
+        self._requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    def reserve(self, tokens: int) -> float:
+        """
+        Reserve capacity for one request.
+
+        Args:
+            tokens: Estimated tokens used by the request.
+
+        Returns:
+            Seconds to wait before sending the request.
+        """
+        with self._lock:
+            wait = 0.0
+            if self._requests is not None:
+                wait = max(wait, self._requests.reserve(1))
+            if self._tokens is not None:
+                wait = max(wait, self._tokens.reserve(tokens))
+            return wait
+
+    def adjust(self, tokens: int) -> None:
+        """Correct the token bucket once the real usage of a request is known."""
+        if self._tokens is None or tokens == 0:
+            return
+        with self._lock:
+            self._tokens.level -= tokens
+
+class ConnectionPool:
+    """
+    Bounded pool of keep-alive HTTP connections to a single host.
+    """
+
+    def __init__(self, base_url: str, size: int = 8, timeout: float = 60.0):
+        """
+        Initialize an empty pool.
+
+        Args:
+            base_url: Base URL of the API, e.g. 'https://api.openai.com/v1'.
+            size: Maximum number of open connections.
+            timeout: Socket timeout in seconds.
+        """
+        parsed = urllib.parse.urlsplit(base_url)
+        self.scheme = parsed.scheme or "http"
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port
+        self.path_prefix = parsed.path.rstrip("/")
+        self.timeout = timeout
+        self.opened = 0
+        self._idle: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max(1, size))
+
+    def _connect(self) -> http.client.HTTPConnection:
+        """Open a new connection."""
+        connection_class = (http.client.HTTPSConnection if self.scheme == "https"
+                            else http.client.HTTPConnection)
+        with self._lock:
+            self.opened += 1
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    @contextmanager
+    def connection(self) -> Iterator[http.client.HTTPConnection]:
+        """
+        Borrow a connection, blocking while all of them are in use.
+
+        A connection that raises is closed instead of being returned to the pool.
+        """
+        self._slots.acquire()
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        if connection is None:
+            connection = self._connect()
+        try:
+            yield connection
+        except BaseException:
+            connection.close()
+            connection = None
+            raise
+        finally:
+            if connection is not None:
+                with self._lock:
+                    self._idle.append(connection)
+            self._slots.release()
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+class HTTPBackend:
+    """
+    Backend for OpenAI-compatible `/chat/completions` endpoints.
+    """
+
+    def __init__(self, base_url: str, api_key: str = "", pool_size: int = 8,
+                 requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None,
+                 max_retries: int = 5, backoff_base: float = 0.5,
+                 backoff_max: float = 30.0, timeout: float = 60.0):
+        """
+        Initialize the backend.
+
+        Args:
+            base_url: Base URL of the API, e.g. 'https://api.openai.com/v1'.
+            api_key: Bearer token sent with every request.
+            pool_size: Maximum number of keep-alive connections.
+            requests_per_minute: Client-side request rate limit, or None.
+            tokens_per_minute: Client-side token rate limit, or None.
+            max_retries: Retries after a retryable failure before giving up.
+            backoff_base: Backoff ceiling of the first retry, in seconds.
+            backoff_max: Maximum backoff ceiling, in seconds.
+            timeout: Socket timeout in seconds.
+        """
+        self.api_key = api_key
+        self.pool = ConnectionPool(base_url, pool_size, timeout)
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def complete(self, prompt: str, settings: Dict[str, Any]) -> str:
+        """
+        Send a chat completion request and return the response text.
+
+        Args:
+            prompt: The prompt to send as a single user message.
+            settings: Request settings (model, temperature, max_tokens).
+
+        Returns:
+            The content of the first choice.
+
+        Raises:
+            LLMBackendError: On a non-retryable error or when retries run out.
+        """
+        body = self._request_body(prompt, settings)
+        headers = self._headers()
+
+        estimated_tokens = count_tokens(prompt) + (settings.get("max_tokens") or 0)
+        wait = self.limiter.reserve(estimated_tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                with self.pool.connection() as connection:
+                    connection.request("POST", f"{self.pool.path_prefix}/chat/completions",
+                                       body=body, headers=headers)
+                    response = connection.getresponse()
+                    payload = response.read()
+                    status = response.status
+                    retry_after = response.getheader("Retry-After")
+            except (http.client.HTTPException, OSError) as e:
+                # Stale keep-alive connections and network errors are retried
+                status, payload = None, str(e).encode("utf-8")
+
+            if status == 200:
+                data = _decode_json(payload, status)
+                usage = data.get("usage", {}).get("total_tokens")
+                if usage is not None:
+                    self.limiter.adjust(usage - estimated_tokens)
+                return _message_content(data, status)
+
+            if status is not None and status not in RETRYABLE_STATUSES:
+                raise LLMBackendError(f"LLM API returned {status}: "
+                                      f"{payload[:200].decode('utf-8', 'replace')}", status)
+            if attempt == self.max_retries:
+                break
+            time.sleep(self._backoff(attempt, retry_after))
+
+        raise LLMBackendError(f"LLM API request failed after {self.max_retries + 1} attempts "
+                              f"(last status: {status})", status)
+
+    def stream(self, prompt: str, settings: Dict[str, Any]) -> Iterator[str]:
+        """
+        Send a streaming chat completion request and yield content as it arrives.
+
+        Server-sent events are parsed as they are received. A server that
+        ignores the `stream` flag and returns a complete JSON response is
+        handled too. Failures are retried only before the first chunk.
+
+        Args:
+            prompt: The prompt to send as a single user message.
+            settings: Request settings (model, temperature, max_tokens).
+
+        Yields:
+            Consecutive pieces of the content of the first choice.
+
+        Raises:
+            LLMBackendError: On a non-retryable error or when retries run out.
+        """
+        body = self._request_body(prompt, settings, stream=True)
+        headers = self._headers()
+
+        wait = self.limiter.reserve(count_tokens(prompt) + (settings.get("max_tokens") or 0))
+        if wait > 0:
+            time.sleep(wait)
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            with self.pool.connection() as connection:
+                try:
+                    connection.request("POST", f"{self.pool.path_prefix}/chat/completions",
+                                       body=body, headers=headers)
+                    response = connection.getresponse()
+                except (http.client.HTTPException, OSError) as e:
+                    # The connection reconnects on its next request
+                    connection.close()
+                    status, payload = None, str(e).encode("utf-8")
+                else:
+                    status = response.status
+                    if status == 200:
+                        yield from _read_stream(response)
+                        return
+                    payload = response.read()
+                    retry_after = response.getheader("Retry-After")
+
+            if status is not None and status not in RETRYABLE_STATUSES:
+                raise LLMBackendError(f"LLM API returned {status}: "
+                                      f"{payload[:200].decode('utf-8', 'replace')}", status)
+            if attempt == self.max_retries:
+                break
+            time.sleep(self._backoff(attempt, retry_after))
+
+        raise LLMBackendError(f"LLM API request failed after {self.max_retries + 1} attempts "
+                              f"(last status: {status})", status)
+
+    async def acomplete(self, prompt: str, settings: Dict[str, Any]) -> str:
+        """
+        Send a chat completion request without blocking the event loop.
+
+        The blocking request runs in a worker thread; concurrency is bounded by
+        the caller and by the connection pool.
+
+        Args:
+            prompt: The prompt to send as a single user message.
+            settings: Request settings (model, temperature, max_tokens).
+
+        Returns:
+            The content of the first choice.
+        """
+        return await asyncio.to_thread(self.complete, prompt, settings)
+
+    def _request_body(self, prompt: str, settings: Dict[str, Any], stream: bool = False) -> bytes:
+        """Encode the JSON body of a chat completion request."""
+        request = {
+            "model": settings.get("model"),
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": settings.get("temperature"),
+            "max_tokens": settings.get("max_tokens")
+        }
+        if stream:
+            request["stream"] = True
+        return json.dumps(request).encode("utf-8")
+
+    def _headers(self) -> Dict[str, str]:
+        """Return the headers sent with every request."""
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        """Return the delay before a retry: full jitter, at least Retry-After."""
+        ceiling = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        delay = random.uniform(0, ceiling)
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    def close(self) -> None:
+        """Close the pooled connections."""
+        self.pool.close()
+
+def _decode_json(payload: bytes, status: Optional[int]) -> Dict[str, Any]:
+    """
+    Decode a JSON response body.
+
+    Raises:
+        LLMBackendError: If the body is not a JSON object.
+    """
+    try:
+        data = json.loads(payload)
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise LLMBackendError(f"LLM API returned a response that is not JSON ({e}): "
+                              f"{payload[:200].decode('utf-8', 'replace')}", status) from None
+    if not isinstance(data, dict):
+        raise LLMBackendError(f"LLM API returned unexpected JSON: {str(data)[:200]}", status)
+    return data
+
+def _message_content(data: Dict[str, Any], status: Optional[int]) -> str:
+    """
+    Return the content of the first choice of a chat completion.
+
+    Raises:
+        LLMBackendError: If the response has no such content.
+    """
+    try:
+        return data["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        raise LLMBackendError(f"LLM API response has no message content: "
+                              f"{json.dumps(data)[:200]}", status) from None
+
+def _read_stream(response: http.client.HTTPResponse) -> Iterator[str]:
+    """
+    Yield the content deltas of a streamed chat completion response.
+
+    Raises:
+        LLMBackendError: If the stream is malformed or the connection fails mid-stream.
+    """
+    if not (response.getheader("Content-Type") or "").startswith("text/event-stream"):
+        try:
+            payload = response.read()
+        except (http.client.HTTPException, OSError) as e:
+            raise LLMBackendError(f"LLM API response was interrupted: {e}",
+                                  response.status) from e
+        yield _message_content(_decode_json(payload, response.status), response.status)
+        return
+
+    finished = False
+    try:
+        for raw_line in response:
+            line = raw_line.decode("utf-8", "replace").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                finished = True
+                break
+            event = _decode_json(data.encode("utf-8"), response.status)
+            try:
+                choice = event["choices"][0]
+                delta = choice.get("delta", {}).get("content")
+            except (KeyError, IndexError, TypeError, AttributeError):
+                raise LLMBackendError(f"LLM API sent a malformed stream event: {data[:200]}",
+                                      response.status) from None
+            finished = finished or bool(choice.get("finish_reason"))
+            if delta:
+                yield delta
+        # Drain the rest of the body so the connection can be reused
+        response.read()
+    except (http.client.HTTPException, OSError) as e:
+        # The stream cannot be retried once chunks have been passed on
+        raise LLMBackendError(f"LLM API stream was interrupted: {e}", response.status) from e
+    if not finished:
+        # http.client reports a truncated chunked body as a clean end of stream
+        raise LLMBackendError("LLM API stream ended before it was complete", response.status)
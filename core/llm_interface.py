@@ -2,41 +2,133 @@
 """
 This module handles interactions with the LLM.
 
-For the prototype, LLM calls are simulated.
-"""
+For the prototype, LLM calls are simulated. The simulated responses are
+provided by a pluggable backend so that a real transport can be swapped in
+later and so that artificial latency can be injected for offline measurements.
 
-from typing import Dict, Any
+To keep tail latency down, `LLMInterface` coalesces identical in-flight
+requests into one backend call, duplicates ("hedges") a call that is slower
+than a percentile of recent latencies, and enforces per-call deadlines.
+"""
 
-class LLMInterface:
+import asyncio
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from core.http_backend import HTTPBackend, LLMBackendError
+from core.metrics import Metrics, NULL_METRICS
+from core.response_cache import ResponseCache, create_cache
+from core.semantic_cache import SemanticCache, create_semantic_cache
+from core.token_budget import count_tokens
+from core.trace import create_replay_backend
+
+# A word and its trailing whitespace: the unit the simulated backend streams
+_STREAM_CHUNK = re.compile(r"\S+\s*|\s+")
+
+class SimulatedBackend:
     """
-    Interface for interacting with Large Language Models.
+    Backend that returns canned responses instead of calling a real LLM.
     """
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, latency: float = 0.0, stream_interval: float = 0.0,
+                 latency_sigma: float = 0.0, slow_rate: float = 0.0,
+                 slow_latency: float = 0.0, seed: Optional[int] = None):
         """
-        Initialize the LLM interface.
+        Initialize the simulated backend.
+        
+        The latency of each call is drawn from a distribution: `latency` is the
+        median, `latency_sigma` spreads it log-normally, and a `slow_rate`
+        fraction of calls takes `slow_latency` seconds longer, mimicking the
+        occasional straggler of a remote model.
         
         Args:
-            config: Configuration dictionary containing LLM settings.
+            latency: Artificial delay in seconds added to every call, used to
+                     mimic the round-trip time of a remote model.
+            stream_interval: Delay in seconds between streamed chunks, used to
+                             mimic a model's generation speed.
+            latency_sigma: Standard deviation of the log of the latency.
+            slow_rate: Fraction of calls that are stragglers.
+            slow_latency: Extra delay in seconds of a straggler.
+            seed: Seed of the latency distribution, for reproducible runs.
         """
-        self.api_key = config.get("api_key", "mock_api_key")
-        self.model = config.get("model", "gpt-3.5-turbo")
-        self.temperature = config.get("temperature", 0.7)
-        self.max_tokens = config.get("max_tokens", 1000)
+        self.latency = latency
+        self.stream_interval = stream_interval
+        self.latency_sigma = latency_sigma
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self._random = random.Random(seed)
+    
+    def sample_latency(self) -> float:
+        """Draw the delay of one call from the latency distribution."""
+        delay = self.latency
+        if delay > 0 and self.latency_sigma > 0:
+            delay *= self._random.lognormvariate(0.0, self.latency_sigma)
+        if self.slow_rate > 0 and self._random.random() < self.slow_rate:
+            delay += self.slow_latency
+        return delay
     
-    def generate_response(self, prompt: str) -> str:
+    def complete(self, prompt: str, settings: Dict[str, Any]) -> str:
         """
-        Generate a response from the LLM based on the given prompt.
+        Produce a simulated response, blocking for a sampled latency.
         
-        For the prototype, this returns a simulated response.
+        Args:
+            prompt: The prompt to respond to.
+            settings: Request settings (model, temperature, max_tokens).
+            
+        Returns:
+            The simulated response.
+        """
+        delay = self.sample_latency()
+        if delay > 0:
+            time.sleep(delay)
+        return self._respond(prompt)
+    
+    async def acomplete(self, prompt: str, settings: Dict[str, Any]) -> str:
+        """
+        Produce a simulated response without blocking the event loop.
         
         Args:
-            prompt: The prompt to send to the LLM.
+            prompt: The prompt to respond to.
+            settings: Request settings (model, temperature, max_tokens).
             
         Returns:
-            The LLM's response as a string.
+            The simulated response.
+        """
+        delay = self.sample_latency()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._respond(prompt)
+    
+    def stream(self, prompt: str, settings: Dict[str, Any]) -> Iterator[str]:
+        """
+        Produce a simulated response one word at a time.
+        
+        The first chunk arrives after a sampled latency and every later one
+        after `stream_interval` seconds.
+        
+        Args:
+            prompt: The prompt to respond to.
+            settings: Request settings (model, temperature, max_tokens).
+            
+        Yields:
+            Consecutive pieces of the simulated response.
         """
-        # Simulate LLM response based on the prompt
+        delay = self.sample_latency()
+        if delay > 0:
+            time.sleep(delay)
+        for i, match in enumerate(_STREAM_CHUNK.finditer(self._respond(prompt))):
+            if i and self.stream_interval > 0:
+                time.sleep(self.stream_interval)
+            yield match.group(0)
+    
+    def _respond(self, prompt: str) -> str:
+        """Select a simulated response based on the prompt."""
         if "identify common patterns" in prompt.lower():
             return self._simulate_pattern_identification()
         elif "abstract a general principle" in prompt.lower():
@@ -157,4 +249,533 @@ As the user base grew, performance issues started to emerge. The team began refa
 With continued growth, the monolithic approach became a bottleneck for both development and operations. After careful analysis, the team decided to migrate toward a microservices architecture, breaking down the application into smaller, independently deployable services.
 
 This architectural evolution taught the team valuable lessons about the trade-offs between development speed, architectural complexity, and system performance. They learned that software engineering is not just about coding solutions but about making appropriate decisions based on the current context and future growth expectations.
-"""
\ No newline at end of file
+"""
+
+class DeadlineExceeded(LLMBackendError):
+    """Raised when an LLM call does not finish within its deadline."""
+    
+    def __init__(self, deadline: float):
+        super().__init__(f"LLM call did not finish within {deadline:g}s")
+        self.deadline = deadline
+
+class LatencyTracker:
+    """
+    Sliding window of recent backend call latencies.
+    """
+    
+    def __init__(self, window: int = 200):
+        """
+        Initialize the tracker.
+        
+        Args:
+            window: Number of most recent latencies kept.
+        """
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return len(self._samples)
+    
+    def add(self, seconds: float) -> None:
+        """Record the latency of one call."""
+        with self._lock:
+            self._samples.append(seconds)
+    
+    def percentile(self, percent: float) -> Optional[float]:
+        """
+        Return a percentile of the recorded latencies.
+        
+        Args:
+            percent: Percentile between 0 and 100.
+            
+        Returns:
+            The nearest-rank percentile in seconds, or None if nothing was recorded.
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = math.ceil(percent / 100 * len(samples))
+        return samples[min(len(samples), max(1, rank)) - 1]
+
+def create_backend(config: Dict[str, Any]) -> Any:
+    """
+    Create the LLM backend described by the configuration.
+    
+    Args:
+        config: Configuration dictionary containing LLM settings.
+        
+    Returns:
+        A backend object exposing `complete`, `acomplete` and optionally `stream`.
+    """
+    backend_name = config.get("backend", "simulated")
+    if backend_name == "simulated":
+        return SimulatedBackend(latency=config.get("simulated_latency", 0.0),
+                                stream_interval=config.get("simulated_stream_interval", 0.0),
+                                latency_sigma=config.get("simulated_latency_sigma", 0.0),
+                                slow_rate=config.get("simulated_slow_rate", 0.0),
+                                slow_latency=config.get("simulated_slow_latency", 0.0),
+                                seed=config.get("simulated_seed"))
+    if backend_name == "http":
+        return HTTPBackend(
+            config.get("api_base", "https://api.openai.com/v1"),
+            api_key=config.get("api_key", ""),
+            pool_size=config.get("http_pool_size", config.get("max_concurrency", 8)),
+            requests_per_minute=config.get("requests_per_minute"),
+            tokens_per_minute=config.get("tokens_per_minute"),
+            max_retries=config.get("http_max_retries", 5),
+            timeout=config.get("http_timeout", 60.0)
+        )
+    if backend_name == "replay":
+        return create_replay_backend(config)
+    raise ValueError(f"Unknown LLM backend: {backend_name}")
+
+def _request_key(prompt: str, settings: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Return the key under which identical in-flight requests are coalesced."""
+    return (str(prompt),) + tuple(sorted(settings.items()))
+
+class LLMInterface:
+    """
+    Interface for interacting with Large Language Models.
+    """
+    
+    def __init__(self, config: Dict[str, Any], backend: Any = None,
+                 cache: Optional[ResponseCache] = None,
+                 metrics: Optional[Metrics] = None):
+        """
+        Initialize the LLM interface.
+        
+        Args:
+            config: Configuration dictionary containing LLM settings.
+            backend: Optional backend to use instead of the one named in the config.
+            cache: Optional response cache to use instead of the one named in the config.
+            metrics: Optional metrics registry recording call latency and sizes.
+        """
+        self.api_key = config.get("api_key", "mock_api_key")
+        self.model = config.get("model", "gpt-3.5-turbo")
+        self.temperature = config.get("temperature", 0.7)
+        self.max_tokens = config.get("max_tokens", 1000)
+        self.max_concurrency = config.get("max_concurrency", 8)
+        self.context_window = config.get("context_window", 8192)
+        self.prompt_token_budget = config.get("prompt_token_budget") or \
+            max(1, self.context_window - self.max_tokens)
+        self.backend = backend if backend is not None else create_backend(config)
+        self.cache = cache if cache is not None else create_cache(config)
+        self.semantic_cache: Optional[SemanticCache] = create_semantic_cache(config)
+        self.cache_bypass = config.get("cache_bypass", False)
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+        self.request_deadline = config.get("request_deadline")
+        self.hedge_percentile = config.get("hedge_percentile")
+        self.hedge_min_samples = config.get("hedge_min_samples", 20)
+        self.coalesce_requests = config.get("coalesce_requests", True)
+        self.latencies = LatencyTracker()
+        self._inflight: Dict[Tuple[Any, ...], Future] = {}
+        self._inflight_tasks: Dict[Tuple[Any, ...], "asyncio.Task[str]"] = {}
+        self._inflight_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
+    def _settings(self) -> Dict[str, Any]:
+        """Return the request settings passed to the backend."""
+        return {
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens
+        }
+    
+    def generate_response(self, prompt: str, deadline: Optional[float] = None) -> str:
+        """
+        Generate a response from the LLM based on the given prompt.
+        
+        For the prototype, this returns a simulated response. Concurrent calls
+        with the same prompt share one backend call, and a call slower than the
+        hedge delay is duplicated (see `hedge_delay`).
+        
+        Args:
+            prompt: The prompt to send to the LLM.
+            deadline: Seconds to wait for the response. Defaults to the
+                      configured `request_deadline`; None waits indefinitely.
+            
+        Returns:
+            The LLM's response as a string.
+            
+        Raises:
+            DeadlineExceeded: If no response arrived within the deadline.
+        """
+        settings = self._settings()
+        cached = self._cache_lookup(prompt, settings)
+        if cached is not None:
+            return cached
+        if deadline is None:
+            deadline = self.request_deadline
+        if not self.coalesce_requests:
+            return self._generate(prompt, settings, deadline)
+        
+        # Single flight: the first caller makes the call, later ones wait for it
+        key = _request_key(prompt, settings)
+        with self._inflight_lock:
+            shared = self._inflight.get(key)
+            leader = shared is None
+            if leader:
+                shared = self._inflight[key] = Future()
+        if not leader:
+            self.metrics.increment("llm_coalesced_requests_total")
+            try:
+                return shared.result(timeout=deadline)
+            except FutureTimeoutError:
+                raise DeadlineExceeded(deadline) from None
+        
+        try:
+            response = self._generate(prompt, settings, deadline)
+        except BaseException as error:
+            shared.set_exception(error)
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+        shared.set_result(response)
+        return response
+    
+    async def agenerate_response(self, prompt: str, deadline: Optional[float] = None) -> str:
+        """
+        Asynchronously generate a response from the LLM.
+        
+        Concurrent calls on the same event loop with the same prompt share one
+        backend call, and a call slower than the hedge delay is duplicated.
+        
+        Args:
+            prompt: The prompt to send to the LLM.
+            deadline: Seconds to wait for the response. Defaults to the
+                      configured `request_deadline`; None waits indefinitely.
+            
+        Returns:
+            The LLM's response as a string.
+            
+        Raises:
+            DeadlineExceeded: If no response arrived within the deadline.
+        """
+        settings = self._settings()
+        cached = await self._acache_lookup(prompt, settings)
+        if cached is not None:
+            return cached
+        if deadline is None:
+            deadline = self.request_deadline
+        if not self.coalesce_requests:
+            return await self._agenerate(prompt, settings, deadline)
+        
+        key = _request_key(prompt, settings)
+        task = self._inflight_tasks.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.metrics.increment("llm_coalesced_requests_total")
+            try:
+                return await asyncio.wait_for(asyncio.shield(task), deadline)
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(deadline) from None
+        
+        # Shielded, so a cancelled caller does not cancel the call others wait for
+        task = asyncio.ensure_future(self._agenerate(prompt, settings, deadline))
+        self._inflight_tasks[key] = task
+        task.add_done_callback(lambda done: self._forget_task(key, done))
+        return await asyncio.shield(task)
+    
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Return how long a call may take before it is duplicated.
+        
+        The delay is the configured `hedge_percentile` of recent backend
+        latencies, so only the slowest calls are hedged.
+        
+        Returns:
+            The delay in seconds, or None if hedging is disabled or fewer than
+            `hedge_min_samples` latencies have been recorded.
+        """
+        if self.hedge_percentile is None or len(self.latencies) < self.hedge_min_samples:
+            return None
+        return self.latencies.percentile(self.hedge_percentile)
+    
+    def _generate(self, prompt: str, settings: Dict[str, Any],
+                  deadline: Optional[float]) -> str:
+        """Make the backend call for a prompt, then record and cache the response."""
+        with self.metrics.timer("llm_call_seconds", {"mode": "sync"}):
+            response = self._complete_hedged(prompt, settings, deadline)
+        self._record_call(prompt, response)
+        self._cache_store(prompt, settings, response)
+        return response
+    
+    async def _agenerate(self, prompt: str, settings: Dict[str, Any],
+                         deadline: Optional[float]) -> str:
+        """Make the async backend call for a prompt, then record and cache the response."""
+        with self.metrics.timer("llm_call_seconds", {"mode": "async"}):
+            response = await self._acomplete_hedged(prompt, settings, deadline)
+        self._record_call(prompt, response)
+        await self._acache_store(prompt, settings, response)
+        return response
+    
+    def _complete_hedged(self, prompt: str, settings: Dict[str, Any],
+                         deadline: Optional[float]) -> str:
+        """
+        Call the backend, duplicating the call once it is slower than the hedge
+        delay and taking the first successful response.
+        """
+        delay = self.hedge_delay()
+        if delay is None and deadline is None:
+            return self._timed_complete(prompt, settings)
+        
+        # Calls run on a thread pool so that this thread can wait with a timeout
+        executor = self._thread_pool()
+        now = time.monotonic()
+        expires = None if deadline is None else now + deadline
+        hedge_at = None if delay is None else now + delay
+        primary = executor.submit(self._timed_complete, prompt, settings)
+        pending = {primary}
+        hedged = False
+        try:
+            while True:
+                wake = min((t for t in (hedge_at, expires) if t is not None), default=None)
+                timeout = None if wake is None else max(0.0, wake - time.monotonic())
+                done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        self._count_hedge_result(future is not primary, hedged)
+                        return future.result()
+                if not pending:
+                    raise done.pop().exception()
+                now = time.monotonic()
+                if expires is not None and now >= expires:
+                    self.metrics.increment("llm_deadline_exceeded_total")
+                    raise DeadlineExceeded(deadline)
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at, hedged = None, True
+                    self.metrics.increment("llm_hedged_requests_total")
+                    pending.add(executor.submit(self._timed_complete, prompt, settings))
+        finally:
+            for future in pending:
+                future.cancel()
+    
+    async def _acomplete_hedged(self, prompt: str, settings: Dict[str, Any],
+                                deadline: Optional[float]) -> str:
+        """Async counterpart of `_complete_hedged`."""
+        delay = self.hedge_delay()
+        if delay is None and deadline is None:
+            return await self._timed_acomplete(prompt, settings)
+        
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        expires = None if deadline is None else now + deadline
+        hedge_at = None if delay is None else now + delay
+        primary = asyncio.ensure_future(self._timed_acomplete(prompt, settings))
+        pending = {primary}
+        hedged = False
+        try:
+            while True:
+                wake = min((t for t in (hedge_at, expires) if t is not None), default=None)
+                timeout = None if wake is None else max(0.0, wake - loop.time())
+                done, pending = await asyncio.wait(pending, timeout=timeout,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._count_hedge_result(task is not primary, hedged)
+                        return task.result()
+                if not pending:
+                    raise done.pop().exception()
+                now = loop.time()
+                if expires is not None and now >= expires:
+                    self.metrics.increment("llm_deadline_exceeded_total")
+                    raise DeadlineExceeded(deadline)
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at, hedged = None, True
+                    self.metrics.increment("llm_hedged_requests_total")
+                    pending.add(asyncio.ensure_future(self._timed_acomplete(prompt, settings)))
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    def _timed_complete(self, prompt: str, settings: Dict[str, Any]) -> str:
+        """Call the backend and record the latency of the call for hedging."""
+        start = time.perf_counter()
+        response = self.backend.complete(prompt, settings)
+        self.latencies.add(time.perf_counter() - start)
+        return response
+    
+    async def _timed_acomplete(self, prompt: str, settings: Dict[str, Any]) -> str:
+        """Async counterpart of `_timed_complete`."""
+        start = time.perf_counter()
+        response = await self.backend.acomplete(prompt, settings)
+        self.latencies.add(time.perf_counter() - start)
+        return response
+    
+    def _count_hedge_result(self, hedge_won: bool, hedged: bool) -> None:
+        """Count which of a hedged pair of calls answered first."""
+        if hedged:
+            self.metrics.increment("llm_hedge_results_total",
+                                   labels={"winner": "hedge" if hedge_won else "primary"})
+    
+    def _thread_pool(self) -> ThreadPoolExecutor:
+        """Return the thread pool used for calls with a deadline or hedge."""
+        with self._inflight_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(2, 2 * self.max_concurrency),
+                                                    thread_name_prefix="llm-call")
+            return self._executor
+    
+    def _forget_task(self, key: Tuple[Any, ...], task: "asyncio.Task[str]") -> None:
+        """Drop a finished shared call, retrieving its error so it is never left unobserved."""
+        if self._inflight_tasks.get(key) is task:
+            del self._inflight_tasks[key]
+        if not task.cancelled():
+            task.exception()
+    
+    def generate_stream(self, prompt: str) -> Iterator[str]:
+        """
+        Generate a response from the LLM, yielding it in chunks as it arrives.
+        
+        A cached response is yielded as a single chunk, and backends without a
+        `stream` method yield their complete response at once. The response is
+        recorded and cached only once the stream has been read to the end.
+        
+        Args:
+            prompt: The prompt to send to the LLM.
+            
+        Yields:
+            Consecutive pieces of the LLM's response.
+        """
+        settings = self._settings()
+        cached = self._cache_lookup(prompt, settings)
+        if cached is not None:
+            yield cached
+            return
+        
+        stream = getattr(self.backend, "stream", None)
+        start = time.perf_counter()
+        if stream is not None:
+            chunks = stream(prompt, settings)
+        else:
+            chunks = iter([self.backend.complete(prompt, settings)])
+        parts: List[str] = []
+        for chunk in chunks:
+            if not parts:
+                self.metrics.observe("llm_first_chunk_seconds", time.perf_counter() - start)
+            parts.append(chunk)
+            yield chunk
+        self.metrics.observe("llm_call_seconds", time.perf_counter() - start, {"mode": "stream"})
+        
+        response = "".join(parts)
+        self._record_call(prompt, response)
+        self._cache_store(prompt, settings, response)
+    
+    def _cache_lookup(self, prompt: str, settings: Dict[str, Any]) -> Optional[str]:
+        """
+        Return the cached response for a request, if caching is active.
+        
+        The exact cache is consulted first, then the semantic tier for a
+        near-duplicate prompt.
+        """
+        if self.cache_bypass:
+            return None
+        response = self.cache.get(prompt, settings) if self.cache is not None else None
+        result = "hit"
+        if response is None and self.semantic_cache is not None:
+            response = self.semantic_cache.get(prompt, settings)
+            result = "semantic_hit"
+        if self.cache is not None or self.semantic_cache is not None:
+            self.metrics.increment("llm_cache_lookups_total",
+                                   labels={"result": "miss" if response is None else result})
+        return response
+    
+    def _caching(self) -> bool:
+        """Return whether any cache tier is active."""
+        return not self.cache_bypass and (self.cache is not None
+                                          or self.semantic_cache is not None)
+    
+    async def _acache_lookup(self, prompt: str, settings: Dict[str, Any]) -> Optional[str]:
+        """`_cache_lookup` for async callers; the SQLite tiers are read on a worker thread."""
+        if not self._caching():
+            return None
+        return await asyncio.to_thread(self._cache_lookup, prompt, settings)
+    
+    async def _acache_store(self, prompt: str, settings: Dict[str, Any], response: str) -> None:
+        """`_cache_store` for async callers; the SQLite tiers are written on a worker thread."""
+        if self._caching():
+            await asyncio.to_thread(self._cache_store, prompt, settings, response)
+    
+    def _record_call(self, prompt: str, response: str) -> None:
+        """Record the size of a backend call in the metrics registry."""
+        if not self.metrics.enabled:
+            return
+        self.metrics.increment("llm_calls_total")
+        self.metrics.increment("llm_prompt_chars_total", len(prompt))
+        self.metrics.increment("llm_response_chars_total", len(response))
+        self.metrics.increment("llm_prompt_tokens_total", getattr(prompt, "tokens", None)
+                               or count_tokens(prompt))
+        if getattr(prompt, "prefix_length", 0):
+            self.metrics.increment("llm_prompt_prefix_chars_total", prompt.prefix_length)
+        self.metrics.increment("llm_response_tokens_total", count_tokens(response))
+    
+    def _cache_store(self, prompt: str, settings: Dict[str, Any], response: str) -> None:
+        """Store a response in the cache tiers, if caching is active."""
+        if self.cache_bypass:
+            return
+        if self.cache is not None:
+            self.cache.put(prompt, settings, response)
+        if self.semantic_cache is not None:
+            self.semantic_cache.put(prompt, settings, response)
+    
+    async def agenerate_batch(self, prompts: List[str],
+                              max_concurrency: Optional[int] = None) -> List[str]:
+        """
+        Asynchronously generate responses for several prompts concurrently.
+        
+        Identical prompts are sent once. Prompts built by `core.prompts` are
+        dispatched grouped by their shared instruction prefix, so requests that
+        can reuse a provider's prefix cache are sent back to back.
+        
+        Args:
+            prompts: The prompts to send to the LLM.
+            max_concurrency: Maximum number of requests in flight at once.
+                             Defaults to the configured `max_concurrency`.
+            
+        Returns:
+            The responses, in the same order as the prompts.
+        """
+        limit = max_concurrency or self.max_concurrency
+        semaphore = asyncio.Semaphore(max(1, limit))
+        
+        async def bounded(prompt: str) -> str:
+            async with semaphore:
+                return await self.agenerate_response(prompt)
+        
+        unique = list(dict.fromkeys(prompts))
+        unique.sort(key=lambda prompt: getattr(prompt, "prefix_key", None) or "")
+        responses = await asyncio.gather(*(bounded(prompt) for prompt in unique))
+        by_prompt = dict(zip(unique, responses))
+        return [by_prompt[prompt] for prompt in prompts]
+    
+    def generate_batch(self, prompts: List[str],
+                       max_concurrency: Optional[int] = None) -> List[str]:
+        """
+        Generate responses for several prompts concurrently.
+        
+        This is a blocking wrapper around `agenerate_batch` and must not be called
+        from inside a running event loop; use `agenerate_batch` there instead.
+        
+        Args:
+            prompts: The prompts to send to the LLM.
+            max_concurrency: Maximum number of requests in flight at once.
+            
+        Returns:
+            The responses, in the same order as the prompts.
+        """
+        if not prompts:
+            return []
+        return asyncio.run(self.agenerate_batch(prompts, max_concurrency))
+    
+    def record_cache_metrics(self) -> None:
+        """Set the gauges describing the response caches from their current statistics."""
+        if not self.metrics.enabled:
+            return
+        if self.cache is not None:
+            stats = self.cache.stats()
+            self.metrics.set_gauge("llm_cache_hit_rate", stats["hit_rate"])
+            self.metrics.set_gauge("llm_cache_entries", stats["entries"])
+        if self.semantic_cache is not None:
+            stats = self.semantic_cache.stats()
+            self.metrics.set_gauge("llm_semantic_cache_hit_rate", stats["hit_rate"])
@@ -0,0 +1,328 @@
+# core/mapping_columns.py
+"""
+This module computes alignable differences (Phase 3: IADA) over columnar mappings.
+
+Concept and relationship mappings are converted once into NumPy columns of
+interned symbol IDs: a concepts x stories matrix for the concept mappings and
+one row per relationship instance (mapping, source, relation, target) for the
+relationship mappings. Variant counts, variant grouping and the abstraction
+shared by each mapping are then computed with sorting, `np.unique` and
+`np.searchsorted` over whole columns instead of per-mapping dictionaries.
+
+The shared abstraction is derived from the mappings themselves:
+
+- a concept's abstraction is the set of relation roles (e.g. being the source
+  of 'relates_to_0') that every one of its variants plays;
+- a relationship's abstraction is the relation label all of its instances
+  share, or the common stem of their labels if they differ.
+
+The original concept values and instance strings are kept next to the
+columns and returned unchanged as the variants. Results can be streamed to a
+JSON Lines file, and `to_dict` returns the original dictionary format of
+`identify_alignable_differences`.
+"""
+
+import json
+import os
+from typing import Dict, List, Any, Iterable, Iterator, Tuple
+
+import numpy as np
+
+from core.graph_representation import SymbolTable
+
+# Marker for a story that has no variant of a concept
+MISSING = -1
+
+# Abstractions reported when the mappings themselves share none
+DEFAULT_CONCEPT_ABSTRACTION = "improvement_mechanism"
+DEFAULT_RELATION_ABSTRACTION = "enhancement_process"
+
+def split_instance(instance: str, relation_labels: Iterable[str]) -> Tuple[str, str, str]:
+    """
+    Split a 'source relation target' instance string into its parts.
+
+    The instance is split around the first of `relation_labels` (tried
+    longest first) that occurs in it as a separate phrase, so entity labels
+    may contain spaces. Otherwise the first and last words are taken as the
+    entities and the words between them as the relation.
+
+    Args:
+        instance: The instance string.
+        relation_labels: Relation labels that may occur in the instance.
+
+    Returns:
+        The source, relation and target; missing parts are empty strings.
+    """
+    for relation in relation_labels:
+        source, separator, target = instance.partition(f" {relation} ")
+        if separator and source and target:
+            return source, relation, target
+    words = instance.split()
+    if len(words) < 2:
+        return instance, "", ""
+    return words[0], " ".join(words[1:-1]), words[-1]
+
+class MappingColumns:
+    """
+    Array-backed concept and relationship mappings.
+    """
+
+    def __init__(self, symbols: SymbolTable, story_keys: List[str], concepts: np.ndarray,
+                 relation_types: np.ndarray, instance_rows: np.ndarray,
+                 instance_sources: np.ndarray, instance_relations: np.ndarray,
+                 instance_targets: np.ndarray, concept_mappings: List[Dict[str, Any]],
+                 instances: List[List[str]]):
+        """
+        Initialize the columns.
+
+        Args:
+            symbols: Symbol table of every entity and relation label.
+            story_keys: Story key of each concept column.
+            concepts: int32 matrix of entity IDs, concepts x stories; MISSING where
+                      a story has no variant.
+            relation_types: int32 relation type ID of each relationship mapping.
+            instance_rows: int32 relationship mapping of each instance.
+            instance_sources: int32 source entity ID of each instance.
+            instance_relations: int32 relation label ID of each instance.
+            instance_targets: int32 target entity ID of each instance.
+            concept_mappings: The original concept mappings.
+            instances: The original instance strings of each relationship mapping.
+        """
+        self.symbols = symbols
+        self.story_keys = story_keys
+        self.concepts = concepts
+        self.relation_types = relation_types
+        self.instance_rows = instance_rows
+        self.instance_sources = instance_sources
+        self.instance_relations = instance_relations
+        self.instance_targets = instance_targets
+        self.concept_mappings = concept_mappings
+        self.instances = instances
+
+    @classmethod
+    def from_common_relations(cls, common_relations: Dict[str, Any]) -> "MappingColumns":
+        """
+        Convert Phase 2 mappings to columns.
+
+        Relationship instances are 'source relation target' strings, split with
+        `split_instance` around the relation labels of the mappings for the
+        columns; the strings themselves are kept unchanged.
+
+        Args:
+            common_relations: The mapping of common relations across stories.
+
+        Returns:
+            The columnar mappings.
+        """
+        symbols = SymbolTable()
+        intern = symbols.intern
+        concept_mappings = common_relations.get("concept_mappings", [])
+        story_keys = list(dict.fromkeys(key for mapping in concept_mappings for key in mapping))
+        key_index = {key: i for i, key in enumerate(story_keys)}
+
+        rows = [row for row, mapping in enumerate(concept_mappings) for _ in mapping]
+        columns = [key_index[key] for mapping in concept_mappings for key in mapping]
+        values = [intern(str(value)) for mapping in concept_mappings for value in mapping.values()]
+        concepts = np.full((len(concept_mappings), len(story_keys)), MISSING, dtype=np.int32)
+        concepts[rows, columns] = values
+
+        relationship_mappings = common_relations.get("relationship_mappings", [])
+        relation_types = np.array([intern(relation.get("type", ""))
+                                   for relation in relationship_mappings], dtype=np.int32)
+        instances = [list(relation.get("instances", [])) for relation in relationship_mappings]
+        relation_labels = sorted({relation.get("type", "") for relation in relationship_mappings}
+                                 - {""}, key=len, reverse=True)
+        parts = [(row, split_instance(instance, relation_labels))
+                 for row, row_instances in enumerate(instances) for instance in row_instances]
+        instance_rows = np.array([row for row, _ in parts], dtype=np.int32)
+        sources = np.array([intern(source) for _, (source, _, _) in parts], dtype=np.int32)
+        relations = np.array([intern(relation) for _, (_, relation, _) in parts], dtype=np.int32)
+        targets = np.array([intern(target) for _, (_, _, target) in parts], dtype=np.int32)
+        return cls(symbols, story_keys, concepts, relation_types, instance_rows,
+                   sources, relations, targets, [dict(mapping) for mapping in concept_mappings],
+                   instances)
+
+    def to_common_relations(self) -> Dict[str, Any]:
+        """Return the concept and relationship mappings in their original format."""
+        label = self.symbols.label
+        return {
+            "concept_mappings": [dict(mapping) for mapping in self.concept_mappings],
+            "relationship_mappings": [
+                {"type": label(int(relation_type)), "instances": list(instances)}
+                for relation_type, instances in zip(self.relation_types, self.instances)]
+        }
+
+    @property
+    def num_concepts(self) -> int:
+        return len(self.concepts)
+
+    @property
+    def num_relations(self) -> int:
+        return len(self.relation_types)
+
+class AlignableDifferences:
+    """
+    Vectorized Phase 3 results over `MappingColumns`.
+    """
+
+    def __init__(self, columns: MappingColumns):
+        """
+        Compute variant counts, variant groups and shared abstractions.
+
+        Args:
+            columns: The columnar mappings.
+        """
+        self.columns = columns
+        self._compute_concepts()
+        self._compute_relations()
+
+    def _compute_concepts(self) -> None:
+        """Count concept variants and find the relation roles they all share."""
+        columns = self.columns
+        concepts = columns.concepts
+        symbol_count = max(1, len(columns.symbols))
+
+        # Distinct variants per concept: sort each row and count value changes
+        ordered = np.sort(concepts, axis=1)
+        present = ordered != MISSING
+        changes = present.copy()
+        changes[:, 1:] &= ordered[:, 1:] != ordered[:, :-1]
+        self.concept_distinct = changes.sum(axis=1).astype(np.int32)
+
+        # Relation roles of every entity: (entity, 2 * relation + side), unique
+        role_count = 2 * symbol_count
+        entities = np.concatenate([columns.instance_sources, columns.instance_targets])
+        roles = np.concatenate([2 * columns.instance_relations,
+                                2 * columns.instance_relations + 1])
+        entity_roles = np.unique(entities.astype(np.int64) * role_count + roles)
+        role_entities, entity_role_ids = entity_roles // role_count, entity_roles % role_count
+
+        # Distinct (concept, entity) pairs
+        concept_rows, story_columns = np.nonzero(concepts != MISSING)
+        pairs = np.unique(concept_rows.astype(np.int64) * symbol_count
+                          + concepts[concept_rows, story_columns])
+        pair_rows, pair_entities = pairs // symbol_count, pairs % symbol_count
+        variant_counts = np.bincount(pair_rows, minlength=len(concepts))
+
+        # Expand every pair into the roles its entity plays
+        starts = np.searchsorted(role_entities, pair_entities, side="left")
+        counts = np.searchsorted(role_entities, pair_entities, side="right") - starts
+        total = int(counts.sum())
+        first = np.cumsum(counts) - counts
+        positions = np.repeat(starts - first, counts) + np.arange(total)
+        expanded_rows = np.repeat(pair_rows, counts)
+        expanded_roles = entity_role_ids[positions]
+
+        # A role is shared when every distinct variant of the concept plays it
+        keys, role_counts = np.unique(expanded_rows * role_count + expanded_roles,
+                                      return_counts=True)
+        key_rows = keys // role_count
+        shared = role_counts == variant_counts[key_rows]
+        self.concept_roles = (keys % role_count)[shared].astype(np.int32)
+        self.concept_role_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(key_rows[shared], minlength=len(concepts)))])
+
+    def _compute_relations(self) -> None:
+        """Group relationship instances by relation label and find their common stem."""
+        columns = self.columns
+        symbol_count = max(1, len(columns.symbols))
+
+        # Variant groups: distinct (mapping, relation label) pairs with instance counts
+        keys, group_counts = np.unique(
+            columns.instance_rows.astype(np.int64) * symbol_count + columns.instance_relations,
+            return_counts=True)
+        group_rows = keys // symbol_count
+        self.group_relations = (keys % symbol_count).astype(np.int32)
+        self.group_counts = group_counts.astype(np.int32)
+        self.group_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(group_rows, minlength=columns.num_relations))])
+        self.relation_distinct = np.diff(self.group_offsets).astype(np.int32)
+
+        # Mappings with a single label share it; only mixed ones need a string stem
+        label = columns.symbols.label
+        abstractions = np.where(self.relation_distinct == 1,
+                                self.group_relations[np.minimum(self.group_offsets[:-1],
+                                                                max(0, len(keys) - 1))]
+                                if len(keys) else columns.relation_types,
+                                columns.relation_types)
+        self.relation_abstractions = [label(int(symbol_id)) for symbol_id in abstractions]
+        for row in np.flatnonzero(self.relation_distinct > 1):
+            first, last = self.group_offsets[row], self.group_offsets[row + 1]
+            labels = [label(int(relation)) for relation in self.group_relations[first:last]]
+            stem = os.path.commonprefix(labels).rstrip("_0123456789 ")
+            if stem:
+                self.relation_abstractions[row] = stem
+
+    def role_label(self, role: int) -> str:
+        """Return the label of a relation role."""
+        side = "source" if role % 2 == 0 else "target"
+        return f"{side}_of_{self.columns.symbols.label(role // 2)}"
+
+    def concept_abstraction(self, row: int) -> str:
+        """
+        Return the abstraction shared by the variants of a concept mapping.
+
+        Args:
+            row: The concept mapping.
+
+        Returns:
+            The shared relation roles joined with '+', or
+            DEFAULT_CONCEPT_ABSTRACTION if the variants play no common role.
+        """
+        first, last = self.concept_role_offsets[row], self.concept_role_offsets[row + 1]
+        if first == last:
+            return DEFAULT_CONCEPT_ABSTRACTION
+        return "+".join(self.role_label(int(role)) for role in self.concept_roles[first:last])
+
+    def iter_differences(self) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the differences one at a time in the original dictionary format.
+
+        Concept variations come first, then relationship variations, each with
+        its number of distinct variants. The variants are the original concept
+        values and instance strings.
+        """
+        columns = self.columns
+        label = columns.symbols.label
+        for row in range(columns.num_concepts):
+            yield {
+                "type": "concept_variation",
+                "variants": list(columns.concept_mappings[row].values()),
+                "distinct_variants": int(self.concept_distinct[row]),
+                "common_abstract_concept": self.concept_abstraction(row)
+            }
+
+        for row in range(columns.num_relations):
+            first, last = self.group_offsets[row], self.group_offsets[row + 1]
+            yield {
+                "type": "relationship_variation",
+                "relationship_type": label(int(columns.relation_types[row])),
+                "variants": list(columns.instances[row]),
+                "distinct_variants": int(self.relation_distinct[row]),
+                "variant_groups": {label(int(relation)): int(count) for relation, count in
+                                   zip(self.group_relations[first:last],
+                                       self.group_counts[first:last])},
+                "common_abstract_relation": (self.relation_abstractions[row]
+                                             or DEFAULT_RELATION_ABSTRACTION)
+            }
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the differences in the format of `identify_alignable_differences`."""
+        return {"differences": list(self.iter_differences())}
+
+    def write_jsonl(self, path: str) -> int:
+        """
+        Stream the differences to a JSON Lines file, one per line.
+
+        Args:
+            path: Path of the file to write.
+
+        Returns:
+            The number of differences written.
+        """
+        count = 0
+        with open(path, 'w', encoding='utf-8') as file:
+            for difference in self.iter_differences():
+                file.write(json.dumps(difference) + "\n")
+                count += 1
+        return count
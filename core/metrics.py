@@ -0,0 +1,242 @@
+# core/metrics.py
+"""
+This module collects run metrics: counters, gauges and latency histograms.
+
+Metrics can be exported as a structured JSON report or in the Prometheus text
+exposition format. A disabled `Metrics` instance turns every call into a cheap
+no-op, so instrumented code needs no conditionals of its own.
+"""
+
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+
+# Default histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+def _label_key(labels: Optional[Dict[str, Any]]) -> LabelKey:
+    """Turn a label dictionary into a hashable, ordered key."""
+    if not labels:
+        return ()
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+class Histogram:
+    """
+    Cumulative-bucket histogram with count, sum, min and max.
+    """
+
+    __slots__ = ("buckets", "counts", "count", "total", "minimum", "maximum")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            buckets: Sorted bucket upper bounds.
+        """
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = float("-inf")
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def quantile(self, fraction: float) -> Optional[float]:
+        """
+        Estimate a quantile by linear interpolation inside its bucket.
+
+        Args:
+            fraction: Quantile as a fraction between 0 and 1.
+
+        Returns:
+            The estimate, or None if nothing was observed.
+        """
+        if self.count == 0:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else self.minimum
+                upper = self.buckets[i] if i < len(self.buckets) else self.maximum
+                lower, upper = max(lower, self.minimum), min(upper, self.maximum)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.maximum
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the histogram's statistics as a dictionary."""
+        return {
+            "count": self.count,
+            "sum": self.total,
+            "min": self.minimum if self.count else None,
+            "max": self.maximum if self.count else None,
+            "mean": self.total / self.count if self.count else None,
+            "p50": self.quantile(0.50),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99)
+        }
+
+class Metrics:
+    """
+    Registry of counters, gauges and histograms for a run.
+    """
+
+    def __init__(self, enabled: bool = True):
+        """
+        Initialize the registry.
+
+        Args:
+            enabled: If False, every recording call is a no-op.
+        """
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+
+    def increment(self, name: str, amount: float = 1,
+                  labels: Optional[Dict[str, Any]] = None) -> None:
+        """Add `amount` to a counter."""
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float,
+                  labels: Optional[Dict[str, Any]] = None) -> None:
+        """Set a gauge to `value`."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float,
+                labels: Optional[Dict[str, Any]] = None) -> None:
+        """Record an observation in a histogram."""
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(value)
+
+    def timer(self, name: str, labels: Optional[Dict[str, Any]] = None):
+        """
+        Return a context manager that records the duration of its block.
+
+        Args:
+            name: Histogram name, conventionally ending in '_seconds'.
+            labels: Optional labels of the series.
+
+        Returns:
+            A context manager.
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timed(name, labels)
+
+    @contextmanager
+    def _timed(self, name: str, labels: Optional[Dict[str, Any]]) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, labels)
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Build a structured report of every metric.
+
+        Returns:
+            A JSON-serializable dictionary.
+        """
+        def series(values, render):
+            return [{"labels": dict(key), **render(value)} for key, value in values.items()]
+
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "duration_s": time.time() - self.started_at,
+                "counters": {name: series(values, lambda v: {"value": v})
+                             for name, values in sorted(self._counters.items())},
+                "gauges": {name: series(values, lambda v: {"value": v})
+                           for name, values in sorted(self._gauges.items())},
+                "histograms": {name: series(values, Histogram.summary)
+                               for name, values in sorted(self._histograms.items())}
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            The exposition text.
+        """
+        lines: List[str] = []
+        with self._lock:
+            for kind, metrics in (("counter", self._counters), ("gauge", self._gauges)):
+                for name, values in sorted(metrics.items()):
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key, value in values.items():
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+
+            for name, values in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in values.items():
+                    cumulative = 0
+                    for bound, bucket_count in zip(histogram.buckets, histogram.counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{_format_labels(key, le=repr(bound))} "
+                                     f"{cumulative}")
+                    lines.append(f"{name}_bucket{_format_labels(key, le='+Inf')} "
+                                 f"{histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.total}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path: str) -> None:
+        """Write the JSON report to a file."""
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.report(), file, indent=2)
+
+    def write_prometheus(self, path: str) -> None:
+        """Write the Prometheus exposition text to a file."""
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(self.to_prometheus())
+
+def _format_labels(key: LabelKey, le: Optional[str] = None) -> str:
+    """Format a label key for the Prometheus exposition format."""
+    pairs = list(key)
+    if le is not None:
+        pairs.append(("le", le))
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+_NULL_TIMER = nullcontext()
+
+# Shared disabled registry used when no metrics are requested
+NULL_METRICS = Metrics(enabled=False)
@@ -0,0 +1,289 @@
+# core/pipeline.py
+"""
+This module runs the analogical reasoning phases as a small DAG of stages.
+
+Each stage output is checkpointed to disk under a content hash of the stage's
+inputs and the configuration values it depends on. On a resumed run, a stage
+whose hash matches an existing checkpoint is restored instead of executed,
+so only stages with changed inputs do any work.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Dict, List, Any, Callable, Iterator, NamedTuple, Optional, Sequence, Tuple
+from core.analogical_reasoner import (
+    build_graphs,
+    identify_common_relations,
+    identify_common_relations_stream,
+    identify_alignable_differences,
+    re_represent_relations,
+    re_represent_relations_stream
+)
+from core.llm_interface import LLMInterface
+from core.metrics import Metrics, NULL_METRICS
+
+class Stage(NamedTuple):
+    """A pipeline stage and the values it depends on."""
+    name: str
+    description: str
+    func: Callable[..., Any]
+    inputs: Tuple[str, ...]
+    config_keys: Tuple[str, ...] = ()
+    # Optional streaming variant of `func`: yields (event, payload) pairs
+    # ending with ('result', value)
+    stream: Optional[Callable[..., Iterator[Tuple[str, Any]]]] = None
+
+def content_digest(value: Any) -> str:
+    """
+    Compute a stable hash of a JSON-serializable value.
+
+    Args:
+        value: The value to hash.
+
+    Returns:
+        A hex SHA-256 digest.
+    """
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# Names of the reasoning pipeline stages, in execution order
+REASONING_STAGES = ("igcp", "icrs", "iada", "rncr")
+
+# Configuration values that change what the LLM-backed stages produce,
+# including which backend (and endpoint or recorded trace) answers the prompts
+LLM_CONFIG_KEYS = ("model", "temperature", "max_tokens", "prompt_token_budget", "context_window",
+                   "backend", "api_base", "trace_path")
+
+class _StreamFinisher(threading.Thread):
+    """
+    Worker thread that reads a stage's stream to its end after the stage's
+    result has been passed on, keeping any error for `Pipeline.run` to raise.
+    """
+
+    def __init__(self, stage_name: str, events: Iterator[Tuple[str, Any]]):
+        super().__init__(name=f"pipeline-{stage_name}-stream", daemon=True)
+        self.events = events
+        self.error: Optional[BaseException] = None
+
+    def run(self) -> None:
+        try:
+            for _ in self.events:
+                pass
+        except BaseException as e:
+            self.error = e
+
+class Pipeline:
+    """
+    Ordered DAG of stages with content-addressed checkpoints.
+    """
+
+    def __init__(self, stages: Sequence[Stage], config: Dict[str, Any],
+                 checkpoint_dir: Optional[str] = None, metrics: Optional[Metrics] = None):
+        """
+        Initialize the pipeline.
+
+        Args:
+            stages: The stages in execution order. A stage may only depend on
+                    pipeline inputs and on stages listed before it.
+            config: Configuration dictionary; stages hash the keys they name.
+            checkpoint_dir: Directory for stage checkpoints, or None to disable them.
+            metrics: Optional metrics registry recording per-stage timings.
+        """
+        self.stages = list(stages)
+        self.config = config
+        self.checkpoint_dir = checkpoint_dir
+        self.metrics = metrics if metrics is not None else NULL_METRICS
+
+    @property
+    def stage_names(self) -> List[str]:
+        """Names of the stages in execution order."""
+        return [stage.name for stage in self.stages]
+
+    def run(self, inputs: Dict[str, Any], resume: bool = False,
+            from_stage: Optional[str] = None,
+            on_event: Optional[Callable[[str, str, Any], None]] = None) -> Dict[str, Any]:
+        """
+        Execute the pipeline.
+
+        Args:
+            inputs: Values of the pipeline inputs, by name.
+            resume: Restore stages whose inputs are unchanged from checkpoints.
+            from_stage: Force this stage and every later stage to execute,
+                        restoring the earlier ones from checkpoints.
+            on_event: If given, stages with a streaming variant run it and
+                      report its events as on_event(stage, event, payload). A
+                      stage's result is passed on as soon as it is yielded,
+                      so the next stage can start while the stream finishes
+                      on a worker thread. The workers are joined before this
+                      method returns.
+
+        Returns:
+            All pipeline inputs and stage outputs, by name.
+
+        Raises:
+            ValueError: If `from_stage` is not a stage name or a stage depends
+                        on an unknown value.
+            Exception: Any error raised while a stage's stream finished.
+        """
+        if from_stage is not None and from_stage not in self.stage_names:
+            raise ValueError(f"Unknown stage: {from_stage}")
+
+        finishers: List[_StreamFinisher] = []
+        try:
+            values = self._run_stages(inputs, resume, from_stage, on_event, finishers)
+        finally:
+            for finisher in finishers:
+                finisher.join()
+        for finisher in finishers:
+            if finisher.error is not None:
+                raise finisher.error
+        return values
+
+    def _run_stages(self, inputs: Dict[str, Any], resume: bool, from_stage: Optional[str],
+                    on_event: Optional[Callable[[str, str, Any], None]],
+                    finishers: List[_StreamFinisher]) -> Dict[str, Any]:
+        """Execute the stages, adding the workers finishing their streams to `finishers`."""
+        values = dict(inputs)
+        digests = {name: content_digest(value) for name, value in inputs.items()}
+        forced = False
+
+        for step, stage in enumerate(self.stages, 1):
+            missing = [name for name in stage.inputs if name not in values]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown values: {missing}")
+
+            forced = forced or stage.name == from_stage
+            key = self._stage_key(stage, digests)
+            restorable = (resume or from_stage is not None) and not forced
+
+            output = None
+            if restorable:
+                with self.metrics.timer("stage_restore_seconds", {"stage": stage.name}):
+                    output = self._load_checkpoint(stage, key)
+            if output is not None:
+                print(f"Step {step}: {stage.description}... (restored from checkpoint)")
+                self.metrics.increment("stage_runs_total",
+                                       labels={"stage": stage.name, "result": "restored"})
+                values[stage.name] = output["value"]
+                digests[stage.name] = output["digest"]
+                continue
+
+            print(f"Step {step}: {stage.description}...")
+            with self.metrics.timer("stage_seconds", {"stage": stage.name}):
+                args = [values[name] for name in stage.inputs]
+                if on_event is not None and stage.stream is not None:
+                    value = self._run_stream(stage, args, on_event, finishers)
+                else:
+                    value = stage.func(*args)
+            self.metrics.increment("stage_runs_total",
+                                   labels={"stage": stage.name, "result": "executed"})
+            values[stage.name] = value
+            digests[stage.name] = content_digest(value)
+            self._save_checkpoint(stage, key, value, digests[stage.name])
+
+        return values
+
+    @staticmethod
+    def _run_stream(stage: Stage, args: List[Any], on_event: Callable[[str, str, Any], None],
+                    finishers: List[_StreamFinisher]) -> Any:
+        """
+        Run a stage's streaming variant, forwarding its events until the result.
+
+        The rest of the stream is read by a started `_StreamFinisher`, which is
+        added to `finishers`.
+        """
+        events = stage.stream(*args)
+        for event, payload in events:
+            if event == "result":
+                finisher = _StreamFinisher(stage.name, events)
+                finisher.start()
+                finishers.append(finisher)
+                return payload
+            on_event(stage.name, event, payload)
+        raise RuntimeError(f"Stage {stage.name} did not produce a result")
+
+    def _stage_key(self, stage: Stage, digests: Dict[str, str]) -> str:
+        """Hash a stage's identity, input contents and relevant config."""
+        return content_digest({
+            "stage": stage.name,
+            "inputs": [digests[name] for name in stage.inputs],
+            "config": {key: self.config.get(key) for key in stage.config_keys}
+        })
+
+    def _checkpoint_path(self, stage: Stage, key: str) -> str:
+        """Return the checkpoint file path of a stage run."""
+        return os.path.join(self.checkpoint_dir, f"{stage.name}-{key[:32]}.json")
+
+    def _load_checkpoint(self, stage: Stage, key: str) -> Optional[Dict[str, Any]]:
+        """Load a stage checkpoint, returning None if there is no usable one."""
+        if not self.checkpoint_dir:
+            return None
+        path = self._checkpoint_path(stage, key)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (json.JSONDecodeError, UnicodeDecodeError, IOError) as e:
+            print(f"Error loading checkpoint for {stage.name}: {e}")
+            return None
+
+    def _save_checkpoint(self, stage: Stage, key: str, value: Any, digest: str) -> None:
+        """Write a stage checkpoint atomically."""
+        if not self.checkpoint_dir:
+            return
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        path = self._checkpoint_path(stage, key)
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump({"stage": stage.name, "digest": digest, "value": value}, file)
+            os.replace(temp_path, path)
+        except (TypeError, IOError) as e:
+            print(f"Error saving checkpoint for {stage.name}: {e}")
+
+def create_reasoning_pipeline(llm: LLMInterface, config: Dict[str, Any],
+                              known_graph: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None
+                              ) -> Pipeline:
+    """
+    Create the four-phase analogical reasoning pipeline.
+
+    The pipeline takes a single input, 'stories', and produces the stages
+    'igcp' (graphs), 'icrs' (common relations), 'iada' (alignable differences)
+    and 'rncr' (general principle).
+
+    Args:
+        llm: An instance of LLMInterface for interacting with the LLM.
+        config: Configuration dictionary.
+        known_graph: Optional lookup returning a prebuilt graph for a story
+                     (e.g. from a snapshot), or None if it must be built.
+
+    Returns:
+        The configured Pipeline.
+    """
+    def construct_graphs(stories):
+        workers = config.get("graph_workers")
+        if known_graph is None:
+            return list(build_graphs(stories, workers=workers))
+        graphs = [known_graph(story) for story in stories]
+        built = build_graphs([story for story, graph in zip(stories, graphs) if graph is None],
+                             workers=workers)
+        return [graph if graph is not None else next(built) for graph in graphs]
+
+    stages = [
+        Stage("igcp", "Initial Graph Construction", construct_graphs, ("stories",)),
+        Stage("icrs", "Identifying Common Relations",
+              lambda stories, graphs: identify_common_relations(stories, llm, graphs),
+              ("stories", "igcp"), LLM_CONFIG_KEYS,
+              lambda stories, graphs: identify_common_relations_stream(stories, llm, graphs)),
+        Stage("iada", "Identifying Alignable Differences",
+              identify_alignable_differences,
+              ("icrs",)),
+        Stage("rncr", "Re-representation to Derive General Principle",
+              lambda common_relations: re_represent_relations(common_relations, llm),
+              ("icrs",), LLM_CONFIG_KEYS,
+              lambda common_relations: re_represent_relations_stream(common_relations, llm))
+    ]
+    return Pipeline(stages, config, config.get("checkpoint_dir"), metrics=llm.metrics)
@@ -0,0 +1,258 @@
+# core/prompts.py
+"""
+This module assembles the prompts sent to the LLM.
+
+Templates are compiled once, at import time, into literal segments and
+fields, with the token count of every literal segment precomputed. A
+`PromptBuilder` renders templates into a single list buffer that is joined
+once, keeping a running token count as it goes, so building a prompt is
+linear in its length and never re-tokenizes the instruction text.
+
+Every prompt starts with a fixed instruction block that does not depend on
+its inputs. The rendered `Prompt` records where that shared prefix ends and a
+digest of it, so the batching layer can group requests that share an
+instruction block and providers with prefix caching can reuse it.
+"""
+
+import hashlib
+import string
+from typing import Dict, List, Any, Iterable, Optional, Tuple
+
+from core.token_budget import count_tokens
+
+class Prompt(str):
+    """
+    A rendered prompt that knows its token count and shared prefix.
+
+    `Prompt` is a `str`, so it can be passed anywhere a prompt string is expected.
+    """
+
+    def __new__(cls, text: str, tokens: Optional[int] = None, prefix_length: int = 0,
+                prefix_key: Optional[str] = None):
+        prompt = super().__new__(cls, text)
+        prompt.tokens = tokens if tokens is not None else count_tokens(text)
+        prompt.prefix_length = prefix_length
+        prompt.prefix_key = prefix_key
+        return prompt
+
+    @property
+    def prefix(self) -> str:
+        """The instruction block shared by every prompt from the same template."""
+        return str.__getitem__(self, slice(0, self.prefix_length))
+
+class PromptTemplate:
+    """
+    A `str.format`-style template compiled into literal segments and fields.
+    """
+
+    def __init__(self, source: str):
+        """
+        Compile a template.
+
+        Args:
+            source: Template text with `{field}` or `{field:spec}` placeholders.
+        """
+        self.source = source
+        self.segments: List[Tuple[str, int, Optional[str], str]] = []
+        for literal, field, spec, conversion in string.Formatter().parse(source):
+            if conversion:
+                raise ValueError(f"conversions are not supported in prompt templates: {source!r}")
+            self.segments.append((literal, count_tokens(literal), field, spec or ""))
+
+        # Leading literal text shared by every rendering of the template
+        self.prefix = self.segments[0][0] if self.segments else ""
+        self.prefix_tokens = count_tokens(self.prefix)
+        self.prefix_key = hashlib.sha256(self.prefix.encode("utf-8")).hexdigest()
+
+    def render(self, **values: Any) -> Prompt:
+        """
+        Render the template on its own.
+
+        Args:
+            **values: Values of the template's fields.
+
+        Returns:
+            The rendered prompt.
+        """
+        builder = PromptBuilder()
+        builder.render(self, **values)
+        return builder.build()
+
+class PromptBuilder:
+    """
+    Incremental prompt buffer with a running token count.
+    """
+
+    def __init__(self):
+        """Initialize an empty buffer."""
+        self._parts: List[str] = []
+        self.tokens = 0
+        self._length = 0
+        self._prefix: Optional[Tuple[int, str]] = None
+
+    def write(self, text: str) -> "PromptBuilder":
+        """Append literal text."""
+        self._parts.append(text)
+        self._length += len(text)
+        self.tokens += count_tokens(text)
+        return self
+
+    def render(self, template: PromptTemplate, **values: Any) -> "PromptBuilder":
+        """
+        Append a rendered template.
+
+        If nothing has been written yet, the template's leading literal text
+        becomes the shared prefix of the prompt.
+
+        Args:
+            template: A compiled template.
+            **values: Values of the template's fields.
+        """
+        if self._length == 0 and self._prefix is None:
+            self._prefix = (len(template.prefix), template.prefix_key)
+        parts = self._parts
+        for literal, literal_tokens, field, spec in template.segments:
+            if literal:
+                parts.append(literal)
+                self._length += len(literal)
+                self.tokens += literal_tokens
+            if field is not None:
+                value = format(values[field], spec)
+                parts.append(value)
+                self._length += len(value)
+                self.tokens += count_tokens(value)
+        return self
+
+    def render_each(self, template: PromptTemplate,
+                    rows: Iterable[Dict[str, Any]]) -> "PromptBuilder":
+        """Append one rendering of a template per row of field values."""
+        for row in rows:
+            self.render(template, **row)
+        return self
+
+    def build(self) -> Prompt:
+        """
+        Join the buffer into a prompt.
+
+        Returns:
+            The prompt, with its token count and shared prefix.
+        """
+        prefix_length, prefix_key = self._prefix or (0, None)
+        return Prompt("".join(self._parts), self.tokens, prefix_length, prefix_key)
+
+# Phase 2: ask the LLM to name the patterns of an alignment
+LABELING_INSTRUCTIONS = PromptTemplate(
+    "Please identify common patterns in the structural correspondences below, which were "
+    "found across several stories. Name the structural patterns these correspondences "
+    "share. List them under a 'Structural Patterns:' heading as numbered "
+    "'Name: description' items.\n\n"
+    "Correspondences found across {story_count} stories.\n\nConcept Mappings:\n"
+)
+LABELING_CONCEPT = PromptTemplate("- {pairs}\n")
+LABELING_RELATION = PromptTemplate("- {type}: {instances}\n")
+
+# Phase 4: ask the LLM to abstract a principle from the mappings
+PRINCIPLE_INSTRUCTIONS = PromptTemplate(
+    "Please abstract a general principle or concept that captures the essence of the "
+    "patterns and relationships below, which were identified across multiple stories. "
+    "This principle should be applicable to software engineering education and practice.\n\n"
+    "Structural Patterns:\n"
+)
+PRINCIPLE_PATTERN = PromptTemplate("- {pattern}\n")
+PRINCIPLE_CONCEPT = PromptTemplate("- {pairs}\n")
+PRINCIPLE_RELATION = PromptTemplate("- Type: {type}\n  Instances: {instances}\n")
+
+# Phase 4 map-reduce: ask the LLM to unify partial principles
+COMBINE_INSTRUCTIONS = PromptTemplate(
+    "Please abstract a general principle or concept that unifies the principles below. "
+    "Each of them was abstracted from a different subset of the patterns and relationships "
+    "identified across multiple stories. This principle should be applicable to software "
+    "engineering education and practice.\n\n"
+)
+COMBINE_PRINCIPLE = PromptTemplate("Principle {number}:\n{principle}\n\n")
+
+# Story generation
+STORY_INSTRUCTIONS = PromptTemplate(
+    "\nGenerate an educational story about the domain below in the context of software engineering.\n"
+    "The story should:\n"
+    "1. Include some named characters facing a software engineering challenge\n"
+    "2. Show a progression from a basic approach to a more sophisticated solution\n"
+    "3. Highlight trade-offs and decision-making processes\n"
+    "4. Convey a key lesson or principle about the domain\n"
+    "5. Be concise (about 250-350 words)\n\n"
+    "Domain: {domain}\n"
+)
+
+def _pairs(mapping: Dict[str, Any]) -> str:
+    """Format a concept mapping as 'key: value' pairs."""
+    return ", ".join(f"{key}: {value}" for key, value in mapping.items())
+
+def labeling_prompt(common_relations: Dict[str, Any], story_count: int) -> Prompt:
+    """
+    Build the prompt asking the LLM to name the patterns of an alignment.
+
+    Args:
+        common_relations: The alignment to label.
+        story_count: Number of stories the alignment covers.
+
+    Returns:
+        The prompt.
+    """
+    builder = PromptBuilder().render(LABELING_INSTRUCTIONS, story_count=story_count)
+    builder.render_each(LABELING_CONCEPT, ({"pairs": _pairs(mapping)}
+                                           for mapping in common_relations["concept_mappings"]))
+    builder.write("\nRelationship Mappings:\n")
+    builder.render_each(LABELING_RELATION, ({"type": relation["type"],
+                                             "instances": "; ".join(relation["instances"])}
+                                            for relation in common_relations["relationship_mappings"]))
+    return builder.build()
+
+def principle_prompt(common_relations: Dict[str, Any]) -> Prompt:
+    """
+    Build the prompt asking the LLM to abstract a principle from the mappings.
+
+    Args:
+        common_relations: The mapping of common relations across stories.
+
+    Returns:
+        The prompt.
+    """
+    builder = PromptBuilder().render(PRINCIPLE_INSTRUCTIONS)
+    builder.render_each(PRINCIPLE_PATTERN, ({"pattern": pattern} for pattern
+                                            in common_relations.get("structural_patterns", [])))
+    builder.write("\nConcept Mappings:\n")
+    builder.render_each(PRINCIPLE_CONCEPT, ({"pairs": _pairs(mapping)} for mapping
+                                            in common_relations.get("concept_mappings", [])))
+    builder.write("\nRelationship Mappings:\n")
+    builder.render_each(PRINCIPLE_RELATION, ({"type": relation.get("type", ""),
+                                              "instances": ", ".join(relation.get("instances", []))}
+                                             for relation
+                                             in common_relations.get("relationship_mappings", [])))
+    return builder.build()
+
+def combine_principles_prompt(principles: List[str]) -> Prompt:
+    """
+    Build the prompt asking the LLM to unify partial principles.
+
+    Args:
+        principles: The partial principles.
+
+    Returns:
+        The prompt.
+    """
+    builder = PromptBuilder().render(COMBINE_INSTRUCTIONS)
+    builder.render_each(COMBINE_PRINCIPLE, ({"number": i, "principle": principle.strip()}
+                                            for i, principle in enumerate(principles, 1)))
+    return builder.build()
+
+def story_prompt(domain: str) -> Prompt:
+    """
+    Build the prompt asking the LLM for a story about a domain.
+
+    Args:
+        domain: The domain or topic for the story.
+
+    Returns:
+        The prompt.
+    """
+    return STORY_INSTRUCTIONS.render(domain=domain)
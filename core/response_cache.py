@@ -0,0 +1,210 @@
+# core/response_cache.py
+"""
+This module provides a persistent, content-addressed cache for LLM responses.
+
+Responses are stored in SQLite, keyed by a hash of the request settings and
+the prompt, so identical requests across runs are answered from disk.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Any, Optional
+
+class ResponseCache:
+    """
+    SQLite-backed LLM response cache with TTL and LRU eviction.
+    """
+
+    def __init__(self, path: str, max_entries: Optional[int] = 10000,
+                 max_bytes: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path: Path to the SQLite database file.
+            max_entries: Maximum number of cached responses, or None for no limit.
+            max_bytes: Maximum total size of cached responses in bytes, or None.
+            ttl: Time-to-live of an entry in seconds, or None to never expire.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(prompt: str, settings: Dict[str, Any]) -> str:
+        """
+        Compute the cache key for a request.
+
+        Args:
+            prompt: The prompt sent to the LLM.
+            settings: Request settings (model, temperature, max_tokens).
+
+        Returns:
+            A hex SHA-256 digest identifying the request.
+        """
+        payload = json.dumps({
+            "model": settings.get("model"),
+            "temperature": settings.get("temperature"),
+            "max_tokens": settings.get("max_tokens"),
+            "prompt": prompt
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str, settings: Dict[str, Any]) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            prompt: The prompt sent to the LLM.
+            settings: Request settings (model, temperature, max_tokens).
+
+        Returns:
+            The cached response, or None on a miss.
+        """
+        key = self.make_key(prompt, settings)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, prompt: str, settings: Dict[str, Any], response: str) -> None:
+        """
+        Store a response and evict old entries if the cache is over its limits.
+
+        Args:
+            prompt: The prompt sent to the LLM.
+            settings: Request settings (model, temperature, max_tokens).
+            response: The LLM's response.
+        """
+        key = self.make_key(prompt, settings)
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)", (key, response, size, now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then least recently used ones beyond the limits."""
+        if self.ttl is not None:
+            self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)
+            )
+
+        if self.max_entries is None and self.max_bytes is None:
+            return
+
+        count, total = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+
+        stale_keys = []
+        if (self.max_entries is not None and count > self.max_entries) or \
+           (self.max_bytes is not None and total > self.max_bytes):
+            for key, size in self._conn.execute(
+                    "SELECT key, size FROM responses ORDER BY last_access ASC"):
+                over_entries = self.max_entries is not None and count > self.max_entries
+                over_bytes = self.max_bytes is not None and total > self.max_bytes
+                if not (over_entries or over_bytes):
+                    break
+                stale_keys.append((key,))
+                count -= 1
+                total -= size
+
+        if stale_keys:
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", stale_keys)
+
+    def clear(self) -> None:
+        """Remove every cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return cache statistics.
+
+        Returns:
+            A dictionary with hit/miss counters, hit rate and current size.
+        """
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": count,
+            "bytes": total
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+def create_cache(config: Dict[str, Any]) -> Optional[ResponseCache]:
+    """
+    Create the response cache described by the configuration.
+
+    Args:
+        config: Configuration dictionary containing cache settings.
+
+    Returns:
+        A ResponseCache, or None if caching is not configured.
+    """
+    cache_path = config.get("cache_path")
+    if not cache_path:
+        return None
+    return ResponseCache(
+        cache_path,
+        max_entries=config.get("cache_max_entries", 10000),
+        max_bytes=config.get("cache_max_bytes"),
+        ttl=config.get("cache_ttl")
+    )
@@ -0,0 +1,376 @@
+# core/retrieval_index.py
+"""
+This module indexes story graphs to retrieve analogous stories without the LLM.
+
+Each story is reduced to a set of shingles: structural ones from its graph
+(relation types, the relation sequences around every entity and the entity
+roles they imply) and content ones (entity name tokens and the story's
+content words), which tell apart stories whose graphs share one shape.
+The shingle sets are summarized by MinHash signatures and bucketed with
+locality-sensitive hashing (LSH) bands, so a query only touches stories that
+collide with it in at least one band. An inverted index from shingles to
+stories backs up the bands for small or sparse queries. Candidates are ranked
+by their estimated Jaccard similarity.
+"""
+
+import json
+import os
+import re
+import threading
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Any, Iterable, Optional, Set, Tuple
+
+import numpy as np
+
+from core.analogical_reasoner import initial_graph_construction
+from core.pipeline import content_digest
+
+# Mersenne prime used by the universal hash family of the MinHash permutations
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+# Version of the shingle scheme; indexes saved with another version are rebuilt
+SHINGLE_VERSION = 2
+
+_WORD = re.compile(r"[a-z][a-z0-9'-]+")
+
+# Common words that carry no content; shorter words are skipped as well
+_STOPWORDS = frozenset("""
+about after again also because been before being between both could does doing
+during each from further have having here into itself just more most once only
+other over same should some such than that their them then there these they
+this those through under until very were what when where which while will with
+would your
+""".split())
+
+def text_shingles(text: str) -> Set[str]:
+    """
+    Extract the content shingles of a story text.
+
+    Args:
+        text: The story text.
+
+    Returns:
+        One 'word:' shingle per distinct content word of at least four letters.
+    """
+    return {f"word:{word}" for word in _WORD.findall(text.lower())
+            if len(word) >= 4 and word not in _STOPWORDS}
+
+def graph_shingles(graph: Dict[str, Any]) -> Set[str]:
+    """
+    Extract the structural and entity shingles of a story graph.
+
+    Structural shingles describe the relations around each entity; entity
+    shingles are the lower-cased tokens of the entity names, since Phase 1
+    graphs of different stories often share one structure.
+
+    Args:
+        graph: A story graph in the dictionary format produced by Phase 1.
+
+    Returns:
+        The set of shingles.
+    """
+    outgoing: Dict[str, List[str]] = defaultdict(list)
+    incoming: Dict[str, List[str]] = defaultdict(list)
+    shingles = set()
+    for rel in graph.get("relationships", []):
+        relation = rel["relation"]
+        outgoing[rel["source"]].append(relation)
+        incoming[rel["target"]].append(relation)
+        shingles.add(f"rel:{relation}")
+
+    for obj in graph.get("objects", []):
+        shingles.update(f"entity:{token}" for token in _WORD.findall(str(obj).lower()))
+        out_relations = sorted(outgoing.get(obj, []))
+        in_relations = sorted(incoming.get(obj, []))
+        role = ("source" if out_relations and not in_relations else
+                "sink" if in_relations and not out_relations else
+                "hub" if len(out_relations) + len(in_relations) > 2 else
+                "link" if out_relations else "isolated")
+        shingles.add(f"role:{role}:{len(in_relations)}:{len(out_relations)}")
+        for in_relation in in_relations or ["-"]:
+            for out_relation in out_relations or ["-"]:
+                shingles.add(f"path:{in_relation}>{out_relation}")
+    return shingles
+
+def _hash_shingle(shingle: str) -> int:
+    """Map a shingle to a stable 32-bit integer."""
+    return zlib.crc32(shingle.encode("utf-8"))
+
+class AnalogyIndex:
+    """
+    MinHash/LSH index over story graphs with incremental updates.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 1):
+        """
+        Initialize an empty index.
+
+        Args:
+            num_perm: Number of MinHash permutations; must be divisible by `bands`.
+            bands: Number of LSH bands. More bands favour recall over precision.
+            seed: Seed of the MinHash permutations.
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.seed = seed
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _MAX_HASH, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, _MAX_HASH, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.shingles: Dict[str, Set[str]] = {}
+        self._buckets: List[Dict[int, Set[str]]] = [defaultdict(set) for _ in range(bands)]
+        self._inverted: Dict[str, Set[str]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def __contains__(self, story_id: str) -> bool:
+        return story_id in self.signatures
+
+    def signature(self, shingles: Iterable[str]) -> np.ndarray:
+        """
+        Compute the MinHash signature of a shingle set.
+
+        Args:
+            shingles: The shingles.
+
+        Returns:
+            An array of `num_perm` 32-bit minimum hash values.
+        """
+        hashes = np.array([_hash_shingle(s) for s in shingles], dtype=np.uint64)
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint64)
+        # Universal hashing (a * x + b) mod p, vectorized over permutations x shingles;
+        # a, b and x are all below 2**32, so the arithmetic fits in 64 bits
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _PRIME
+        return (permuted & _MAX_HASH).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        """Return the hash of each LSH band of a signature."""
+        rows = self.num_perm // self.bands
+        return [zlib.crc32(signature[band * rows:(band + 1) * rows].tobytes())
+                for band in range(self.bands)]
+
+    def insert(self, story_id: str, graph: Dict[str, Any], text: Optional[str] = None) -> None:
+        """
+        Add a story graph to the index, replacing any previous entry.
+
+        Args:
+            story_id: Unique identifier of the story.
+            graph: The story's Phase 1 graph.
+            text: The story text, whose content words are indexed too.
+        """
+        if story_id in self.signatures:
+            self.delete(story_id)
+        shingles = graph_shingles(graph) | text_shingles(text or "")
+        signature = self.signature(shingles)
+        self.signatures[story_id] = signature
+        self.shingles[story_id] = shingles
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].add(story_id)
+        for shingle in shingles:
+            self._inverted[shingle].add(story_id)
+
+    def delete(self, story_id: str) -> None:
+        """
+        Remove a story from the index.
+
+        Args:
+            story_id: Identifier of the story to remove.
+
+        Raises:
+            KeyError: If the story is not indexed.
+        """
+        signature = self.signatures.pop(story_id)
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band][key]
+            bucket.discard(story_id)
+            if not bucket:
+                del self._buckets[band][key]
+        for shingle in self.shingles.pop(story_id):
+            postings = self._inverted[shingle]
+            postings.discard(story_id)
+            if not postings:
+                del self._inverted[shingle]
+
+    def query(self, graph: Dict[str, Any], k: int = 5, exclude: Optional[Set[str]] = None,
+              text: Optional[str] = None) -> List[Tuple[str, float]]:
+        """
+        Find the stories most analogous to a graph.
+
+        LSH band collisions supply the candidates; if they yield fewer than
+        `k`, the inverted index adds stories sharing the rarest shingles.
+
+        Args:
+            graph: The query story's Phase 1 graph.
+            k: Number of results.
+            exclude: Story IDs to leave out of the results.
+            text: The query story's text, whose content words are matched too.
+
+        Returns:
+            Up to `k` (story ID, estimated Jaccard similarity) pairs, best first.
+        """
+        exclude = exclude or set()
+        shingles = graph_shingles(graph) | text_shingles(text or "")
+        signature = self.signature(shingles)
+
+        candidates: Set[str] = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates.update(self._buckets[band].get(key, ()))
+        candidates -= exclude
+
+        if len(candidates) < k:
+            postings = sorted((self._inverted[s] for s in shingles if s in self._inverted), key=len)
+            for stories in postings:
+                candidates.update(stories - exclude)
+                if len(candidates) >= k:
+                    break
+
+        if not candidates:
+            return []
+        ids = sorted(candidates)
+        matrix = np.stack([self.signatures[story_id] for story_id in ids])
+        similarity = (matrix == signature).mean(axis=1)
+        order = np.argsort(-similarity, kind="stable")[:k]
+        return [(ids[i], float(similarity[i])) for i in order]
+
+    def save(self, path: str) -> None:
+        """
+        Save the index to disk.
+
+        Signatures are stored in a NumPy `.npz` archive next to a JSON file
+        with the shingles and parameters; the LSH buckets and inverted index
+        are rebuilt on load.
+
+        Args:
+            path: Path prefix; '.json' and '.npz' files are written.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        ids = sorted(self.signatures)
+        matrix = (np.stack([self.signatures[story_id] for story_id in ids]) if ids
+                  else np.zeros((0, self.num_perm), dtype=np.uint64))
+        np.savez_compressed(f"{path}.npz", signatures=matrix)
+        with open(f"{path}.json", 'w', encoding='utf-8') as file:
+            json.dump({
+                "version": SHINGLE_VERSION,
+                "num_perm": self.num_perm,
+                "bands": self.bands,
+                "seed": self.seed,
+                "ids": ids,
+                "shingles": [sorted(self.shingles[story_id]) for story_id in ids]
+            }, file)
+
+    @classmethod
+    def load(cls, path: str) -> "AnalogyIndex":
+        """
+        Load an index saved with `save`.
+
+        Args:
+            path: Path prefix used when saving.
+
+        Returns:
+            The loaded index.
+
+        Raises:
+            ValueError: If the index was saved with another shingle scheme.
+        """
+        with open(f"{path}.json", 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+        if meta.get("version") != SHINGLE_VERSION:
+            raise ValueError(f"{path} uses an outdated shingle scheme")
+        index = cls(meta["num_perm"], meta["bands"], meta["seed"])
+        signatures = np.load(f"{path}.npz")["signatures"]
+        for story_id, signature, shingles in zip(meta["ids"], signatures, meta["shingles"]):
+            index.signatures[story_id] = signature
+            index.shingles[story_id] = set(shingles)
+            for band, key in enumerate(index._band_keys(signature)):
+                index._buckets[band][key].add(story_id)
+            for shingle in shingles:
+                index._inverted[shingle].add(story_id)
+        return index
+
+class _IndexedCorpus:
+    """An analogy index kept in memory with the story IDs of its corpus."""
+
+    def __init__(self, index: AnalogyIndex):
+        self.index = index
+        # Story ID of every story of the last synchronized corpus, by text
+        self.ids: Dict[str, str] = {}
+        self.lock = threading.Lock()
+
+# Indexes opened by retrieve_analogues, by path (None for an in-memory index)
+_CORPORA: Dict[Optional[str], _IndexedCorpus] = {}
+_CORPORA_LOCK = threading.Lock()
+
+def _open_corpus(index_path: Optional[str]) -> _IndexedCorpus:
+    """Return the in-memory index of `index_path`, loading it on first use."""
+    with _CORPORA_LOCK:
+        corpus = _CORPORA.get(index_path)
+        if corpus is None:
+            index = AnalogyIndex()
+            if index_path and os.path.exists(f"{index_path}.json"):
+                try:
+                    index = AnalogyIndex.load(index_path)
+                except ValueError as e:
+                    print(f"Rebuilding analogy index: {e}")
+            corpus = _CORPORA[index_path] = _IndexedCorpus(index)
+        return corpus
+
+def retrieve_analogues(stories: List[str], target_story: str, k: int,
+                       index_path: Optional[str] = None) -> List[str]:
+    """
+    Select the stories most analogous to a target story.
+
+    The index is loaded from `index_path` once per process and brought up to
+    date with `stories`: only stories whose text was not seen by the previous
+    call are hashed, graphs are built only for stories that are not indexed
+    yet, and stories no longer in the corpus are deleted. The index is saved
+    only when it changed. Stories are identified by a hash of their content.
+
+    Args:
+        stories: The story corpus.
+        target_story: The story to find analogues for.
+        k: Number of stories to select.
+        index_path: Path prefix of the persisted index, or None to keep it in memory.
+
+    Returns:
+        At most `k` stories from the corpus, in corpus order. Of stories with
+        identical content only the first is returned.
+    """
+    if len(stories) <= k:
+        return list(stories)
+
+    corpus = _open_corpus(index_path)
+    with corpus.lock:
+        index = corpus.index
+        known = corpus.ids
+        corpus.ids = ids = {story: known.get(story) or content_digest(story) for story in stories}
+
+        changed = False
+        current = set(ids.values())
+        for story_id in [story_id for story_id in index.signatures if story_id not in current]:
+            index.delete(story_id)
+            changed = True
+        for story, story_id in ids.items():
+            if story_id not in index:
+                index.insert(story_id, initial_graph_construction(story), story)
+                changed = True
+        if changed and index_path:
+            index.save(index_path)
+
+        selected = {story_id for story_id, _ in
+                    index.query(initial_graph_construction(target_story), k=k, text=target_story)}
+
+    analogues = []
+    for story in stories:
+        story_id = ids[story]
+        if story_id in selected:
+            selected.discard(story_id)
+            analogues.append(story)
+    return analogues
@@ -0,0 +1,353 @@
+# core/semantic_cache.py
+"""
+This module provides a semantic cache tier for near-duplicate LLM prompts.
+
+Prompts that differ only trivially (whitespace, the order of the stories in
+them, a changed word in a long story) miss the exact-hash response cache.
+Here every prompt is embedded locally with a signed hashing vectorizer over
+its words and word pairs, and the unit vectors are indexed with random-
+hyperplane LSH: a lookup only compares against the entries that share at
+least one band of sign bits with it, and returns the most similar response if
+its cosine similarity reaches the threshold.
+
+Only the variable part of a prompt is embedded. Prompts built by
+`core.prompts` must share their exact instruction prefix and request settings
+with an entry to match it, so a prompt is never answered with the response
+to a different task. Plain string prompts carry no template identity to scope
+them by, and prompts shorter than `min_words` can change meaning with one
+word, so both are left to the exact cache.
+
+Entries are persisted in SQLite and loaded into memory on start; the number
+of entries is bounded and the least recently used ones are evicted first.
+Every hit is appended to a JSON Lines audit log.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+import numpy as np
+
+# Words of a prompt, as embedded
+_WORD = re.compile(r"\w+")
+
+def prompt_words(text: str) -> List[str]:
+    """Return the lowercased words of a text."""
+    return _WORD.findall(text.lower())
+
+def embed(words: List[str], dim: int = 1024) -> np.ndarray:
+    """
+    Embed a text with a signed hashing vectorizer.
+
+    Each word and each pair of consecutive words is hashed to one of `dim`
+    dimensions with a hash-dependent sign, so collisions tend to cancel out.
+
+    Args:
+        words: The words of the text.
+        dim: Number of dimensions; a power of two.
+
+    Returns:
+        A float32 unit vector, or the zero vector for an empty text.
+    """
+    features = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+    vector = np.zeros(dim, dtype=np.float32)
+    if not features:
+        return vector
+    hashes = np.array([zlib.crc32(feature.encode("utf-8")) for feature in features],
+                      dtype=np.uint32)
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+    vector += np.bincount(hashes % dim, weights=signs, minlength=dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+class SemanticCache:
+    """
+    Bounded near-duplicate response cache with a random-hyperplane LSH index.
+    """
+
+    def __init__(self, path: str = ":memory:", threshold: float = 0.95,
+                 max_entries: int = 2000, min_words: int = 32, dim: int = 1024,
+                 bits: int = 64, bands: int = 8, seed: int = 1,
+                 audit_path: Optional[str] = None):
+        """
+        Open (or create) the cache and load its entries into the index.
+
+        Args:
+            path: Path to the SQLite database file, or ':memory:'.
+            threshold: Minimum cosine similarity of a hit.
+            max_entries: Maximum number of cached responses.
+            min_words: Minimum number of words in the variable part of a prompt
+                       for it to be looked up or stored.
+            dim: Number of embedding dimensions.
+            bits: Number of random hyperplanes; must be divisible by `bands`.
+            bands: Number of LSH bands. More bands favour recall over speed.
+            seed: Seed of the random hyperplanes.
+            audit_path: JSON Lines file every hit is appended to, or None.
+        """
+        if bits % bands:
+            raise ValueError("bits must be divisible by bands")
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.min_words = min_words
+        self.dim = dim
+        self.bands = bands
+        self.audit_path = audit_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        rng = np.random.RandomState(seed)
+        self._planes = rng.standard_normal((bits, dim)).astype(np.float32)
+        self._band_weights = 1 << np.arange(bits // bands, dtype=np.uint64)
+
+        # Entry slots: a fixed-size vector matrix plus per-slot metadata
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._rows: List[Optional[int]] = [None] * max_entries
+        self._scopes: List[str] = [""] * max_entries
+        self._hashes: List[str] = [""] * max_entries
+        self._responses: List[str] = [""] * max_entries
+        self._band_keys: List[List[int]] = [[] for _ in range(max_entries)]
+        self._free = list(range(max_entries - 1, -1, -1))
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self._by_hash: Dict[Tuple[str, str], int] = {}
+        self._buckets: List[Dict[Tuple[str, int], Set[int]]] = [
+            defaultdict(set) for _ in range(bands)]
+
+        directory = os.path.dirname(path) if path != ":memory:" else ""
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS semantic_responses ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, scope TEXT NOT NULL, "
+            "prompt_hash TEXT NOT NULL, vector BLOB NOT NULL, response TEXT NOT NULL, "
+            "last_access REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def _load(self) -> None:
+        """Load the most recently used persisted entries into the index."""
+        rows = self._conn.execute(
+            "SELECT id, scope, prompt_hash, vector, response FROM semantic_responses "
+            "ORDER BY last_access DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        for row, scope, prompt_hash, blob, response in reversed(rows):
+            vector = np.frombuffer(blob, dtype=np.float32)
+            if vector.shape == (self.dim,):
+                self._insert(row, scope, prompt_hash, vector, response)
+        # Entries beyond the limit were evicted by another process or a smaller limit
+        self._conn.execute(
+            "DELETE FROM semantic_responses WHERE id NOT IN "
+            "(SELECT id FROM semantic_responses ORDER BY last_access DESC LIMIT ?)",
+            (self.max_entries,))
+        self._conn.commit()
+
+    @staticmethod
+    def _scope(prompt: str, settings: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Split a request into the scope it must match exactly and its variable text.
+
+        Returns:
+            A tuple of (scope key, text to embed).
+        """
+        prefix_length = getattr(prompt, "prefix_length", 0)
+        scope = json.dumps({
+            "model": settings.get("model"),
+            "temperature": settings.get("temperature"),
+            "max_tokens": settings.get("max_tokens"),
+            "prefix": getattr(prompt, "prefix_key", None)
+        }, sort_keys=True)
+        return scope, str(prompt)[prefix_length:]
+
+    def _lsh_keys(self, scope: str, vector: np.ndarray) -> List[int]:
+        """Return the key of each LSH band of a vector, within its scope."""
+        signs = (self._planes @ vector > 0).reshape(self.bands, -1)
+        values = signs.astype(np.uint64) @ self._band_weights
+        return [hash((scope, int(value))) for value in values]
+
+    def _embed(self, prompt: str, settings: Dict[str, Any]
+               ) -> Optional[Tuple[str, np.ndarray, List[int]]]:
+        """
+        Embed a request, or return None if it must only match exactly: it has
+        no template prefix to scope it by, or it is too short.
+        """
+        if getattr(prompt, "prefix_key", None) is None:
+            return None
+        scope, text = self._scope(prompt, settings)
+        words = prompt_words(text)
+        if len(words) < self.min_words:
+            return None
+        vector = embed(words, self.dim)
+        return scope, vector, self._lsh_keys(scope, vector)
+
+    def get(self, prompt: str, settings: Dict[str, Any]) -> Optional[str]:
+        """
+        Look up the response to the most similar cached prompt.
+
+        Args:
+            prompt: The prompt sent to the LLM.
+            settings: Request settings (model, temperature, max_tokens).
+
+        Returns:
+            The cached response, or None if no prompt is similar enough.
+        """
+        embedded = self._embed(prompt, settings)
+        with self._lock:
+            if embedded is None or not self._lru:
+                self.misses += 1
+                return None
+            scope, vector, keys = embedded
+            candidates: Set[int] = set()
+            for band, key in enumerate(keys):
+                candidates.update(self._buckets[band].get(key, ()))
+            if not candidates:
+                self.misses += 1
+                return None
+
+            slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            similarities = self._vectors[slots] @ vector
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            slot = int(slots[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._lru.move_to_end(slot)
+            self._conn.execute("UPDATE semantic_responses SET last_access = ? WHERE id = ?",
+                               (time.time(), self._rows[slot]))
+            self._conn.commit()
+            self._audit(prompt, slot, similarity)
+            return self._responses[slot]
+
+    def put(self, prompt: str, settings: Dict[str, Any], response: str) -> None:
+        """
+        Store a response, evicting the least recently used entry if the cache is full.
+
+        Args:
+            prompt: The prompt sent to the LLM.
+            settings: Request settings (model, temperature, max_tokens).
+            response: The LLM's response.
+        """
+        embedded = self._embed(prompt, settings)
+        if embedded is None:
+            return
+        scope, vector, _ = embedded
+        prompt_hash = _prompt_hash(prompt)
+        with self._lock:
+            existing = self._by_hash.get((scope, prompt_hash))
+            if existing is not None:
+                self._remove(existing)
+            elif not self._free:
+                self._remove(next(iter(self._lru)))
+            cursor = self._conn.execute(
+                "INSERT INTO semantic_responses (scope, prompt_hash, vector, response, "
+                "last_access) VALUES (?, ?, ?, ?, ?)",
+                (scope, prompt_hash, vector.tobytes(), response, time.time()))
+            self._conn.commit()
+            self._insert(cursor.lastrowid, scope, prompt_hash, vector, response)
+
+    def _insert(self, row: int, scope: str, prompt_hash: str, vector: np.ndarray,
+                response: str) -> None:
+        """Place an entry in a free slot and index it."""
+        slot = self._free.pop()
+        self._vectors[slot] = vector
+        self._rows[slot] = row
+        self._scopes[slot] = scope
+        self._hashes[slot] = prompt_hash
+        self._responses[slot] = response
+        self._band_keys[slot] = self._lsh_keys(scope, vector)
+        for band, key in enumerate(self._band_keys[slot]):
+            self._buckets[band][key].add(slot)
+        self._by_hash[(scope, prompt_hash)] = slot
+        self._lru[slot] = None
+
+    def _remove(self, slot: int) -> None:
+        """Drop the entry in a slot from the index and the database."""
+        for band, key in enumerate(self._band_keys[slot]):
+            bucket = self._buckets[band][key]
+            bucket.discard(slot)
+            if not bucket:
+                del self._buckets[band][key]
+        del self._by_hash[(self._scopes[slot], self._hashes[slot])]
+        del self._lru[slot]
+        self._conn.execute("DELETE FROM semantic_responses WHERE id = ?", (self._rows[slot],))
+        self._rows[slot] = None
+        self._responses[slot] = ""
+        self._free.append(slot)
+
+    def _audit(self, prompt: str, slot: int, similarity: float) -> None:
+        """Append a hit to the audit log."""
+        if not self.audit_path:
+            return
+        directory = os.path.dirname(self.audit_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        record = {
+            "time": time.time(),
+            "similarity": round(similarity, 6),
+            "prompt_hash": _prompt_hash(prompt),
+            "matched_prompt_hash": self._hashes[slot],
+            "scope": self._scopes[slot],
+            "prompt_chars": len(prompt)
+        }
+        with open(self.audit_path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(record) + "\n")
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return cache statistics.
+
+        Returns:
+            A dictionary with hit/miss counters, hit rate and current size.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._lru)
+        }
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+def _prompt_hash(prompt: str) -> str:
+    """Return the hex SHA-256 digest of a prompt."""
+    return hashlib.sha256(str(prompt).encode("utf-8")).hexdigest()
+
+def create_semantic_cache(config: Dict[str, Any]) -> Optional[SemanticCache]:
+    """
+    Create the semantic cache described by the configuration.
+
+    Args:
+        config: Configuration dictionary containing cache settings.
+
+    Returns:
+        A SemanticCache, or None if the semantic tier is disabled.
+    """
+    if not config.get("semantic_cache", False):
+        return None
+    return SemanticCache(
+        config.get("semantic_cache_path") or ":memory:",
+        threshold=config.get("semantic_cache_threshold", 0.95),
+        max_entries=config.get("semantic_cache_max_entries", 2000),
+        min_words=config.get("semantic_cache_min_words", 32),
+        audit_path=config.get("semantic_cache_audit_path")
+    )
@@ -0,0 +1,393 @@
+# core/snapshot.py
+"""
+This module stores parsed stories and their graphs in a columnar binary snapshot.
+
+A snapshot is a single file opened with `mmap`. Every column is a flat array
+(or a byte blob indexed by an offsets array), so opening a snapshot only reads
+a fixed-size header and wraps the columns as zero-copy NumPy views; a story's
+text or graph is decoded only when it is accessed.
+
+Layout (little-endian):
+
+    header        magic, version, counts, source fingerprint, section table
+    text          offsets uint64[n + 1] + UTF-8 blob of every story
+    names         offsets uint64[n + 1] + UTF-8 blob of every file name
+    symbols       offsets uint64[s + 1] + UTF-8 blob of every interned label
+    node_offsets  uint64[n + 1]   range of each story's nodes
+    nodes         uint32[N]       symbol ID of every node
+    object_counts uint32[n]       leading nodes of each story that are objects
+    edge_offsets  uint64[n + 1]   range of each story's edges
+    edge_sources, edge_targets    uint32[E] story-local node numbers
+    edge_relations                uint32[E] symbol ID of each relation
+
+Edges keep their original order, so graphs round-trip exactly. Columns are
+written little-endian on every host. The header records the modification time
+of the source directory, which changes whenever a story file is added,
+removed or replaced, so `is_stale` needs a single `stat` call. It also records
+a fingerprint of every file's name, size and mtime, which `is_stale(...,
+thorough=True)` compares as well to catch files edited in place.
+"""
+
+import hashlib
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+from collections.abc import Sequence
+from typing import Dict, List, Any, Iterator, Optional, Union
+
+import numpy as np
+
+from core.analogical_reasoner import build_graphs
+from core.graph_representation import StoryGraph, SymbolTable
+from utils.story_dedup import StoryDeduplicator
+from utils.story_loader import iter_stories, scan_story_files
+
+MAGIC = b"ARSNAP01"
+VERSION = 2
+
+# Section names, in file order
+SECTIONS = ("text_offsets", "text", "name_offsets", "names", "symbol_offsets", "symbols",
+            "node_offsets", "nodes", "object_counts", "edge_offsets", "edge_sources",
+            "edge_targets", "edge_relations")
+
+# magic, version, story count, symbol count, fingerprint, directory mtime,
+# then (offset, length) per section
+_HEADER = struct.Struct(f"<8sIQQ32sQ{2 * len(SECTIONS)}Q")
+
+# Little-endian dtypes of the column element types
+_UINT64 = np.dtype("<u8")
+_UINT32 = np.dtype("<u4")
+
+def directory_mtime(directory_path: str) -> int:
+    """Return the modification time of a story directory in nanoseconds."""
+    return os.stat(directory_path).st_mtime_ns
+
+def corpus_fingerprint(directory_path: str) -> bytes:
+    """
+    Fingerprint a story directory from file metadata alone.
+
+    Args:
+        directory_path: Path to the directory containing story files.
+
+    Returns:
+        A 32-byte digest of the names, sizes and mtimes of its story files.
+    """
+    digest = hashlib.sha256()
+    for entry in scan_story_files(directory_path):
+        stat = entry.stat()
+        digest.update(f"{entry.name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.digest()
+
+class StorySnapshot:
+    """
+    Lazily decoded, memory-mapped view of a snapshot file.
+    """
+
+    def __init__(self, path: str):
+        """
+        Open a snapshot. Only the header is read.
+
+        Args:
+            path: Path to the snapshot file.
+
+        Raises:
+            ValueError: If the file is not a snapshot of a supported version.
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version = struct.unpack_from("<8sI", self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} story snapshot")
+        fields = _HEADER.unpack_from(self._mmap, 0)
+        (self.story_count, self.symbol_count, self.fingerprint,
+         self.directory_mtime) = fields[2:6]
+
+        self._sections = {name: (fields[6 + 2 * i], fields[7 + 2 * i])
+                          for i, name in enumerate(SECTIONS)}
+        self.text_offsets = self._column("text_offsets", _UINT64)
+        self.name_offsets = self._column("name_offsets", _UINT64)
+        self.symbol_offsets = self._column("symbol_offsets", _UINT64)
+        self.node_offsets = self._column("node_offsets", _UINT64)
+        self.nodes = self._column("nodes", _UINT32)
+        self.object_counts = self._column("object_counts", _UINT32)
+        self.edge_offsets = self._column("edge_offsets", _UINT64)
+        self.edge_sources = self._column("edge_sources", _UINT32)
+        self.edge_targets = self._column("edge_targets", _UINT32)
+        self.edge_relations = self._column("edge_relations", _UINT32)
+
+    def _column(self, name: str, dtype: np.dtype) -> np.ndarray:
+        """Return a zero-copy view of a numeric section."""
+        offset, length = self._sections[name]
+        return np.frombuffer(self._mmap, dtype=dtype, count=length // dtype.itemsize,
+                             offset=offset)
+
+    def _blob(self, name: str, offsets: np.ndarray, index: int) -> str:
+        """Decode one item of a blob section."""
+        base = self._sections[name][0]
+        start, end = int(offsets[index]), int(offsets[index + 1])
+        return self._mmap[base + start:base + end].decode("utf-8")
+
+    def __len__(self) -> int:
+        return self.story_count
+
+    def story(self, index: int) -> str:
+        """Return the text of a story."""
+        return self._blob("text", self.text_offsets, index)
+
+    def name(self, index: int) -> str:
+        """Return the file name a story was loaded from."""
+        return self._blob("names", self.name_offsets, index)
+
+    def symbol(self, symbol_id: int) -> str:
+        """Return the label of an interned symbol."""
+        return self._blob("symbols", self.symbol_offsets, symbol_id)
+
+    def graph(self, index: int) -> Dict[str, Any]:
+        """
+        Decode the graph of a story.
+
+        Args:
+            index: The story's position in the snapshot.
+
+        Returns:
+            The graph in the dictionary format produced by Phase 1.
+        """
+        first, last = int(self.node_offsets[index]), int(self.node_offsets[index + 1])
+        labels = [self.symbol(int(symbol_id)) for symbol_id in self.nodes[first:last]]
+        edge_first, edge_last = int(self.edge_offsets[index]), int(self.edge_offsets[index + 1])
+        relationships = [
+            {"source": labels[source], "target": labels[target],
+             "relation": self.symbol(int(relation))}
+            for source, target, relation in zip(self.edge_sources[edge_first:edge_last].tolist(),
+                                                self.edge_targets[edge_first:edge_last].tolist(),
+                                                self.edge_relations[edge_first:edge_last].tolist())
+        ]
+        return {"objects": labels[:int(self.object_counts[index])],
+                "relationships": relationships}
+
+    def stories(self) -> Iterator[str]:
+        """Iterate over the story texts."""
+        for index in range(self.story_count):
+            yield self.story(index)
+
+    def graphs(self) -> Iterator[Dict[str, Any]]:
+        """Iterate over the story graphs."""
+        for index in range(self.story_count):
+            yield self.graph(index)
+
+    def is_stale(self, directory_path: str, thorough: bool = False) -> bool:
+        """
+        Check whether the source directory changed since the snapshot was built.
+
+        Args:
+            directory_path: Path to the directory the snapshot was built from.
+            thorough: Also compare the size and mtime of every story file, which
+                      catches files edited in place but stats the whole corpus.
+
+        Returns:
+            True if the snapshot no longer matches the directory.
+        """
+        if directory_mtime(directory_path) != self.directory_mtime:
+            return True
+        return thorough and corpus_fingerprint(directory_path) != self.fingerprint
+
+    def close(self) -> None:
+        """Release the memory map and the file handle."""
+        for name in ("text_offsets", "name_offsets", "symbol_offsets", "node_offsets", "nodes",
+                     "object_counts", "edge_offsets", "edge_sources", "edge_targets",
+                     "edge_relations"):
+            setattr(self, name, None)
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self) -> "StorySnapshot":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+class SnapshotStory(str):
+    """
+    Story text that remembers its position in the snapshot it was decoded from.
+    """
+    snapshot_index: int
+
+class SnapshotStories(Sequence):
+    """
+    Read-only sequence of a snapshot's stories, each decoded only when accessed.
+
+    The stories are `SnapshotStory` strings, so `graph` finds a story's
+    prebuilt graph by its position rather than by its text.
+    """
+
+    def __init__(self, snapshot: StorySnapshot):
+        """
+        Wrap an open snapshot.
+
+        Args:
+            snapshot: The snapshot.
+        """
+        self.snapshot = snapshot
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("snapshot story index out of range")
+        story = SnapshotStory(self.snapshot.story(index))
+        story.snapshot_index = index
+        return story
+
+    def graph(self, story: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the prebuilt graph of a story decoded from this sequence.
+
+        Args:
+            story: The story.
+
+        Returns:
+            The story's graph, or None for a story that is not from the snapshot.
+        """
+        index = getattr(story, "snapshot_index", None)
+        return self.snapshot.graph(index) if index is not None else None
+
+def build_snapshot(directory_path: str, snapshot_path: str,
+                   workers: Optional[int] = None,
+                   deduplicator: Optional[StoryDeduplicator] = None) -> int:
+    """
+    Parse a story directory and write its snapshot.
+
+    Story texts are streamed to a scratch file while the graph columns are
+    accumulated in compact typed arrays; the snapshot replaces any previous
+    one atomically. Graphs are built with `build_graphs`, so the build runs on
+    a process pool for large corpora.
+
+    Args:
+        directory_path: Path to the directory containing story files.
+        snapshot_path: Path of the snapshot file to write.
+        workers: Number of graph construction processes.
+        deduplicator: If given, near-duplicate stories are left out.
+
+    Returns:
+        The number of stories in the snapshot.
+    """
+    # Taken before the files are read, so changes made during the build make it stale
+    mtime = directory_mtime(directory_path)
+    fingerprint = corpus_fingerprint(directory_path)
+    symbols = SymbolTable()
+    columns: Dict[str, array] = {
+        "text_offsets": array("Q", [0]), "name_offsets": array("Q", [0]),
+        "node_offsets": array("Q", [0]), "nodes": array("I"), "object_counts": array("I"),
+        "edge_offsets": array("Q", [0]), "edge_sources": array("I"),
+        "edge_targets": array("I"), "edge_relations": array("I")
+    }
+    names = bytearray()
+    directory = os.path.dirname(os.path.abspath(snapshot_path))
+    os.makedirs(directory, exist_ok=True)
+
+    with tempfile.TemporaryFile(dir=directory) as text_file:
+        def texts() -> Iterator[str]:
+            # Texts and names are written as the graph builder consumes them
+            nonlocal names
+            stories = iter_stories(directory_path)
+            if deduplicator is not None:
+                stories = deduplicator.filter(stories)
+            for story in stories:
+                data = story.text.encode("utf-8")
+                text_file.write(data)
+                columns["text_offsets"].append(columns["text_offsets"][-1] + len(data))
+                names += story.name.encode("utf-8")
+                columns["name_offsets"].append(len(names))
+                yield story.text
+
+        for graph in build_graphs(texts(), workers=workers):
+            # StoryGraph numbers the nodes as the snapshot stores them: objects
+            # first, then relationship endpoints in order of appearance
+            story_graph = StoryGraph.from_dict(graph, symbols)
+            for source, target, relation in story_graph.edges():
+                columns["edge_sources"].append(source)
+                columns["edge_targets"].append(target)
+                columns["edge_relations"].append(relation)
+            columns["nodes"].extend(story_graph.nodes)
+            columns["object_counts"].append(story_graph.object_count)
+            columns["node_offsets"].append(len(columns["nodes"]))
+            columns["edge_offsets"].append(len(columns["edge_sources"]))
+
+        symbol_blob = bytearray()
+        symbol_offsets = array("Q", [0])
+        for symbol_id in range(len(symbols)):
+            symbol_blob += symbols.label(symbol_id).encode("utf-8")
+            symbol_offsets.append(len(symbol_blob))
+
+        story_count = len(columns["object_counts"])
+        temp_path = f"{snapshot_path}.tmp"
+        with open(temp_path, 'wb') as out:
+            out.write(b"\0" * _HEADER.size)
+            table: List[int] = []
+
+            def section(write) -> None:
+                # Align every section to 8 bytes so NumPy views are aligned
+                out.write(b"\0" * (-out.tell() % 8))
+                start = out.tell()
+                write()
+                table.extend((start, out.tell() - start))
+
+            section(lambda: _write_column(columns["text_offsets"], out))
+            text_file.seek(0)
+            section(lambda: shutil.copyfileobj(text_file, out))
+            section(lambda: _write_column(columns["name_offsets"], out))
+            section(lambda: out.write(names))
+            section(lambda: _write_column(symbol_offsets, out))
+            section(lambda: out.write(symbol_blob))
+            for name in ("node_offsets", "nodes", "object_counts", "edge_offsets",
+                         "edge_sources", "edge_targets", "edge_relations"):
+                section(lambda name=name: _write_column(columns[name], out))
+
+            out.seek(0)
+            out.write(_HEADER.pack(MAGIC, VERSION, story_count, len(symbols),
+                                   fingerprint, mtime, *table))
+        os.replace(temp_path, snapshot_path)
+
+    return story_count
+
+def _write_column(column: array, out: Any) -> None:
+    """Write a typed array little-endian, byte-swapping a copy on big-endian hosts."""
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    column.tofile(out)
+
+def open_snapshot(snapshot_path: str, directory_path: Optional[str] = None) -> Optional[StorySnapshot]:
+    """
+    Open a snapshot if it exists and is up to date.
+
+    Args:
+        snapshot_path: Path of the snapshot file.
+        directory_path: Source directory to validate against; skipped if None.
+
+    Returns:
+        The opened snapshot, or None if it is missing, invalid or stale.
+    """
+    if not os.path.exists(snapshot_path):
+        return None
+    try:
+        snapshot = StorySnapshot(snapshot_path)
+    except (ValueError, struct.error, OSError) as e:
+        print(f"Error opening snapshot {snapshot_path}: {e}")
+        return None
+    if directory_path is not None and snapshot.is_stale(directory_path):
+        snapshot.close()
+        return None
+    return snapshot
@@ -0,0 +1,97 @@
+# core/stream_parser.py
+"""
+This module parses structured LLM output incrementally as it streams in.
+
+LLM responses in this project are organized in headed sections ('Structural
+Patterns:', 'Concept Mappings:', 'Relationship Mappings:') of numbered or
+bulleted items. `SectionStreamParser` consumes the response chunk by chunk
+and reports every item as soon as its line is complete, and the end of every
+section as soon as the next heading or unrelated text starts, so consumers
+can act on a section without waiting for the rest of the response.
+"""
+
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Section headings recognized at the start of a line, and the section names they open
+SECTION_HEADINGS: Dict[str, str] = {
+    "structural patterns": "structural_patterns",
+    "concept mappings": "concept_mappings",
+    "relationship mappings": "relationship_mappings"
+}
+
+# A numbered ("1." / "1)") or bulleted ("-" / "*") item line
+_ITEM = re.compile(r"^(?:\d+[.)]|[-*])\s*")
+
+# An event: ('item', section, line) or ('end', section, '')
+Event = Tuple[str, str, str]
+
+class SectionStreamParser:
+    """
+    Incremental, line-based parser of sectioned LLM output.
+    """
+
+    def __init__(self):
+        """Initialize the parser before any input."""
+        self._pending = ""
+        self.section: Optional[str] = None
+
+    def feed(self, chunk: str) -> List[Event]:
+        """
+        Consume a chunk of the response.
+
+        Args:
+            chunk: The next piece of the response, of any length.
+
+        Returns:
+            The events completed by this chunk, in order.
+        """
+        self._pending += chunk
+        if "\n" not in chunk:
+            return []
+        *lines, self._pending = self._pending.split("\n")
+        events: List[Event] = []
+        for line in lines:
+            self._parse_line(line.strip(), events)
+        return events
+
+    def close(self) -> List[Event]:
+        """
+        Signal the end of the response.
+
+        Returns:
+            The events of the final, unterminated line and the end of the
+            section that was still open.
+        """
+        events: List[Event] = []
+        if self._pending:
+            self._parse_line(self._pending.strip(), events)
+            self._pending = ""
+        if self.section is not None:
+            events.append(("end", self.section, ""))
+            self.section = None
+        return events
+
+    def _parse_line(self, line: str, events: List[Event]) -> None:
+        """Turn one complete line into events."""
+        if not line:
+            return
+        heading = _heading(line)
+        if heading is not None:
+            if self.section is not None:
+                events.append(("end", self.section, ""))
+            self.section = heading
+        elif self.section is not None:
+            if _ITEM.match(line):
+                events.append(("item", self.section, line))
+            else:
+                events.append(("end", self.section, ""))
+                self.section = None
+
+def _heading(line: str) -> Optional[str]:
+    """Return the section a line opens, or None if it is not a heading."""
+    lowered = line.lstrip("#* ").lower()
+    for heading, section in SECTION_HEADINGS.items():
+        if lowered.startswith(heading):
+            return section
+    return None
@@ -0,0 +1,302 @@
+# core/structure_mapping.py
+"""
+This module aligns story graphs locally to find common relational structure.
+
+It implements a lightweight structure-mapping engine over the graphs built in
+Phase 1 (IGCP). Nodes are described by hashed structural features (incident
+relation types, direction and degree) plus a weak label signal. Candidate
+correspondences are generated through an inverted index over the structural
+features; only those pairs are scored by cosine similarity, each node keeps
+its best few candidates, and the survivors are assigned greedily one-to-one,
+so no dense node-by-node matrix is built. The result has the same shape as the Phase 2 (ICRS) output.
+"""
+
+import zlib
+from collections import defaultdict
+from typing import Dict, List, Any, Optional, Set
+
+import numpy as np
+
+from core.graph_representation import StoryGraph, SymbolTable
+
+# Dimension of the hashed node feature vectors
+FEATURE_DIM = 128
+
+# Weight of label character trigrams relative to structural features
+LABEL_WEIGHT = 0.25
+
+# Best-scoring candidates kept per reference node before the assignment
+CANDIDATES_PER_NODE = 16
+
+def _feature_slot(feature: str) -> int:
+    """Map a feature name to a stable vector slot."""
+    return zlib.crc32(feature.encode("utf-8")) % FEATURE_DIM
+
+def _structural_keys(graph: StoryGraph, in_relations: List[List[int]]) -> List[Set[str]]:
+    """Return the structural feature names of every node of a graph."""
+    label = graph.symbols.label
+    keys = []
+    for node in range(graph.num_nodes):
+        node_keys = {f"out:{label(relation)}" for _, relation in graph.neighbors(node)}
+        node_keys.update(f"in:{label(relation)}" for relation in in_relations[node])
+        node_keys.add(f"deg:{len(in_relations[node])}:{graph.degree(node)}")
+        keys.append(node_keys)
+    return keys
+
+def _incoming_relations(graph: StoryGraph) -> List[List[int]]:
+    """Return the relation IDs of the incoming edges of every node."""
+    incoming: List[List[int]] = [[] for _ in range(graph.num_nodes)]
+    for node in range(graph.num_nodes):
+        for target, relation in graph.neighbors(node):
+            incoming[target].append(relation)
+    return incoming
+
+def _feature_matrix(graph: StoryGraph, keys: List[Set[str]]) -> np.ndarray:
+    """Build the L2-normalized feature matrix of a graph's nodes."""
+    features = np.zeros((graph.num_nodes, FEATURE_DIM), dtype=np.float32)
+    for node, node_keys in enumerate(keys):
+        for key in node_keys:
+            features[node, _feature_slot(key)] += 1.0
+        word = graph.node_label(node).lower()
+        for i in range(len(word) - 2):
+            features[node, _feature_slot(f"tri:{word[i:i + 3]}")] += LABEL_WEIGHT
+    norms = np.linalg.norm(features, axis=1, keepdims=True)
+    return features / np.maximum(norms, 1e-12)
+
+class _AlignedGraph:
+    """A story graph together with the precomputed data used for alignment."""
+
+    def __init__(self, graph: StoryGraph):
+        self.graph = graph
+        self.incoming = _incoming_relations(graph)
+        self.keys = _structural_keys(graph, self.incoming)
+        self.features = _feature_matrix(graph, self.keys)
+        postings: Dict[str, List[int]] = defaultdict(list)
+        for node, node_keys in enumerate(self.keys):
+            for key in node_keys:
+                postings[key].append(node)
+        self.index: Dict[str, np.ndarray] = {key: np.array(nodes, dtype=np.int64)
+                                             for key, nodes in postings.items()}
+
+def _align_pair(base: _AlignedGraph, other: _AlignedGraph,
+                min_similarity: float) -> Dict[int, int]:
+    """
+    Compute a one-to-one node correspondence from `base` to `other`.
+
+    Args:
+        base: The reference graph.
+        other: The graph aligned against the reference.
+        min_similarity: Minimum cosine similarity of an accepted correspondence.
+
+    Returns:
+        A mapping from base node numbers to node numbers of `other`.
+    """
+    rows: List[np.ndarray] = []
+    columns: List[np.ndarray] = []
+    scores: List[np.ndarray] = []
+    for node, node_keys in enumerate(base.keys):
+        # Only nodes that share at least one structural feature are candidates
+        postings = [other.index[key] for key in node_keys if key in other.index]
+        if not postings:
+            continue
+        candidates = np.unique(np.concatenate(postings))
+        similarity = other.features[candidates] @ base.features[node]
+        accepted = similarity >= min_similarity
+        candidates, similarity = candidates[accepted], similarity[accepted]
+        if candidates.size > CANDIDATES_PER_NODE:
+            best = np.argpartition(-similarity, CANDIDATES_PER_NODE - 1)[:CANDIDATES_PER_NODE]
+            candidates, similarity = candidates[best], similarity[best]
+        rows.append(np.full(candidates.size, node, dtype=np.int64))
+        columns.append(candidates)
+        scores.append(similarity)
+
+    mapping: Dict[int, int] = {}
+    if not rows:
+        return mapping
+    base_nodes, other_nodes = np.concatenate(rows), np.concatenate(columns)
+    # Best score first; ties go to the lower base node, then the lower other node
+    order = np.lexsort((other_nodes, base_nodes, -np.concatenate(scores)))
+    used: Set[int] = set()
+    for base_node, other_node in zip(base_nodes[order].tolist(), other_nodes[order].tolist()):
+        if base_node in mapping or other_node in used:
+            continue
+        mapping[base_node] = other_node
+        used.add(other_node)
+    return mapping
+
+def _structural_patterns(graph: StoryGraph, incoming: List[List[int]]) -> Set[str]:
+    """Classify the overall shape of a graph."""
+    out_degree = np.diff(np.asarray(graph.offsets, dtype=np.int64))
+    in_degree = np.array([len(relations) for relations in incoming], dtype=np.int64)
+    patterns = set()
+
+    if graph.num_edges == 0:
+        return patterns
+    if (out_degree <= 1).all() and (in_degree <= 1).all() and \
+       graph.num_edges == graph.num_nodes - 1:
+        patterns.add("sequential_process")
+    if (out_degree >= 2).any():
+        patterns.add("branching_structure")
+    if (in_degree >= 2).any():
+        patterns.add("convergent_structure")
+
+    # Kahn's algorithm: any node left unprocessed lies on a cycle
+    remaining = in_degree.copy()
+    ready = [node for node in range(graph.num_nodes) if remaining[node] == 0]
+    processed = 0
+    while ready:
+        node = ready.pop()
+        processed += 1
+        for target, _ in graph.neighbors(node):
+            remaining[target] -= 1
+            if remaining[target] == 0:
+                ready.append(target)
+    if processed < graph.num_nodes:
+        patterns.add("feedback_loop")
+    return patterns
+
+def align_graphs(graphs: List[Dict[str, Any]], min_similarity: float = 0.1,
+                 story_keys: Optional[List[str]] = None,
+                 min_stories: int = 2) -> Dict[str, Any]:
+    """
+    Find common structure across story graphs without calling the LLM.
+
+    The first graph is used as the reference; every other graph is aligned
+    against it. Concept mappings list the corresponding objects per story,
+    relationship mappings group the corresponding edges by the reference
+    relation type, and structural patterns are the shapes shared by all graphs.
+
+    Args:
+        graphs: Story graphs in the dictionary format produced by Phase 1.
+        min_similarity: Minimum cosine similarity of an accepted correspondence.
+        story_keys: Keys naming each story in the mappings. Defaults to
+                    'story_1', 'story_2', ...
+        min_stories: Minimum number of stories a mapping must cover to be kept.
+
+    Returns:
+        A dictionary with 'structural_patterns', 'concept_mappings' and
+        'relationship_mappings' keys.
+    """
+    result: Dict[str, Any] = {
+        "structural_patterns": [],
+        "concept_mappings": [],
+        "relationship_mappings": []
+    }
+    if not graphs:
+        return result
+
+    if story_keys is None:
+        story_keys = [f"story_{i}" for i in range(1, len(graphs) + 1)]
+
+    symbols = SymbolTable()
+    aligned = [_AlignedGraph(StoryGraph.from_dict(graph, symbols)) for graph in graphs]
+    base = aligned[0]
+    label = symbols.label
+
+    mappings = [_align_pair(base, other, min_similarity) for other in aligned[1:]]
+
+    # Concept mappings: one entry per reference object matched in another story
+    for node in range(base.graph.object_count):
+        concept = {story_keys[0]: base.graph.node_label(node)}
+        for story, mapping in enumerate(mappings, 1):
+            if node in mapping:
+                concept[story_keys[story]] = aligned[story].graph.node_label(mapping[node])
+        if len(concept) >= min_stories:
+            result["concept_mappings"].append(concept)
+
+    # Relationship mappings: reference edges whose endpoints map onto an edge
+    relation_instances: Dict[str, List[str]] = {}
+    for source in range(base.graph.num_nodes):
+        for target, relation in base.graph.neighbors(source):
+            instances = [f"{base.graph.node_label(source)} {label(relation)} "
+                         f"{base.graph.node_label(target)}"]
+            for story, mapping in enumerate(mappings, 1):
+                if source not in mapping or target not in mapping:
+                    continue
+                other = aligned[story].graph
+                for other_target, other_relation in other.neighbors(mapping[source]):
+                    if other_target == mapping[target]:
+                        instances.append(f"{other.node_label(mapping[source])} "
+                                         f"{label(other_relation)} "
+                                         f"{other.node_label(other_target)}")
+            if len(instances) >= min_stories:
+                relation_instances.setdefault(label(relation), []).extend(instances)
+
+    result["relationship_mappings"] = [
+        {"type": relation_type, "instances": instances}
+        for relation_type, instances in relation_instances.items()
+    ]
+
+    # Structural patterns shared by every graph, in a stable order
+    shared: Optional[Set[str]] = None
+    for graph in aligned:
+        patterns = _structural_patterns(graph.graph, graph.incoming)
+        shared = patterns if shared is None else shared & patterns
+    result["structural_patterns"] = sorted(shared or [])
+
+    return result
+
+def merge_alignments(left: Dict[str, Any], left_reference: Dict[str, Any],
+                     right: Dict[str, Any], right_reference: Dict[str, Any],
+                     min_similarity: float = 0.1) -> Dict[str, Any]:
+    """
+    Merge the alignments of two disjoint groups of stories.
+
+    The reference graphs of both groups are aligned with each other, and each
+    pair of corresponding reference objects joins the concept mappings that
+    contain them. Relationship mappings are merged by relation type and only
+    the structural patterns found in both groups are kept. Build both
+    alignments with `min_stories=1`, so every reference object has a concept
+    mapping to join.
+
+    Args:
+        left: Alignment of the first group, as returned by `align_graphs`.
+        left_reference: Reference (first) graph of the first group.
+        right: Alignment of the second group.
+        right_reference: Reference (first) graph of the second group.
+        min_similarity: Minimum cosine similarity of an accepted correspondence.
+
+    Returns:
+        The combined alignment, whose reference graph is `left_reference`.
+    """
+    bridge = align_graphs([left_reference, right_reference], min_similarity,
+                          story_keys=["left", "right"])
+    counterpart = {mapping["left"]: mapping["right"]
+                   for mapping in bridge["concept_mappings"] if "right" in mapping}
+
+    left_key = _reference_key(left)
+    right_key = _reference_key(right)
+    right_concepts = {concept[right_key]: concept
+                      for concept in right["concept_mappings"] if right_key in concept}
+
+    concept_mappings = []
+    joined = set()
+    for concept in left["concept_mappings"]:
+        match = right_concepts.get(counterpart.get(concept.get(left_key)))
+        if match is not None:
+            concept = {**concept, **match}
+            joined.add(id(match))
+        concept_mappings.append(concept)
+    concept_mappings.extend(concept for concept in right["concept_mappings"]
+                            if id(concept) not in joined)
+
+    relation_instances: Dict[str, List[str]] = {}
+    for relation in left["relationship_mappings"] + right["relationship_mappings"]:
+        relation_instances.setdefault(relation["type"], []).extend(relation["instances"])
+
+    right_patterns = set(right["structural_patterns"])
+    return {
+        "structural_patterns": [pattern for pattern in left["structural_patterns"]
+                                if pattern in right_patterns],
+        "concept_mappings": concept_mappings,
+        "relationship_mappings": [
+            {"type": relation_type, "instances": instances}
+            for relation_type, instances in relation_instances.items()
+        ]
+    }
+
+def _reference_key(alignment: Dict[str, Any]) -> Optional[str]:
+    """Return the story key of an alignment's reference graph."""
+    for concept in alignment["concept_mappings"]:
+        return next(iter(concept))
+    return None
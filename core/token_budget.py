@@ -0,0 +1,72 @@
+# core/token_budget.py
+"""
+This module provides token counting and budgeting helpers for prompts.
+
+Token counts are approximated locally (one token per word or punctuation
+mark), which is close to BPE tokenizers on English prose and needs no
+model-specific vocabulary.
+"""
+
+import re
+from typing import Callable, List, Sequence, TypeVar
+
+T = TypeVar("T")
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+def count_tokens(text: str) -> int:
+    """
+    Approximate the number of tokens in a text.
+
+    Args:
+        text: The text to measure.
+
+    Returns:
+        The approximate token count.
+    """
+    return sum(1 for _ in _TOKEN.finditer(text))
+
+def pack_by_budget(items: Sequence[T], costs: Sequence[int], budget: int) -> List[List[T]]:
+    """
+    Greedily pack items, in order, into chunks whose total cost fits a budget.
+
+    An item whose cost alone exceeds the budget is placed in a chunk of its own.
+
+    Args:
+        items: The items to pack.
+        costs: The token cost of each item.
+        budget: Maximum total cost of a chunk.
+
+    Returns:
+        The chunks, preserving item order.
+    """
+    chunks: List[List[T]] = []
+    current: List[T] = []
+    used = 0
+    for item, cost in zip(items, costs):
+        if current and used + cost > budget:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+def reduce_tree(items: List[T], combine: Callable[[List[T]], List[T]]) -> T:
+    """
+    Merge items level by level until a single item remains.
+
+    Args:
+        items: The items to merge; must not be empty.
+        combine: Function that merges one level of items into a shorter list.
+
+    Returns:
+        The final merged item.
+    """
+    while len(items) > 1:
+        merged = combine(items)
+        if len(merged) >= len(items):
+            raise ValueError("reduce step did not shrink the number of items")
+        items = merged
+    return items[0]
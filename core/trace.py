@@ -0,0 +1,246 @@
+# core/trace.py
+"""
+This module records LLM traffic to a trace file and replays it as a backend.
+
+`RecordingBackend` wraps any backend and appends one record per call (prompt,
+response, latency and token counts) to a gzip-compressed JSON Lines trace.
+`ReplayBackend` serves the recorded responses with the recorded latencies,
+optionally scaled, so production timing can be reproduced offline. A prompt
+that is not in the trace is answered with a response recorded for a prompt
+from the same template (same instruction prefix), with a latency drawn from
+that template's recorded latencies, so load tests can vary their inputs.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Any, Iterator, Optional
+
+from core.token_budget import count_tokens
+
+# Version of the trace record format
+TRACE_VERSION = 1
+
+def prompt_key(prompt: str) -> str:
+    """Return the short digest under which a prompt is recorded."""
+    return hashlib.sha256(str(prompt).encode("utf-8")).hexdigest()[:16]
+
+def _template_key(prompt: str) -> str:
+    """Return the digest of a prompt's instruction prefix, or '' for a plain string."""
+    prefix_key = getattr(prompt, "prefix_key", None)
+    return prefix_key[:16] if prefix_key else ""
+
+class TraceWriter:
+    """
+    Append-only, thread-safe writer of a gzip-compressed JSON Lines trace.
+    """
+
+    def __init__(self, path: str, metadata: Optional[Dict[str, Any]] = None):
+        """
+        Create the trace file, replacing any previous one.
+
+        Args:
+            path: Path of the trace file.
+            metadata: Extra fields for the header record, such as the model.
+        """
+        self.path = path
+        self.count = 0
+        self._lock = threading.Lock()
+        self._start = time.time()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        header = {"version": TRACE_VERSION, "started_at": self._start}
+        header.update(metadata or {})
+        self._file.write(json.dumps(header) + "\n")
+
+    def write(self, prompt: str, response: str, latency: float, started_at: float) -> None:
+        """
+        Record one completed call.
+
+        Args:
+            prompt: The prompt sent to the LLM.
+            response: The LLM's response.
+            latency: Duration of the call in seconds.
+            started_at: Wall-clock time the call started.
+        """
+        record = {
+            "t": round(started_at - self._start, 6),
+            "key": prompt_key(prompt),
+            "template": _template_key(prompt),
+            "prompt": str(prompt),
+            "response": response,
+            "latency": round(latency, 6),
+            "prompt_tokens": getattr(prompt, "tokens", None) or count_tokens(prompt),
+            "response_tokens": count_tokens(response)
+        }
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self.count += 1
+
+    def close(self) -> None:
+        """Flush and close the trace file."""
+        with self._lock:
+            self._file.close()
+
+def read_trace(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Read the call records of a trace file.
+
+    Args:
+        path: Path of the trace file.
+
+    Yields:
+        The call records, in the order they were recorded.
+
+    Raises:
+        ValueError: If the file is not a trace of a supported version.
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as file:
+        header = json.loads(file.readline() or "{}")
+        if header.get("version") != TRACE_VERSION:
+            raise ValueError(f"{path} is not a version {TRACE_VERSION} LLM trace")
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+class RecordingBackend:
+    """
+    Backend wrapper that records every call it forwards to a trace.
+    """
+
+    def __init__(self, backend: Any, writer: TraceWriter):
+        """
+        Initialize the recorder.
+
+        Args:
+            backend: The backend that makes the calls.
+            writer: The trace the calls are recorded to.
+        """
+        self.backend = backend
+        self.writer = writer
+
+    def complete(self, prompt: str, settings: Dict[str, Any]) -> str:
+        """Forward a call to the wrapped backend and record it."""
+        started_at, start = time.time(), time.perf_counter()
+        response = self.backend.complete(prompt, settings)
+        self.writer.write(prompt, response, time.perf_counter() - start, started_at)
+        return response
+
+    async def acomplete(self, prompt: str, settings: Dict[str, Any]) -> str:
+        """Forward an async call to the wrapped backend and record it."""
+        started_at, start = time.time(), time.perf_counter()
+        response = await self.backend.acomplete(prompt, settings)
+        self.writer.write(prompt, response, time.perf_counter() - start, started_at)
+        return response
+
+    def stream(self, prompt: str, settings: Dict[str, Any]) -> Iterator[str]:
+        """Forward a streaming call and record it once the stream is exhausted."""
+        started_at, start = time.time(), time.perf_counter()
+        stream = getattr(self.backend, "stream", None)
+        chunks = (stream(prompt, settings) if stream is not None
+                  else iter([self.backend.complete(prompt, settings)]))
+        parts = []
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+        self.writer.write(prompt, "".join(parts), time.perf_counter() - start, started_at)
+
+class ReplayBackend:
+    """
+    Backend that serves the responses and latencies of a recorded trace.
+    """
+
+    def __init__(self, records: List[Dict[str, Any]], latency_scale: float = 1.0,
+                 seed: Optional[int] = None):
+        """
+        Index the recorded calls.
+
+        Args:
+            records: The call records of a trace.
+            latency_scale: Factor applied to every recorded latency; 0 replays
+                           without delay.
+            seed: Seed used to pick fallback responses and latencies.
+
+        Raises:
+            ValueError: If the trace has no calls.
+        """
+        if not records:
+            raise ValueError("cannot replay an empty trace")
+        self.records = records
+        self.latency_scale = latency_scale
+        self.misses = 0
+        self._random = random.Random(seed)
+        self._by_key: Dict[str, Dict[str, Any]] = {}
+        self._by_template: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for record in records:
+            self._by_key.setdefault(record["key"], record)
+            self._by_template[record.get("template", "")].append(record)
+
+    def _lookup(self, prompt: str) -> Any:
+        """Return the response and latency to replay for a prompt."""
+        record = self._by_key.get(prompt_key(prompt))
+        if record is not None:
+            return record["response"], record["latency"] * self.latency_scale
+
+        # Unrecorded prompt: a response of the same template, with that template's latencies
+        self.misses += 1
+        group = self._by_template.get(_template_key(prompt)) or self.records
+        record = self._random.choice(group)
+        latency = self._random.choice(group)["latency"]
+        return record["response"], latency * self.latency_scale
+
+    def complete(self, prompt: str, settings: Dict[str, Any]) -> str:
+        """
+        Replay the recorded response to a prompt, blocking for its latency.
+
+        Args:
+            prompt: The prompt to respond to.
+            settings: Request settings (model, temperature, max_tokens).
+
+        Returns:
+            The recorded response.
+        """
+        response, latency = self._lookup(prompt)
+        if latency > 0:
+            time.sleep(latency)
+        return response
+
+    async def acomplete(self, prompt: str, settings: Dict[str, Any]) -> str:
+        """
+        Replay the recorded response to a prompt without blocking the event loop.
+
+        Args:
+            prompt: The prompt to respond to.
+            settings: Request settings (model, temperature, max_tokens).
+
+        Returns:
+            The recorded response.
+        """
+        response, latency = self._lookup(prompt)
+        if latency > 0:
+            await asyncio.sleep(latency)
+        return response
+
+def create_replay_backend(config: Dict[str, Any]) -> ReplayBackend:
+    """
+    Create a replay backend from the trace named in the configuration.
+
+    Args:
+        config: Configuration dictionary. Reads 'trace_path',
+                'replay_latency_scale' and 'replay_seed'.
+
+    Returns:
+        The replay backend.
+    """
+    return ReplayBackend(list(read_trace(config["trace_path"])),
+                         latency_scale=config.get("replay_latency_scale", 1.0),
+                         seed=config.get("replay_seed"))
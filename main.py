@@ -6,24 +6,38 @@ This script serves as the main entry point for the application,
 orchestrating the workflow of the analogical reasoning process.
 """
 
+import argparse
+import asyncio
 import os
-from typing import List
-from core.analogical_reasoner import (
-    initial_graph_construction, 
-    identify_common_relations,
-    identify_alignable_differences,
-    re_represent_relations
-)
+from typing import Dict, List, Any, Callable, Optional, Sequence, Tuple
+from core.analogy_service import AnalogyService, serve
+from core.analogical_reasoner import build_graphs
+from core.batch_runner import run_batch
+from core.graph_renderer import render_graphs
 from core.llm_interface import LLMInterface
+from core.metrics import Metrics
+from core.pipeline import REASONING_STAGES, create_reasoning_pipeline
+from core.retrieval_index import retrieve_analogues
+from core.snapshot import SnapshotStories, build_snapshot, open_snapshot
+from core.structure_mapping import align_graphs
+from core.trace import RecordingBackend, TraceWriter
 from utils.config_loader import load_config
-from utils.story_generator import generate_story
+from utils.story_generator import generate_stories
+from utils.story_dedup import StoryDeduplicator, create_deduplicator
+from utils.story_loader import StoryManifest, iter_stories
 
-def load_stories_from_directory(directory_path: str) -> List[str]:
+def load_stories_from_directory(directory_path: str,
+                                manifest_path: Optional[str] = None,
+                                deduplicator: Optional[StoryDeduplicator] = None) -> List[str]:
     """
     Load all story files from the specified directory.
     
     Args:
         directory_path: Path to the directory containing story files.
+        manifest_path: Optional path to the story manifest; files unchanged
+                       since the previous run are taken from it instead of read.
+        deduplicator: If given, only one story of each group of near-duplicates
+                      is loaded.
         
     Returns:
         A list of story contents as strings.
@@ -36,94 +50,379 @@ def load_stories_from_directory(directory_path: str) -> List[str]:
         os.makedirs(directory_path, exist_ok=True)
         return stories
     
-    # Load all text files in the directory
-    for filename in os.listdir(directory_path):
-        if filename.endswith('.txt'):
-            try:
-                file_path = os.path.join(directory_path, filename)
-                with open(file_path, 'r', encoding='utf-8') as file:
-                    story_content = file.read()
-                    if story_content.strip():  # Ensure story isn't empty
-                        stories.append(story_content)
-                        print(f"Loaded story from {filename}")
-            except Exception as e:
-                print(f"Error loading story from {filename}: {e}")
+    manifest = StoryManifest(manifest_path)
+    changed = 0
+    loaded = iter_stories(directory_path, manifest=manifest)
+    if deduplicator is not None:
+        loaded = deduplicator.filter(loaded)
+    for story in loaded:
+        stories.append(story.text)
+        changed += story.changed
+    
+    print(f"Loaded {len(stories)} stories from {directory_path} ({changed} new or modified)")
+    if deduplicator is not None and deduplicator.duplicates:
+        print(f"Skipped {len(deduplicator.duplicates)} near-duplicate stories")
     
     return stories
 
-def main():
+def load_stories_from_snapshot(snapshot_path: str, directory_path: str
+                               ) -> Optional[Tuple[Sequence[str],
+                                                   Callable[[str], Optional[Dict[str, Any]]]]]:
+    """
+    Load stories from a snapshot if it is up to date with the story directory.
+    
+    Nothing is decoded here: stories and graphs are read from the memory-mapped
+    snapshot when they are first accessed.
+    
+    Args:
+        snapshot_path: Path of the snapshot file.
+        directory_path: Path to the directory the snapshot was built from.
+        
+    Returns:
+        A lazy sequence of the stories and a lookup returning the prebuilt
+        graph of a story from it, or None if there is no usable snapshot.
+    """
+    snapshot = open_snapshot(snapshot_path, directory_path)
+    if snapshot is None:
+        if os.path.exists(snapshot_path):
+            print(f"Snapshot {snapshot_path} is out of date; "
+                  f"rebuild it with 'python main.py snapshot build'")
+        return None
+    
+    stories = SnapshotStories(snapshot)
+    print(f"Loaded {len(stories)} stories from snapshot {snapshot_path}")
+    return stories, stories.graph
+
+def seed_deduplicator(deduplicator: StoryDeduplicator, stories: SnapshotStories,
+                      directory_path: str) -> None:
+    """
+    Register the stories of a snapshot with the deduplicator.
+    
+    Args:
+        deduplicator: The story deduplicator.
+        stories: The stories loaded from the snapshot.
+        directory_path: Path to the directory the snapshot was built from.
+    """
+    for index, story in enumerate(stories):
+        deduplicator.add_text(os.path.join(directory_path, stories.snapshot.name(index)), story)
+
+def run_snapshot_command(config: dict, directory_path: str, action: str) -> None:
+    """
+    Build or inspect the story snapshot.
+    
+    Args:
+        config: Configuration dictionary.
+        directory_path: Path to the directory containing story files.
+        action: 'build' or 'info'.
+    """
+    snapshot_path = config.get("snapshot_path", os.path.join("data", "cache", "stories.snapshot"))
+    if action == "build":
+        count = build_snapshot(directory_path, snapshot_path, workers=config.get("graph_workers"),
+                               deduplicator=create_deduplicator(config))
+        print(f"Wrote snapshot of {count} stories to {snapshot_path}")
+        return
+    
+    snapshot = open_snapshot(snapshot_path)
+    if snapshot is None:
+        print(f"No snapshot at {snapshot_path}")
+        return
+    with snapshot:
+        state = "stale" if snapshot.is_stale(directory_path, thorough=True) else "up to date"
+        print(f"{snapshot_path}: {len(snapshot)} stories, {snapshot.symbol_count} symbols, "
+              f"{len(snapshot.edge_relations)} edges, {os.path.getsize(snapshot_path)} bytes "
+              f"({state})")
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse command-line arguments.
+    
+    Args:
+        argv: Argument list; defaults to sys.argv[1:].
+        
+    Returns:
+        The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Analogical Reasoning Engine for "
+                                                 "Software Engineering Education")
+    parser.add_argument("--resume", action="store_true",
+                        help="restore pipeline stages whose inputs are unchanged from checkpoints")
+    parser.add_argument("--from-stage", choices=REASONING_STAGES,
+                        help="re-run this stage and all later ones, restoring earlier stages")
+    parser.add_argument("--serve", action="store_true",
+                        help="run as a long-lived analogy service instead of a single run")
+    parser.add_argument("--host", default="127.0.0.1", help="service host (with --serve)")
+    parser.add_argument("--port", type=int, default=8080, help="service port (with --serve)")
+    parser.add_argument("--socket", metavar="PATH",
+                        help="listen on this Unix socket instead of TCP (with --serve)")
+    parser.add_argument("--no-stream", action="store_true",
+                        help="print the principle only once it is complete")
+    parser.add_argument("--record-trace", metavar="PATH",
+                        help="record every LLM call to a trace file for replay")
+    parser.add_argument("--metrics-json", metavar="PATH",
+                        help="write a JSON run report with timings and LLM usage")
+    parser.add_argument("--metrics-prom", metavar="PATH",
+                        help="write run metrics in Prometheus text format")
+    commands = parser.add_subparsers(dest="command")
+    snapshot = commands.add_parser("snapshot", help="manage the memory-mapped story snapshot")
+    snapshot.add_argument("action", choices=("build", "info"),
+                          help="build the snapshot from data/stories, or describe it")
+    batch = commands.add_parser("batch", help="run every (source set, target domain) job "
+                                              "from config on a process pool")
+    batch.add_argument("--output", metavar="PATH",
+                       help="JSON Lines results file (default: batch_output_path in config)")
+    batch.add_argument("--workers", type=int, help="number of worker processes")
+    render = commands.add_parser("render", help="draw the corpus story graphs and their "
+                                                "Phase 2 correspondences")
+    render.add_argument("--output", metavar="PATH",
+                        help="SVG, or DOT if it ends in .dot (default: render_output_path in config)")
+    render.add_argument("--no-overlay", action="store_true",
+                        help="omit the Phase 2 correspondences")
+    render.add_argument("--iterations", type=int, help="number of layout steps")
+    return parser.parse_args(argv)
+
+def run_service(config: dict, stories: Sequence[str], llm: LLMInterface,
+                args: argparse.Namespace) -> None:
+    """
+    Serve analogy jobs over HTTP with the corpus and LLM interface kept warm.
+    
+    Args:
+        config: Configuration dictionary.
+        stories: The loaded story corpus.
+        llm: The shared LLM interface.
+        args: Parsed command-line arguments.
+    """
+    async def run():
+        service = AnalogyService(config, stories, llm,
+                                 workers=config.get("service_workers", 4),
+                                 queue_size=config.get("service_queue_size", 64))
+        await serve(service, args.host, args.port, args.socket)
+    
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("\nAnalogy service stopped.")
+
+def run_render_command(config: dict, stories: Sequence[str],
+                       known_graph: Optional[Callable[[str], Dict[str, Any]]],
+                       args: argparse.Namespace) -> None:
+    """
+    Render the corpus story graphs, overlaid with their Phase 2 correspondences.
+    
+    Args:
+        config: Configuration dictionary.
+        stories: The loaded story corpus.
+        known_graph: Returns the snapshot graph of a story, if a snapshot is loaded.
+        args: Parsed command-line arguments.
+    """
+    output_path = args.output or config.get("render_output_path", "graphs.svg")
+    graphs = ([known_graph(story) for story in stories] if known_graph
+              else list(build_graphs(stories, workers=config.get("graph_workers"))))
+    common_relations = None if args.no_overlay or len(graphs) < 2 else align_graphs(graphs)
+    stats = render_graphs(graphs, output_path, common_relations,
+                          iterations=args.iterations or config.get("render_iterations", 50),
+                          seed=config.get("render_seed", 0))
+    print(f"\nRendered {stats['nodes']} entities, {stats['edges']} relationships and "
+          f"{stats['correspondences']} correspondences to {output_path} "
+          f"(layout {stats['layout_seconds']:.2f}s, write {stats['write_seconds']:.2f}s)")
+
+def print_results_header() -> None:
+    """Print the heading shown above the derived principle."""
+    print("\nResults:")
+    print("-" * 50)
+    print("General Principle Derived:")
+
+def main(argv: Optional[List[str]] = None):
     """Main execution function."""
+    args = parse_args(argv)
+    
     # Load configuration
     config = load_config()
     
+    # Collect run metrics only when a report is requested or the service
+    # exposes them on GET /metrics
+    metrics = Metrics(enabled=bool(args.metrics_json or args.metrics_prom or args.serve
+                                   or config.get("metrics_enabled", False)))
+    
     # Initialize LLM interface
-    llm = LLMInterface(config)
+    llm = LLMInterface(config, metrics=metrics)
+    trace = None
+    if args.record_trace:
+        trace = TraceWriter(args.record_trace, {"model": llm.model})
+        llm.backend = RecordingBackend(llm.backend, trace)
+    try:
+        run_command(args, config, llm, metrics)
+        export_metrics(args, llm, metrics)
+    finally:
+        if trace is not None:
+            trace.close()
+            print(f"Recorded {trace.count} LLM calls to {args.record_trace}")
+
+def run_command(args: argparse.Namespace, config: dict, llm: LLMInterface,
+                metrics: Metrics) -> None:
+    """
+    Run the command selected on the command line.
     
+    Args:
+        args: Parsed command-line arguments.
+        config: Configuration dictionary.
+        llm: The LLM interface.
+        metrics: The run metrics registry.
+    """
     print("Analogical Reasoning Engine for Software Engineering Education")
     print("=" * 70)
     
-    # Load stories from directory
-    print("\nLoading stories from data/stories directory...")
     stories_directory = os.path.join('data', 'stories')
-    stories = load_stories_from_directory(stories_directory)
+    if args.command == "snapshot":
+        run_snapshot_command(config, stories_directory, args.action)
+        return
     
-    # Generate stories if not enough are found
+    # Load stories from the snapshot if it is current, otherwise from the directory
+    print("\nLoading stories from data/stories directory...")
+    known_graph = None
+    deduplicator = create_deduplicator(config)
+    with metrics.timer("stage_seconds", {"stage": "story_loading"}):
+        loaded = (load_stories_from_snapshot(config["snapshot_path"], stories_directory)
+                  if config.get("snapshot_path") else None)
+        if loaded is not None:
+            stories, known_graph = loaded
+        else:
+            stories = load_stories_from_directory(stories_directory,
+                                                  config.get("story_manifest_path"),
+                                                  deduplicator)
+    metrics.set_gauge("stories_loaded", len(stories))
+    
+    if args.serve:
+        run_service(config, stories, llm, args)
+        return
+    
+    if args.command == "batch":
+        output_path = args.output or config.get("batch_output_path", "batch_results.jsonl")
+        graphs = [known_graph(story) for story in stories] if known_graph else None
+        with metrics.timer("stage_seconds", {"stage": "batch"}):
+            count = run_batch(config, list(stories), llm, output_path, workers=args.workers,
+                              resume=args.resume, graphs=graphs)
+        print(f"\nWrote {count} batch results to {output_path}")
+        return
+    
+    if args.command == "render":
+        with metrics.timer("stage_seconds", {"stage": "render"}):
+            run_render_command(config, stories, known_graph, args)
+        return
+    
+    # Decide which stories need generating: default stories if not enough are
+    # found, plus a new story from one of the domains in config
+    if known_graph is not None and deduplicator is not None:
+        # Stories from a snapshot bypassed the deduplicator; register them so
+        # generated near-duplicates of them are caught
+        seed_deduplicator(deduplicator, stories, stories_directory)
+    stories = list(stories)
+    seed_domains = []
     if len(stories) < 2:
         print(f"Not enough stories found in {stories_directory}. Generating default stories...")
-        domains = config.get("story_domains", ["sorting algorithms", "database indexing"])
-        
-        # Ensure data/stories directory exists
-        os.makedirs(stories_directory, exist_ok=True)
-        
-        for i, domain in enumerate(domains[:2]):
-            story = generate_story(domain, llm)
-            stories.append(story)
-            print(f"Generated story about {domain}")
-            
-            # Save generated story to file
-            story_filename = f"story_{i+1}.txt"
-            story_path = os.path.join(stories_directory, story_filename)
-            try:
-                with open(story_path, 'w', encoding='utf-8') as file:
-                    file.write(story)
-                print(f"Saved story to {story_filename}")
-            except Exception as e:
-                print(f"Error saving story to {story_filename}: {e}")
-    
-    # Generate a new story from one of the domains in config
+        seed_domains = config.get("story_domains", ["sorting algorithms", "database indexing"])[:2]
+    
     domains = config.get("story_domains", ["software design patterns"])
     target_domain = domains[-1] if domains else "software testing"
     print(f"\nGenerating a new story about {target_domain}...")
-    new_story = generate_story(target_domain, llm)
-    stories.append(new_story)
     
-    # Apply analogical reasoning process
-    print("\nPerforming analogical reasoning...")
+    # Fan all story requests out to the LLM at once
+    with metrics.timer("stage_seconds", {"stage": "story_generation"}):
+        generated = generate_stories(seed_domains + [target_domain], llm)
+    seed_stories, new_story = generated[:-1], generated[-1]
+    
+    if seed_stories:
+        # Ensure data/stories directory exists
+        os.makedirs(stories_directory, exist_ok=True)
+    
+    for domain, story in zip(seed_domains, seed_stories):
+        print(f"Generated story about {domain}")
+        
+        # Pick an unused file name, and skip stories the corpus already holds a copy of
+        story_number = 1
+        while os.path.exists(os.path.join(stories_directory, f"story_{story_number}.txt")):
+            story_number += 1
+        story_filename = f"story_{story_number}.txt"
+        story_path = os.path.join(stories_directory, story_filename)
+        duplicate = (deduplicator.add_text(story_path, story)
+                     if deduplicator is not None else None)
+        if duplicate is not None:
+            print(f"Not saving story: near-duplicate of {os.path.basename(duplicate)}")
+            continue
+        stories.append(story)
+        
+        # Save generated story to file
+        try:
+            with open(story_path, 'w', encoding='utf-8') as file:
+                file.write(story)
+            print(f"Saved story to {story_filename}")
+        except Exception as e:
+            print(f"Error saving story to {story_filename}: {e}")
     
-    # 1. Create graph representations for each story
-    print("Step 1: Initial Graph Construction...")
-    graphs = [initial_graph_construction(story) for story in stories]
+    # Keep only the stories most analogous to the new one
+    top_k = config.get("retrieval_top_k")
+    if top_k:
+        candidates = retrieve_analogues(stories, new_story, top_k,
+                                        config.get("retrieval_index_path"))
+        print(f"Selected {len(candidates)} of {len(stories)} stories as analogues")
+        stories = candidates
     
-    # 2. Identify common relations
-    print("Step 2: Identifying Common Relations...")
-    common_relations = identify_common_relations(stories, llm)
+    stories.append(new_story)
+    
+    # Apply analogical reasoning process, streaming patterns and the principle
+    # to the terminal as they arrive
+    print("\nPerforming analogical reasoning...")
+    streamed = []
     
-    # 3. Identify alignable differences
-    print("Step 3: Identifying Alignable Differences...")
-    alignable_differences = identify_alignable_differences(common_relations)
+    def show_event(stage: str, event: str, payload: Any) -> None:
+        if event == "pattern":
+            print(f"  Found pattern: {payload}")
+        elif event == "chunk":
+            if not streamed:
+                print_results_header()
+            streamed.append(payload)
+            print(payload, end="", flush=True)
     
-    # 4. Re-represent to derive the general principle
-    print("Step 4: Re-representation to Derive General Principle...")
-    general_principle = re_represent_relations(common_relations, llm)
+    stream = config.get("stream_output", True) and not args.no_stream
+    pipeline = create_reasoning_pipeline(llm, config, known_graph)
+    results = pipeline.run({"stories": stories}, resume=args.resume, from_stage=args.from_stage,
+                           on_event=show_event if stream else None)
+    general_principle = results["rncr"]
     
     # Display results
-    print("\nResults:")
-    print("-" * 50)
-    print("General Principle Derived:")
-    print(general_principle)
+    if streamed:
+        print()
+    else:
+        print_results_header()
+        print(general_principle)
     print("-" * 50)
     
+    if llm.cache is not None:
+        stats = llm.cache.stats()
+        print(f"\nLLM response cache: {stats['hits']} hits, {stats['misses']} misses")
+    if llm.semantic_cache is not None:
+        stats = llm.semantic_cache.stats()
+        print(f"Semantic cache: {stats['hits']} near-duplicate hits, {stats['entries']} entries")
+    
     print("\nAnalogical reasoning process complete.")
 
+def export_metrics(args: argparse.Namespace, llm: LLMInterface, metrics: Metrics) -> None:
+    """
+    Record the cache gauges and write the metrics files requested on the command line.
+    
+    Called once the command has finished, whichever it was.
+    
+    Args:
+        args: Parsed command-line arguments.
+        llm: The LLM interface.
+        metrics: The run metrics registry.
+    """
+    llm.record_cache_metrics()
+    if args.metrics_json:
+        metrics.write_report(args.metrics_json)
+        print(f"Wrote run report to {args.metrics_json}")
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom)
+        print(f"Wrote Prometheus metrics to {args.metrics_prom}")
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,90 @@
+# tests/test_http_backend.py
+"""
+Tests of the HTTP backend against the bundled stand-in LLM server.
+"""
+
+import time
+
+import pytest
+
+from core.http_backend import HTTPBackend, LLMBackendError
+from utils.standin_llm_server import serve_in_background
+
+SETTINGS = {"model": "stand-in", "temperature": 0.0, "max_tokens": None}
+PATTERN_PROMPT = "Identify common patterns across these stories."
+
+@pytest.fixture
+def serve():
+    servers, backends = [], []
+
+    def start(**settings):
+        backend_settings = settings.pop("backend", {})
+        server = serve_in_background(**settings)
+        backend = HTTPBackend(f"http://127.0.0.1:{server.server_port}/v1",
+                              backoff_base=0.01, **backend_settings)
+        servers.append(server)
+        backends.append(backend)
+        return server, backend
+
+    yield start
+    for backend in backends:
+        backend.close()
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+def test_retries_429_after_retry_after(serve):
+    server, backend = serve(fail_first=2, fail_status=429, retry_after=0.2)
+    start = time.perf_counter()
+    assert backend.complete("hello", SETTINGS) == "This is a simulated response from the LLM."
+    assert time.perf_counter() - start >= 0.4
+    assert server.requests == 3 and server.failures == 2
+
+def test_gives_up_when_retries_run_out(serve):
+    server, backend = serve(fail_rate=1.0, fail_status=503, backend={"max_retries": 2})
+    with pytest.raises(LLMBackendError) as error:
+        backend.complete("hello", SETTINGS)
+    assert error.value.status == 503
+    assert server.requests == 3
+
+def test_reuses_connections_across_calls(serve):
+    server, backend = serve()
+    for _ in range(5):
+        backend.complete("hello", SETTINGS)
+        "".join(backend.stream("hello", SETTINGS))
+    assert server.requests == 10
+    assert server.connections == 1 and backend.pool.opened == 1
+
+def test_rate_limits_tokens_per_minute(serve):
+    # The second call overdraws the 6000-token bucket by about 30 tokens,
+    # which refill at 100 tokens per second
+    server, backend = serve(backend={"tokens_per_minute": 6000})
+    prompt = "word " * 3010
+    start = time.perf_counter()
+    backend.complete(prompt, SETTINGS)
+    backend.complete(prompt, SETTINGS)
+    assert time.perf_counter() - start >= 0.2
+    assert server.requests == 2
+
+def test_malformed_200_raises_backend_error(serve):
+    server, backend = serve(malformed=True)
+    with pytest.raises(LLMBackendError) as error:
+        backend.complete("hello", SETTINGS)
+    assert error.value.status == 200
+    with pytest.raises(LLMBackendError):
+        "".join(backend.stream("hello", SETTINGS))
+    assert server.requests == 2
+
+def test_streams_server_sent_events(serve):
+    server, backend = serve()
+    chunks = list(backend.stream(PATTERN_PROMPT, SETTINGS))
+    assert len(chunks) > 1
+    assert "".join(chunks) == backend.complete(PATTERN_PROMPT, SETTINGS)
+
+def test_interrupted_stream_raises_backend_error(serve):
+    server, backend = serve(drop_stream_after=3)
+    chunks = []
+    with pytest.raises(LLMBackendError):
+        for chunk in backend.stream(PATTERN_PROMPT, SETTINGS):
+            chunks.append(chunk)
+    assert len(chunks) == 3
@@ -0,0 +1,54 @@
+# tests/test_mapping_columns.py
+"""
+Round-trip tests of the columnar Phase 3 mappings.
+"""
+
+from core.analogical_reasoner import identify_alignable_differences
+from core.mapping_columns import AlignableDifferences, MappingColumns, split_instance
+
+COMMON_RELATIONS = {
+    "concept_mappings": [
+        {"story_1": "Quicksort", "story_2": "B-tree index"},
+        {"story_2": "one", "story_1": "Alex"},
+        {"story_1": "Maya"}
+    ],
+    "relationship_mappings": [
+        {"type": "improves", "instances": ["quicksort improves sorting speed",
+                                           "B-tree index improves lookup"]},
+        {"type": "relates_to_0", "instances": ["one", "two words", "Alex relates_to_1 Maya"]},
+        {"type": "uses", "instances": []}
+    ]
+}
+
+def test_columns_round_trip_common_relations():
+    columns = MappingColumns.from_common_relations(COMMON_RELATIONS)
+    assert columns.to_common_relations() == COMMON_RELATIONS
+
+def test_differences_keep_original_variants():
+    differences = identify_alignable_differences(COMMON_RELATIONS)["differences"]
+    concepts = [d for d in differences if d["type"] == "concept_variation"]
+    relations = [d for d in differences if d["type"] == "relationship_variation"]
+
+    assert [d["variants"] for d in concepts] == [
+        list(mapping.values()) for mapping in COMMON_RELATIONS["concept_mappings"]]
+    assert [(d["relationship_type"], d["variants"]) for d in relations] == [
+        (mapping["type"], mapping["instances"])
+        for mapping in COMMON_RELATIONS["relationship_mappings"]]
+    assert all(d["common_abstract_concept"] for d in concepts)
+    assert all(d["common_abstract_relation"] for d in relations)
+
+def test_instances_split_around_relation_labels():
+    assert split_instance("quicksort improves sorting speed", ["improves"]) == (
+        "quicksort", "improves", "sorting speed")
+    assert split_instance("B-tree index improves lookup", ["improves"]) == (
+        "B-tree index", "improves", "lookup")
+    assert split_instance("one", ["improves"]) == ("one", "", "")
+    assert split_instance("Alex relates_to_1 Maya", ["improves"]) == (
+        "Alex", "relates_to_1", "Maya")
+
+def test_variant_groups_use_parsed_relations():
+    differences = AlignableDifferences(MappingColumns.from_common_relations(COMMON_RELATIONS))
+    improves = next(d for d in differences.iter_differences()
+                    if d.get("relationship_type") == "improves")
+    assert improves["variant_groups"] == {"improves": 2}
+    assert improves["common_abstract_relation"] == "improves"
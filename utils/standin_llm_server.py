@@ -0,0 +1,193 @@
+# utils/standin_llm_server.py
+"""
+A local stand-in for an OpenAI-compatible chat completion API.
+
+It answers `POST <prefix>/chat/completions` with the simulated responses
+(as server-sent events when the request sets `stream`), keeps connections alive, and can inject latency and 429/5xx failures so the
+HTTP backend's pooling, rate limiting and retries can be exercised offline.
+
+Usage:
+    python -m utils.standin_llm_server --port 8765 --latency 0.05 --fail-rate 0.2
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+from core.llm_interface import SimulatedBackend
+from core.token_budget import count_tokens
+
+class StandInServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the stand-in's settings and counters."""
+
+    daemon_threads = True
+
+    def __init__(self, address: Any, latency: float = 0.0, fail_rate: float = 0.0,
+                 fail_status: int = 429, seed: Optional[int] = None, fail_first: int = 0,
+                 retry_after: Optional[float] = None, malformed: bool = False,
+                 drop_stream_after: Optional[int] = None):
+        """
+        Initialize the server.
+
+        Args:
+            address: (host, port) to listen on.
+            latency: Seconds to wait before each response.
+            fail_rate: Fraction of requests answered with `fail_status`.
+            fail_status: Status of the injected failures.
+            seed: Seed of the failure injection.
+            fail_first: Number of initial requests that always fail.
+            retry_after: Retry-After seconds sent with the injected failures, or None.
+            malformed: Answer successful requests with a 200 whose body is not JSON.
+            drop_stream_after: Close streamed responses after this many chunks, or None.
+        """
+        super().__init__(address, StandInHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.fail_status = fail_status
+        self.fail_first = fail_first
+        self.retry_after = retry_after
+        self.malformed = malformed
+        self.drop_stream_after = drop_stream_after
+        self.simulator = SimulatedBackend()
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.failures = 0
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Request handler implementing the chat completion endpoint."""
+
+    protocol_version = "HTTP/1.1"
+    server: StandInServer
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, {"error": {"message": "not found"}})
+            return
+
+        with self.server.lock:
+            self.server.requests += 1
+            fail = (self.server.requests <= self.server.fail_first
+                    or self.server.random.random() < self.server.fail_rate)
+            if fail:
+                self.server.failures += 1
+        if fail:
+            headers = {}
+            if self.server.retry_after is not None:
+                headers["Retry-After"] = str(self.server.retry_after)
+            self._send(self.server.fail_status, {"error": {"message": "injected failure"}},
+                       headers)
+            return
+
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+
+        prompt = "\n".join(message.get("content", "") for message in request.get("messages", []))
+        if self.server.malformed:
+            self._send_raw(200, b"<html>upstream proxy error</html>", "text/html")
+            return
+        if request.get("stream"):
+            self._send_stream(self.server.simulator.stream(prompt, request))
+            return
+        content = self.server.simulator.complete(prompt, request)
+        prompt_tokens, completion_tokens = count_tokens(prompt), count_tokens(content)
+        self._send(200, {
+            "id": f"standin-{self.server.requests}",
+            "object": "chat.completion",
+            "model": request.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens}
+        })
+
+    def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        self._send_raw(status, json.dumps(payload).encode("utf-8"), "application/json", headers)
+
+    def _send_raw(self, status: int, body: bytes, content_type: str,
+                  headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_stream(self, chunks: Any) -> None:
+        """Send content chunks as chat completion server-sent events."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for sent, chunk in enumerate(chunks):
+            if sent == self.server.drop_stream_after:
+                # Cut the connection without ending the chunked body
+                self.close_connection = True
+                return
+            event = json.dumps({"object": "chat.completion.chunk",
+                                "choices": [{"index": 0, "delta": {"content": chunk}}]})
+            self._write_chunk(f"data: {event}\n\n".encode("utf-8"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data: bytes) -> None:
+        """Write one piece of a chunked response; an empty piece ends it."""
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """Silence the default per-request logging."""
+
+def serve_in_background(port: int = 0, **settings: Any) -> StandInServer:
+    """
+    Start the stand-in server on a daemon thread.
+
+    Args:
+        port: Port to listen on; 0 picks a free one.
+        **settings: Keyword arguments for StandInServer.
+
+    Returns:
+        The running server; its URL is http://127.0.0.1:<server.server_port>/v1.
+    """
+    server = StandInServer(("127.0.0.1", port), **settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the stand-in server in the foreground."""
+    parser = argparse.ArgumentParser(description="Local stand-in LLM API server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per response")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="fraction of requests answered with --fail-status")
+    parser.add_argument("--fail-status", type=int, default=429)
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds sent with failures")
+    args = parser.parse_args(argv)
+
+    server = StandInServer(("127.0.0.1", args.port), latency=args.latency,
+                           fail_rate=args.fail_rate, fail_status=args.fail_status,
+                           retry_after=args.retry_after)
+    print(f"Stand-in LLM API listening on http://127.0.0.1:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
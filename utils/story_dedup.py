@@ -0,0 +1,232 @@
+# utils/story_dedup.py
+"""
+This module detects near-duplicate stories when a corpus is loaded.
+
+Every story is reduced to a 64-bit SimHash fingerprint of its word 3-grams.
+Lightly edited copies of a story have fingerprints only a few bits apart,
+so two stories are near-duplicates when the Hamming distance between their
+fingerprints is at most `max_distance`. Fingerprints are split into
+`max_distance + 1` bands: near-duplicates must agree on at least one band
+exactly, so a banded index finds every candidate without comparing all pairs.
+
+Stories are clustered greedily in load order: the first story of a cluster
+is its canonical story and later near-duplicates are dropped. Fingerprints
+are persisted together with each file's content hash, so only new or
+modified files are fingerprinted again.
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
+
+import numpy as np
+
+from utils.story_loader import Story
+
+# Number of bits in a fingerprint
+FINGERPRINT_BITS = 64
+
+_WORD = re.compile(r"\w+")
+
+def simhash(text: str, shingle_size: int = 3) -> int:
+    """
+    Compute the SimHash fingerprint of a text.
+
+    Args:
+        text: The text.
+        shingle_size: Number of consecutive words per shingle.
+
+    Returns:
+        A 64-bit fingerprint; 0 for a text without words.
+    """
+    words = _WORD.findall(text.lower())
+    if not words:
+        return 0
+    shingles = [" ".join(words[i:i + shingle_size])
+                for i in range(max(1, len(words) - shingle_size + 1))]
+    hashes = np.array([int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"),
+                                                      digest_size=8).digest(), "little")
+                       for shingle in shingles], dtype="<u8")
+    # One row of 64 bits per shingle; a fingerprint bit is set when most shingles set it
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int(np.packbits(majority, bitorder="little").view("<u8")[0])
+
+def hamming_distance(first: int, second: int) -> int:
+    """Return the number of bits in which two fingerprints differ."""
+    return bin(first ^ second).count("1")
+
+class StoryDeduplicator:
+    """
+    Banded SimHash index that keeps one canonical story per near-duplicate cluster.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_distance: int = 6,
+                 shingle_size: int = 3):
+        """
+        Load persisted fingerprints from disk if they exist.
+
+        Args:
+            path: Path to the fingerprint JSON file, or None to keep them in memory.
+            max_distance: Maximum Hamming distance between near-duplicates.
+            shingle_size: Number of consecutive words per shingle.
+        """
+        self.path = path
+        self.max_distance = max_distance
+        self.shingle_size = shingle_size
+        self.fingerprints: Dict[str, Dict[str, Any]] = {}
+        self.duplicates: Dict[str, str] = {}
+        self.computed = 0
+        bounds = np.linspace(0, FINGERPRINT_BITS, max_distance + 2).astype(int)
+        self._bands = [(int(start), (1 << int(end - start)) - 1)
+                       for start, end in zip(bounds[:-1], bounds[1:])]
+        self._buckets: Dict[Tuple[int, int], List[str]] = defaultdict(list)
+        self._canonical: Dict[str, int] = {}
+
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+                if data.get("shingle_size") == shingle_size:
+                    self.fingerprints = data.get("fingerprints", {})
+            except (json.JSONDecodeError, UnicodeDecodeError, IOError) as e:
+                print(f"Error loading story fingerprints: {e}")
+
+    def fingerprint(self, story: Story) -> int:
+        """
+        Return the fingerprint of a story, reusing the stored one if the file is unchanged.
+
+        Args:
+            story: The story.
+
+        Returns:
+            The story's SimHash fingerprint.
+        """
+        entry = self.fingerprints.get(story.path)
+        if entry is not None and entry["sha256"] == story.content_hash:
+            return int(entry["simhash"], 16)
+        fingerprint = simhash(story.text, self.shingle_size)
+        self.computed += 1
+        self.fingerprints[story.path] = {"sha256": story.content_hash,
+                                         "simhash": f"{fingerprint:016x}"}
+        return fingerprint
+
+    def _band_keys(self, fingerprint: int) -> List[Tuple[int, int]]:
+        """Return the index key of each band of a fingerprint."""
+        return [(band, (fingerprint >> start) & mask)
+                for band, (start, mask) in enumerate(self._bands)]
+
+    def match(self, fingerprint: int) -> Optional[str]:
+        """
+        Find a canonical story the fingerprint is a near-duplicate of.
+
+        Args:
+            fingerprint: The fingerprint to look up.
+
+        Returns:
+            The path of the canonical story, or None if there is none.
+        """
+        for key in self._band_keys(fingerprint):
+            for candidate in self._buckets.get(key, ()):
+                if hamming_distance(fingerprint, self._canonical[candidate]) <= self.max_distance:
+                    return candidate
+        return None
+
+    def add(self, story: Story) -> Optional[str]:
+        """
+        Register a story.
+
+        Args:
+            story: The story.
+
+        Returns:
+            The path of the canonical story it duplicates, or None if the story
+            is itself canonical.
+        """
+        return self._add(story.path, self.fingerprint(story))
+
+    def add_text(self, path: str, text: str) -> Optional[str]:
+        """
+        Register a text without a loaded file record, such as a newly generated
+        story or a story read from a snapshot.
+
+        The stored fingerprint of `path` is reused if its content hash matches.
+
+        Args:
+            path: The path the text is or will be saved under.
+            text: The text.
+
+        Returns:
+            The path of the canonical story it duplicates, or None if the text
+            is itself canonical.
+        """
+        entry = self.fingerprints.get(path)
+        if entry is not None and \
+                entry["sha256"] == hashlib.sha256(text.encode("utf-8")).hexdigest():
+            return self._add(path, int(entry["simhash"], 16))
+        return self._add(path, simhash(text, self.shingle_size))
+
+    def _add(self, path: str, fingerprint: int) -> Optional[str]:
+        """Index a fingerprint unless it is a near-duplicate of a canonical story."""
+        canonical = self.match(fingerprint)
+        if canonical is not None:
+            self.duplicates[path] = canonical
+            return canonical
+        self._canonical[path] = fingerprint
+        for key in self._band_keys(fingerprint):
+            self._buckets[key].append(path)
+        return None
+
+    def filter(self, stories: Iterable[Story]) -> Iterator[Story]:
+        """
+        Yield only the canonical stories of a stream, lazily and in order.
+
+        The fingerprints are saved once the stream is exhausted, keeping only
+        the files that were part of it.
+
+        Args:
+            stories: The stories, in load order.
+
+        Yields:
+            The stories that are not near-duplicates of an earlier one.
+        """
+        seen = []
+        for story in stories:
+            seen.append(story.path)
+            if self.add(story) is None:
+                yield story
+        keep = set(seen)
+        self.fingerprints = {path: entry for path, entry in self.fingerprints.items()
+                             if path in keep}
+        self.save()
+
+    def save(self) -> None:
+        """Write the fingerprints and the duplicates found to disk atomically."""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({"shingle_size": self.shingle_size, "fingerprints": self.fingerprints,
+                       "duplicates": self.duplicates}, file, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+def create_deduplicator(config: Dict[str, Any]) -> Optional[StoryDeduplicator]:
+    """
+    Create the story deduplicator described by the configuration.
+
+    Args:
+        config: Configuration dictionary.
+
+    Returns:
+        A StoryDeduplicator, or None if deduplication is disabled.
+    """
+    if not config.get("story_dedup", True):
+        return None
+    return StoryDeduplicator(config.get("story_fingerprints_path"),
+                             max_distance=config.get("story_dedup_distance", 6))
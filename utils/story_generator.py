@@ -3,8 +3,21 @@
 This module generates stories based on domains using the LLM.
 """
 
-from typing import Any
+from typing import Any, List, Optional
 from core.llm_interface import LLMInterface
+from core.prompts import story_prompt
+
+def build_story_prompt(domain: str) -> str:
+    """
+    Build the prompt used to ask the LLM for a story about a domain.
+    
+    Args:
+        domain: The domain or topic for the story.
+        
+    Returns:
+        The prompt string.
+    """
+    return story_prompt(domain)
 
 def generate_story(domain: str, llm: LLMInterface) -> str:
     """
@@ -17,17 +30,27 @@ def generate_story(domain: str, llm: LLMInterface) -> str:
     Returns:
         A string containing the generated story.
     """
-    prompt = f"""
-Generate an educational story about {domain} in the context of software engineering.
-The story should:
-1. Include some named characters facing a software engineering challenge
-2. Show a progression from a basic approach to a more sophisticated solution
-3. Highlight trade-offs and decision-making processes
-4. Convey a key lesson or principle about {domain}
-5. Be concise (about 250-350 words)
-"""
+    prompt = build_story_prompt(domain)
     
     # Get response from LLM
     story = llm.generate_response(prompt)
     
-    return story
\ No newline at end of file
+    return story
+
+def generate_stories(domains: List[str], llm: LLMInterface,
+                     max_concurrency: Optional[int] = None) -> List[str]:
+    """
+    Generate one story per domain, sending the requests to the LLM concurrently.
+    
+    Args:
+        domains: The domains or topics for the stories.
+        llm: An instance of LLMInterface for interacting with the LLM.
+        max_concurrency: Maximum number of requests in flight at once.
+        
+    Returns:
+        A list of generated stories, in the same order as the domains.
+    """
+    prompts = [build_story_prompt(domain) for domain in domains]
+    
+    # Get responses from LLM
+    return llm.generate_batch(prompts, max_concurrency=max_concurrency)
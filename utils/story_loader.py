@@ -0,0 +1,210 @@
+# utils/story_loader.py
+"""
+This module streams story files from a corpus directory.
+
+Files are read in parallel with a thread pool but yielded lazily and in a
+stable (sorted) order. A manifest of (path, size, mtime, content hash, text)
+recognizes unchanged files from `stat` calls alone, so only new or modified
+files are read and the others are served from the manifest.
+"""
+
+import hashlib
+import json
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, NamedTuple, Optional
+
+class Story(NamedTuple):
+    """A story loaded from disk together with its file identity."""
+    path: str
+    name: str
+    text: str
+    size: int
+    mtime_ns: int
+    content_hash: str
+    changed: bool
+
+class StoryManifest:
+    """
+    Persistent record of the story files seen in previous runs.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Load the manifest from disk if it exists.
+
+        Args:
+            path: Path to the manifest JSON file, or None for an in-memory manifest.
+        """
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.modified = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as file:
+                    self.entries = json.load(file).get("files", {})
+            except (json.JSONDecodeError, UnicodeDecodeError, IOError) as e:
+                print(f"Error loading story manifest: {e}")
+
+    def is_current(self, path: str, size: int, mtime_ns: int) -> bool:
+        """
+        Check whether a file is unchanged since it was last recorded.
+
+        Args:
+            path: Path of the story file.
+            size: Current file size in bytes.
+            mtime_ns: Current modification time in nanoseconds.
+
+        Returns:
+            True if the recorded size and mtime match.
+        """
+        entry = self.entries.get(path)
+        return entry is not None and entry["size"] == size and entry["mtime_ns"] == mtime_ns
+
+    def record(self, path: str, size: int, mtime_ns: int, content_hash: str,
+               text: str) -> None:
+        """Record the current identity and text of a story file."""
+        self.entries[path] = {"size": size, "mtime_ns": mtime_ns, "sha256": content_hash,
+                              "text": text}
+        self.modified = True
+
+    def content_hash(self, path: str) -> Optional[str]:
+        """Return the recorded content hash of a file, if any."""
+        entry = self.entries.get(path)
+        return entry["sha256"] if entry else None
+
+    def text(self, path: str) -> Optional[str]:
+        """Return the recorded text of a file, if any."""
+        entry = self.entries.get(path)
+        return entry.get("text") if entry else None
+
+    def retain(self, paths: List[str]) -> None:
+        """Forget every file that is not in `paths`."""
+        keep = set(paths)
+        if any(path not in keep for path in self.entries):
+            self.entries = {path: entry for path, entry in self.entries.items() if path in keep}
+            self.modified = True
+
+    def save(self) -> None:
+        """Write the manifest to disk atomically if it changed since it was loaded."""
+        if not self.path or not self.modified:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({"files": self.entries}, file, sort_keys=True)
+        os.replace(temp_path, self.path)
+        self.modified = False
+
+def scan_story_files(directory_path: str) -> List[os.DirEntry]:
+    """
+    List the story files in a directory in a stable order.
+
+    Args:
+        directory_path: Path to the directory containing story files.
+
+    Returns:
+        Directory entries for all `.txt` files, sorted by name.
+    """
+    with os.scandir(directory_path) as entries:
+        files = [entry for entry in entries if entry.name.endswith('.txt') and entry.is_file()]
+    return sorted(files, key=lambda entry: entry.name)
+
+def _read_story(entry: os.DirEntry) -> Optional[Story]:
+    """Read a single story file, returning None if it cannot be read."""
+    try:
+        stat = entry.stat()
+        with open(entry.path, 'rb') as file:
+            data = file.read()
+        text = data.decode('utf-8')
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Error loading story from {entry.name}: {e}")
+        return None
+    return Story(
+        path=entry.path,
+        name=entry.name,
+        text=text,
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        content_hash=hashlib.sha256(data).hexdigest(),
+        changed=True
+    )
+
+def _cached_story(entry: os.DirEntry, manifest: StoryManifest) -> Optional[Story]:
+    """Return a file's story from the manifest if the file is unchanged, else None."""
+    try:
+        stat = entry.stat()
+    except OSError:
+        return None
+    text = manifest.text(entry.path)
+    if text is None or not manifest.is_current(entry.path, stat.st_size, stat.st_mtime_ns):
+        return None
+    return Story(
+        path=entry.path,
+        name=entry.name,
+        text=text,
+        size=stat.st_size,
+        mtime_ns=stat.st_mtime_ns,
+        content_hash=manifest.content_hash(entry.path),
+        changed=False
+    )
+
+def iter_stories(directory_path: str, manifest: Optional[StoryManifest] = None,
+                 workers: int = 8, prefetch: int = 64) -> Iterator[Story]:
+    """
+    Lazily yield the stories in a directory, reading files in parallel.
+
+    Stories are yielded in file-name order. At most `prefetch` files are read
+    ahead of the consumer, so memory use does not grow with corpus size.
+    Empty files are skipped. With a manifest, files whose size and mtime are
+    unchanged are not read: their text comes from the manifest. The manifest
+    is updated and, if anything changed, saved once the iteration completes.
+
+    Args:
+        directory_path: Path to the directory containing story files.
+        manifest: Manifest from previous runs, used to skip unchanged files.
+        workers: Number of reader threads.
+        prefetch: Maximum number of files read ahead of the consumer.
+
+    Yields:
+        Story records carrying the text and the file identity.
+    """
+    files = scan_story_files(directory_path)
+
+    def load(entry: os.DirEntry) -> Optional[Story]:
+        story = _cached_story(entry, manifest) if manifest is not None else None
+        return story if story is not None else _read_story(entry)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        in_flight = deque()
+        queued = iter(files)
+
+        for entry in queued:
+            in_flight.append(executor.submit(load, entry))
+            if len(in_flight) >= prefetch:
+                break
+
+        while in_flight:
+            story = in_flight.popleft().result()
+            next_entry = next(queued, None)
+            if next_entry is not None:
+                in_flight.append(executor.submit(load, next_entry))
+
+            if story is None:
+                continue
+
+            if manifest is not None and story.changed:
+                previous_hash = manifest.content_hash(story.path)
+                story = story._replace(changed=previous_hash != story.content_hash)
+                manifest.record(story.path, story.size, story.mtime_ns, story.content_hash,
+                                story.text)
+
+            if story.text.strip():  # Ensure story isn't empty
+                yield story
+
+    if manifest is not None:
+        manifest.retain([entry.path for entry in files])
+        manifest.save()